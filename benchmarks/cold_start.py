@@ -0,0 +1,82 @@
+"""Measure FastMRZ cold-start time in fresh interpreter processes.
+
+Each scenario runs in a new Python process and reports the median wall-clock
+time of the measured statement, along with which heavy modules it imported:
+
+- import: ``import fastmrz``
+- text: ``FastMRZ()`` followed by one ``validate_mrz`` call
+- image: ``FastMRZ()`` followed by one ``get_details`` on a sample image
+
+    python benchmarks/cold_start.py --tessdata-path tessdata
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+HEAVY_MODULES = ["cv2", "numpy", "pytesseract", "PIL", "tesserocr", "onnxruntime"]
+SCENARIO = """
+import json, sys, time
+started = time.perf_counter()
+import fastmrz
+if {scenario!r} == "text":
+    fastmrz.FastMRZ().validate_mrz("P<GBRPUDARSAN<<HENERT<<<<<<<<<<<<<<<<<<<<<<<\\n7077979792GBR9505209M1704224<<<<<<<<<<<<<<00")
+elif {scenario!r} == "image":
+    fastmrz.FastMRZ(tessdata_path={tessdata_path!r}).get_details({image_path!r})
+elapsed = time.perf_counter() - started
+print(json.dumps({{"ms": elapsed * 1000, "modules": [m for m in {modules!r} if m in sys.modules]}}))
+"""
+
+
+def run_scenario(scenario, repeat, tessdata_path, image_path):
+    code = SCENARIO.format(
+        scenario=scenario,
+        tessdata_path=tessdata_path,
+        image_path=str(image_path),
+        modules=HEAVY_MODULES,
+    )
+    samples = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=BASE_DIR,
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+
+    return {
+        "median_ms": statistics.median(sample["ms"] for sample in samples),
+        "modules": samples[-1]["modules"],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--tessdata-path", default="")
+    parser.add_argument("--image", type=Path, default=BASE_DIR / "data" / "td3.jpg")
+    parser.add_argument(
+        "--scenarios", nargs="+", default=["import", "text", "image"], choices=["import", "text", "image"]
+    )
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args(argv)
+
+    results = {
+        scenario: run_scenario(scenario, args.repeat, args.tessdata_path, args.image)
+        for scenario in args.scenarios
+    }
+    if args.json:
+        print(json.dumps(results, indent=4))
+        return
+    for scenario, result in results.items():
+        modules = ", ".join(result["modules"]) or "-"
+        print(f"{scenario:<8} {result['median_ms']:>9.1f} ms   heavy modules: {modules}")
+
+
+if __name__ == "__main__":
+    main()
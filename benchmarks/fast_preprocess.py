@@ -0,0 +1,95 @@
+"""Compare the default preprocessing path with fast_preprocess / reduced_decode.
+
+Reports the median end-to-end latency of get_details() for every image in
+data/ (plus 2x and 4x upscaled copies, to mimic high resolution scans), the
+speed-up over the default path, whether the OCR text is identical and the IoU
+of the MRZ box with the one found by the default path for the same mask (the
+reduced_decode mode also segments a different input, which shows up in the
+text column only).
+
+    python benchmarks/fast_preprocess.py --tessdata-path tessdata
+"""
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import cv2
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fastmrz import FastMRZ  # noqa: E402
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+MODES = {
+    "default": {},
+    "fast_preprocess": {"fast_preprocess": True},
+    "fast_preprocess+reduced_decode": {"fast_preprocess": True, "reduced_decode": True},
+}
+
+
+def _box_iou(box_a, box_b):
+    if box_a is None or box_b is None:
+        return 1.0 if box_a == box_b else 0.0
+    x_start, y_start = max(box_a[0], box_b[0]), max(box_a[1], box_b[1])
+    x_end, y_end = min(box_a[2], box_b[2]), min(box_a[3], box_b[3])
+    intersection = max(0, x_end - x_start) * max(0, y_end - y_start)
+    area_a = (box_a[2] - box_a[0]) * (box_a[3] - box_a[1])
+    area_b = (box_b[2] - box_b[0]) * (box_b[3] - box_b[1])
+    return intersection / float(area_a + area_b - intersection)
+
+
+def _samples(data_dir):
+    for image_path in sorted(data_dir.glob("*.jpg")):
+        image_data = image_path.read_bytes()
+        yield image_path.stem, image_data
+        image = cv2.imread(str(image_path))
+        for factor in (2, 4):
+            upscaled = cv2.resize(image, None, fx=factor, fy=factor, interpolation=cv2.INTER_CUBIC)
+            yield f"{image_path.stem}@{factor}x", cv2.imencode(".jpg", upscaled)[1].tobytes()
+
+
+def _median_ms(fast_mrz, image_data, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        mrz_text = fast_mrz.get_details(image_data, input_type="bytes", ignore_parse=True)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000, mrz_text
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data-dir", type=Path, default=BASE_DIR / "data")
+    parser.add_argument("--tessdata-path", default="")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    instances = {
+        mode: FastMRZ(tessdata_path=args.tessdata_path, **options)
+        for mode, options in MODES.items()
+    }
+    print(f"{'sample':<20} {'mode':<32} {'median ms':>10} {'speed-up':>9} {'same text':>10} {'box IoU':>8}")
+    totals = {mode: 0.0 for mode in MODES}
+    for name, image_data in _samples(args.data_dir):
+        image = instances["default"]._bytes_to_array(image_data)
+        output_data = instances["default"]._forward(instances["default"]._process_image(image))
+        reference_box = instances["default"]._get_roi_box(output_data, image)
+        reference_ms = reference_text = None
+        for mode, fast_mrz in instances.items():
+            median_ms, mrz_text = _median_ms(fast_mrz, image_data, args.repeat)
+            totals[mode] += median_ms
+            if reference_ms is None:
+                reference_ms, reference_text = median_ms, mrz_text
+            box = fast_mrz._get_roi_box(output_data, image)
+            print(
+                f"{name:<20} {mode:<32} {median_ms:>10.1f} {reference_ms / median_ms:>8.2f}x "
+                f"{str(mrz_text == reference_text):>10} {_box_iou(box, reference_box):>8.3f}"
+            )
+    for mode, total in totals.items():
+        print(f"total {mode:<32} {total:>10.1f} ms {totals['default'] / total:>8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+"""Generate reduced-precision variants of the segmentation model and validate them.
+
+The variants are written next to the float model, where FastMRZ(model="int8")
+and FastMRZ(model="fp16") find them:
+
+- int8: static QDQ quantization (INT8 weights per channel, UINT8 activations),
+  calibrated on the data/ samples and their synthetic variants; needs
+  onnxruntime and onnx
+- fp16: FP16 weights and activations with float32 inputs and outputs; needs
+  onnxconverter-common
+
+Every variant is then compared with the float model on the same samples, on
+each inference backend that can load it. A sample passes when the MRZ gate
+makes the same decision and the mask and ROI box agree within --min-iou and
+--max-box-shift. The run fails (exit status 1) if any sample does not:
+
+    python benchmarks/quantize_model.py
+    python benchmarks/quantize_model.py --precisions int8 fp16 --backends onnxruntime
+    python benchmarks/quantize_model.py --validate-only
+"""
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fastmrz import FastMRZ  # noqa: E402
+from fastmrz.detect import MRZGate, MRZNotFound  # noqa: E402
+from fastmrz.inference import INFERENCE_BACKENDS, MODEL_DIR, MODELS  # noqa: E402
+
+from suite import DOCUMENT_TYPES, VARIANTS, load_samples  # noqa: E402
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+PRECISIONS = ["int8", "fp16"]
+
+
+def decode(samples):
+    return [
+        cv2.imdecode(np.frombuffer(image_data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        for image_data in samples.values()
+    ]
+
+
+def quantize_int8(float_path, output_path, arrays):
+    import onnxruntime
+    from onnxruntime.quantization import (
+        CalibrationDataReader,
+        QuantFormat,
+        QuantType,
+        quantize_static,
+    )
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    input_name = onnxruntime.InferenceSession(
+        str(float_path), providers=["CPUExecutionProvider"]
+    ).get_inputs()[0].name
+
+    class Reader(CalibrationDataReader):
+        def __init__(self):
+            self._arrays = iter(arrays)
+
+        def get_next(self):
+            image_array = next(self._arrays, None)
+            return None if image_array is None else {input_name: image_array}
+
+    # Shape inference and graph fusion first, as the quantization tool advises;
+    # the fixed input size makes symbolic shapes (and sympy) unnecessary
+    prepared_path = output_path.with_suffix(".prepared.onnx")
+    quant_pre_process(str(float_path), str(prepared_path), skip_symbolic_shape=True)
+    try:
+        quantize_static(
+            str(prepared_path),
+            str(output_path),
+            Reader(),
+            quant_format=QuantFormat.QDQ,
+            per_channel=True,
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8,
+        )
+    finally:
+        prepared_path.unlink(missing_ok=True)
+
+
+def convert_fp16(float_path, output_path):
+    try:
+        from onnxconverter_common import float16
+    except ImportError:
+        raise SystemExit("The fp16 model needs onnxconverter-common: pip install onnxconverter-common")
+    import onnx
+
+    model = float16.convert_float_to_float16(onnx.load(str(float_path)), keep_io_types=True)
+    onnx.save(model, str(output_path))
+
+
+def median_forward_ms(fast_mrz, arrays, repeat):
+    for image_array in arrays[:2]:
+        fast_mrz._forward(image_array)
+    timings = []
+    for _ in range(repeat):
+        for image_array in arrays:
+            started = time.perf_counter()
+            fast_mrz._forward(image_array)
+            timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def detection(fast_mrz, gate, output_data, image_shape):
+    try:
+        gate.check_mask(output_data, image_shape)
+        accepted = True
+    except MRZNotFound:
+        accepted = False
+    mask = output_data[0, :, :, 0] > gate.mask_threshold
+    return accepted, mask, fast_mrz._get_roi_box_lowres(output_data, image_shape)
+
+
+def compare_detection(reference, candidate, image_shape, min_iou, max_box_shift):
+    accepted, mask, box = reference
+    candidate_accepted, candidate_mask, candidate_box = candidate
+    if accepted != candidate_accepted:
+        return False, "gate decision differs"
+    union = np.count_nonzero(mask | candidate_mask)
+    iou = np.count_nonzero(mask & candidate_mask) / union if union else 1.0
+    if iou < min_iou:
+        return False, f"mask IoU {iou:.3f}"
+    if (box is None) != (candidate_box is None):
+        return False, "ROI box found by one model only"
+    if box is not None:
+        # Box corners may move by a fraction of the image size
+        size = np.array([image_shape[1], image_shape[0]] * 2)
+        shift = float(np.max(np.abs(np.subtract(box, candidate_box)) / size))
+        if shift > max_box_shift:
+            return False, f"ROI box moved by {shift:.1%}"
+    return True, f"mask IoU {iou:.3f}"
+
+
+def validate(args, samples, precision, backend):
+    images = decode(samples)
+    try:
+        reference = FastMRZ(inference_backend=backend, model=args.model)
+        candidate = FastMRZ(inference_backend=backend, model=args.output_dir / MODELS[precision])
+        candidate.net
+    except Exception as error:
+        print(f"{precision:<5} {backend:<12} cannot load the model: {error}")
+        return None
+
+    gate = MRZGate()
+    arrays = [reference._process_image(image) for image in images]
+    failures = 0
+    for name, image, image_array in zip(samples, images, arrays):
+        passed, message = compare_detection(
+            detection(reference, gate, reference._forward(image_array), image.shape),
+            detection(candidate, gate, candidate._forward(image_array), image.shape),
+            image.shape,
+            args.min_iou,
+            args.max_box_shift,
+        )
+        failures += not passed
+        if not passed or args.verbose:
+            print(f"{precision:<5} {backend:<12} {name:<24} {'ok' if passed else 'FAIL':<5} {message}")
+
+    float_ms = median_forward_ms(reference, arrays, args.repeat)
+    candidate_ms = median_forward_ms(candidate, arrays, args.repeat)
+    print(
+        f"{precision:<5} {backend:<12} {len(arrays) - failures}/{len(arrays)} samples agree, "
+        f"forward {float_ms:.2f} ms -> {candidate_ms:.2f} ms ({candidate_ms / float_ms - 1:+.0%})"
+    )
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", type=Path, default=Path(MODEL_DIR) / MODELS["float"])
+    parser.add_argument("--output-dir", type=Path, default=Path(MODEL_DIR))
+    parser.add_argument("--data-dir", type=Path, default=BASE_DIR / "data")
+    parser.add_argument("--precisions", nargs="+", default=["int8"], choices=PRECISIONS)
+    parser.add_argument(
+        "--backends", nargs="+", default=list(INFERENCE_BACKENDS), choices=list(INFERENCE_BACKENDS)
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="Timed passes over all samples")
+    parser.add_argument("--min-iou", type=float, default=0.9)
+    parser.add_argument(
+        "--max-box-shift",
+        type=float,
+        default=0.01,
+        help="Allowed ROI corner movement as a fraction of the image size (default: 0.01)",
+    )
+    parser.add_argument(
+        "--validate-only", action="store_true", help="Validate existing variants without generating"
+    )
+    parser.add_argument("-v", "--verbose", action="store_true", help="Print every sample")
+    args = parser.parse_args(argv)
+
+    samples = load_samples(args.data_dir, DOCUMENT_TYPES, list(VARIANTS))
+    if not args.validate_only:
+        for precision in args.precisions:
+            output_path = args.output_dir / MODELS[precision]
+            if precision == "int8":
+                fast_mrz = FastMRZ()
+                arrays = [fast_mrz._process_image(image) for image in decode(samples)]
+                quantize_int8(args.model, output_path, arrays)
+            else:
+                convert_fp16(args.model, output_path)
+            print(
+                f"wrote {output_path} ({output_path.stat().st_size / 1024:.0f} KiB, "
+                f"float {args.model.stat().st_size / 1024:.0f} KiB)"
+            )
+
+    failures = 0
+    for precision in args.precisions:
+        for backend in args.backends:
+            failures += validate(args, samples, precision, backend) or 0
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,351 @@
+"""Benchmark FastMRZ on the bundled data/ samples and compare against a baseline.
+
+Every document type in data/ is measured as is and as synthetic variants
+(downscaled, upscaled and slightly rotated). The run reports:
+
+- end-to-end and per-stage latency percentiles for each sample
+- images per second single-threaded, through get_details_batch and through
+  map_details on a thread pool
+- text throughput of validate_mrz and parse_many
+- time to first result of a new FastMRZ, cold and after warmup()
+- memory allocated while preprocessing, segmenting and cropping each image,
+  with and without reusable buffers
+- peak RSS of the benchmark process
+- with --cascade, which cascade profile finished each sample
+
+Results are written as JSON. Passing a previous run with --compare fails the
+run (exit status 1) when a summary figure got worse by more than --threshold:
+
+    python benchmarks/suite.py --tessdata-path tessdata --output baseline.json
+    python benchmarks/suite.py --tessdata-path tessdata --compare baseline.json --threshold 0.1
+"""
+import argparse
+import json
+import platform
+import resource
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fastmrz import FastMRZ  # noqa: E402
+from fastmrz.metrics import STAGES, Metrics  # noqa: E402
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+DOCUMENT_TYPES = ["td1", "td2", "td3", "mrva", "mrvb", "passport_uk", "nomrz"]
+VARIANTS = {
+    "original": None,
+    "0.5x": ("scale", 0.5),
+    "2x": ("scale", 2.0),
+    "rot+3": ("rotate", 3.0),
+    "rot-3": ("rotate", -3.0),
+}
+TEXT_SAMPLES = [
+    "P<GBRPUDARSAN<<HENERT<<<<<<<<<<<<<<<<<<<<<<<\n7077979792GBR9505209M1704224<<<<<<<<<<<<<<00",
+    "I<UTOD231458907<<<<<<<<<<<<<<<\n7408122F1204159UTO<<<<<<<<<<<6\nERIKSSON<<ANNA<MARIA<<<<<<<<<<",
+    "I<UTOERIKSSON<<ANNA<MARIA<<<<<<<<<<<\nD231458907UTO7408122F1204159<<<<<<<6",
+    "V<UTOERIKSSON<<ANNA<MARIA<<<<<<<<<<<\nL8988901C4XXX4009078F9612109<<<<<<<<",
+    "P<GBRPUDARSAN<<HENERT<<<<<<<<<<<<<<<<<<<<<<<\n7077979792GBR9505209M1704224<<<<<<<<<<<<<<01",
+]
+
+
+def _variant(image, transform):
+    if transform is None:
+        return image
+    kind, value = transform
+    if kind == "scale":
+        interpolation = cv2.INTER_AREA if value < 1 else cv2.INTER_CUBIC
+        return cv2.resize(image, None, fx=value, fy=value, interpolation=interpolation)
+    height, width = image.shape[:2]
+    matrix = cv2.getRotationMatrix2D((width / 2, height / 2), value, 1.0)
+    return cv2.warpAffine(image, matrix, (width, height), borderMode=cv2.BORDER_REPLICATE)
+
+
+def load_samples(data_dir, document_types, variants):
+    samples = {}
+    for document_type in document_types:
+        image_path = data_dir / f"{document_type}.jpg"
+        image = cv2.imread(str(image_path))
+        for variant in variants:
+            if VARIANTS[variant] is None:
+                image_data = image_path.read_bytes()
+            else:
+                image_data = cv2.imencode(".jpg", _variant(image, VARIANTS[variant]))[1].tobytes()
+            samples[f"{document_type}/{variant}"] = image_data
+    return samples
+
+
+def percentiles(values_ms):
+    values = np.asarray(values_ms)
+    return {
+        "p50": float(np.percentile(values, 50)),
+        "p90": float(np.percentile(values, 90)),
+        "p99": float(np.percentile(values, 99)),
+        "mean": float(values.mean()),
+    }
+
+
+def bench_latency(fast_mrz, samples, repeat, warmup):
+    results = {}
+    all_stages = {}
+    for name, image_data in samples.items():
+        for _ in range(warmup):
+            fast_mrz.get_details(image_data, input_type="bytes")
+        totals = []
+        stages = {}
+        for _ in range(repeat):
+            result = fast_mrz.get_details(image_data, input_type="bytes")
+            for stage, timing in result["timings"].items():
+                stages.setdefault(stage, []).append(timing["wall"] * 1000)
+                all_stages.setdefault(stage, []).append(timing["wall"] * 1000)
+            totals.append(result["timings"]["total"]["wall"] * 1000)
+        results[name] = {
+            "status": result["status"],
+            "latency_ms": percentiles(totals),
+            "stages_ms": {
+                stage: percentiles(stages[stage]) for stage in STAGES if stage in stages
+            },
+        }
+    stage_summary = {
+        stage: percentiles(all_stages[stage]) for stage in STAGES if stage in all_stages
+    }
+    return results, stage_summary
+
+
+def bench_throughput(args, samples, rounds):
+    inputs = list(samples.values()) * rounds
+    throughput = {}
+
+    fast_mrz = FastMRZ(tessdata_path=args.tessdata_path)
+    fast_mrz.get_details(inputs[0], input_type="bytes")
+    started = time.perf_counter()
+    for image_data in inputs:
+        fast_mrz.get_details(image_data, input_type="bytes")
+    throughput["single_images_per_s"] = len(inputs) / (time.perf_counter() - started)
+
+    started = time.perf_counter()
+    fast_mrz.get_details_batch(inputs, input_type="bytes", batch_size=args.batch_size)
+    throughput["batch_images_per_s"] = len(inputs) / (time.perf_counter() - started)
+
+    with FastMRZ(tessdata_path=args.tessdata_path, workers=args.workers) as parallel_mrz:
+        parallel_mrz.map_details(inputs[: args.workers], input_type="bytes")
+        started = time.perf_counter()
+        parallel_mrz.map_details(inputs, input_type="bytes")
+        throughput["parallel_images_per_s"] = len(inputs) / (time.perf_counter() - started)
+
+    return throughput
+
+
+def bench_first_result(args, image_data):
+    # A new instance loads the model, compiles the graph and loads the OCR
+    # traineddata on its first image; warmup() moves that out of the request
+    first_result = {}
+    started = time.perf_counter()
+    FastMRZ(tessdata_path=args.tessdata_path).get_details(image_data, input_type="bytes")
+    first_result["cold"] = (time.perf_counter() - started) * 1000
+
+    fast_mrz = FastMRZ(tessdata_path=args.tessdata_path)
+    started = time.perf_counter()
+    fast_mrz.warmup()
+    first_result["warmup"] = (time.perf_counter() - started) * 1000
+    started = time.perf_counter()
+    fast_mrz.get_details(image_data, input_type="bytes")
+    first_result["after_warmup"] = (time.perf_counter() - started) * 1000
+
+    return first_result
+
+
+def bench_allocations(args, samples, rounds):
+    # Peak memory traced above what was allocated before each image, for the
+    # steps before OCR; NumPy and OpenCV output arrays are traced, memory
+    # OpenCV allocates internally is not
+    allocations = {}
+    for mode, buffers in (("default", None), ("buffers", True)):
+        fast_mrz = FastMRZ(tessdata_path=args.tessdata_path, buffers=buffers)
+        images = [fast_mrz._bytes_to_array(image_data) for image_data in samples.values()]
+        for image in images:
+            fast_mrz._get_roi_image(fast_mrz._forward_image(image), image)
+        if buffers:
+            steady_from = fast_mrz.buffers.stats()["allocations"]
+        peaks = []
+        tracemalloc.start()
+        try:
+            for image in images * rounds:
+                if hasattr(tracemalloc, "reset_peak"):
+                    tracemalloc.reset_peak()
+                else:
+                    # Python 3.8 has no reset_peak; restarting clears the peak
+                    tracemalloc.stop()
+                    tracemalloc.start()
+                current = tracemalloc.get_traced_memory()[0]
+                fast_mrz._get_roi_image(fast_mrz._forward_image(image), image)
+                peaks.append(tracemalloc.get_traced_memory()[1] - current)
+        finally:
+            tracemalloc.stop()
+        allocations[f"peak_kib/{mode}"] = statistics.median(peaks) / 1024
+        if buffers:
+            stats = fast_mrz.buffers.stats()
+            allocations["steady_allocations"] = stats["allocations"] - steady_from
+            allocations["buffer_kib"] = stats["peak_resident_bytes"] / 1024
+    return allocations
+
+
+def bench_text(count):
+    fast_mrz = FastMRZ()
+    texts = (TEXT_SAMPLES * (count // len(TEXT_SAMPLES) + 1))[:count]
+    throughput = {}
+
+    started = time.perf_counter()
+    for text in texts:
+        fast_mrz.validate_mrz(text)
+    throughput["validate_mrz_per_s"] = count / (time.perf_counter() - started)
+
+    started = time.perf_counter()
+    fast_mrz.parse_many(texts)
+    throughput["parse_many_per_s"] = count / (time.perf_counter() - started)
+
+    return throughput
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / 1024
+
+
+def summarize(report):
+    summary = {
+        f"latency_p50_ms/{name}": sample["latency_ms"]["p50"]
+        for name, sample in report["samples"].items()
+    }
+    summary.update(
+        {f"stage_p50_ms/{stage}": value["p50"] for stage, value in report["stages_ms"].items()}
+    )
+    summary.update(
+        {f"first_result_ms/{name}": value for name, value in report["first_result_ms"].items()}
+    )
+    summary.update(
+        {f"preprocess_{name}": value for name, value in report["allocations"].items()}
+    )
+    summary.update(report["throughput"])
+    summary.update(report["text_throughput"])
+    summary["peak_rss_mb"] = report["peak_rss_mb"]
+    return summary
+
+
+def compare(summary, baseline, threshold):
+    regressions = []
+    for key, value in summary.items():
+        previous = baseline.get(key)
+        if previous is None:
+            continue
+        if previous == 0:
+            # Nothing to scale by; any growth from zero (e.g. steady_allocations)
+            # is a regression
+            if key.endswith("_per_s") or value <= 0:
+                continue
+            change = float("inf")
+        # Throughput figures should go up, everything else down
+        elif key.endswith("_per_s"):
+            change = (previous - value) / previous
+        else:
+            change = (value - previous) / previous
+        if change > threshold:
+            regressions.append((key, previous, value, change))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data-dir", type=Path, default=BASE_DIR / "data")
+    parser.add_argument("--tessdata-path", default="")
+    parser.add_argument("--documents", nargs="+", default=DOCUMENT_TYPES, choices=DOCUMENT_TYPES)
+    parser.add_argument("--variants", nargs="+", default=list(VARIANTS), choices=list(VARIANTS))
+    parser.add_argument("--repeat", type=int, default=10, help="Timed runs per sample")
+    parser.add_argument("--warmup", type=int, default=2, help="Untimed runs per sample")
+    parser.add_argument("--rounds", type=int, default=3, help="Passes over all samples for throughput")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--text-count", type=int, default=100000)
+    parser.add_argument(
+        "--cascade", action="store_true", help="Measure latency with the adaptive cascade"
+    )
+    parser.add_argument("-o", "--output", type=Path, help="Write the report as JSON")
+    parser.add_argument("--compare", type=Path, help="Baseline JSON report to compare with")
+    parser.add_argument(
+        "--threshold", type=float, default=0.1, help="Allowed relative regression (default: 0.1)"
+    )
+    args = parser.parse_args(argv)
+
+    samples = load_samples(args.data_dir, args.documents, args.variants)
+    # Before anything else has loaded the model or the OCR engines
+    first_result = bench_first_result(args, next(iter(samples.values())))
+    fast_mrz = FastMRZ(
+        tessdata_path=args.tessdata_path,
+        metrics=Metrics(attach_timings=True),
+        cascade=args.cascade or None,
+    )
+    sample_results, stage_summary = bench_latency(fast_mrz, samples, args.repeat, args.warmup)
+    report = {
+        "environment": {
+            "python": platform.python_version(),
+            "opencv": cv2.__version__,
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "cpu_count": cv2.getNumberOfCPUs(),
+        },
+        "first_result_ms": first_result,
+        "samples": sample_results,
+        "stages_ms": stage_summary,
+        "allocations": bench_allocations(args, samples, args.rounds),
+        "throughput": bench_throughput(args, samples, args.rounds),
+        "text_throughput": bench_text(args.text_count),
+    }
+    if fast_mrz.cascade is not None:
+        report["cascade"] = fast_mrz.cascade.stats()
+    report["peak_rss_mb"] = peak_rss_mb()
+    report["summary"] = summarize(report)
+
+    print(f"{'sample':<24} {'status':<8} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9}")
+    for name, sample in sample_results.items():
+        latency = sample["latency_ms"]
+        print(
+            f"{name:<24} {sample['status']:<8} {latency['p50']:>9.1f} "
+            f"{latency['p90']:>9.1f} {latency['p99']:>9.1f}"
+        )
+    for stage, latency in stage_summary.items():
+        print(f"stage {stage:<18} {'':<8} {latency['p50']:>9.2f} {latency['p90']:>9.2f} {latency['p99']:>9.2f}")
+    for key, value in {**report["throughput"], **report["text_throughput"]}.items():
+        print(f"{key:<33} {value:>12.1f}")
+    for name, value in first_result.items():
+        print(f"{'first_result_ms/' + name:<33} {value:>12.1f}")
+    for name, value in report["allocations"].items():
+        print(f"{'preprocess_' + name:<33} {value:>12.1f}")
+    print(f"{'peak_rss_mb':<33} {report['peak_rss_mb']:>12.1f}")
+    if "cascade" in report:
+        for name, profile in report["cascade"]["profiles"].items():
+            print(f"cascade {name:<25} {profile['finished']:>6} of {profile['attempts']:>5} attempts")
+        print(f"cascade {'unfinished':<25} {report['cascade']['unfinished']:>6}")
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=4))
+
+    if args.compare:
+        baseline = json.loads(args.compare.read_text())["summary"]
+        regressions = compare(report["summary"], baseline, args.threshold)
+        for key, previous, value, change in regressions:
+            print(f"REGRESSION {key}: {previous:.2f} -> {value:.2f} ({change:+.1%})")
+        if regressions:
+            return 1
+        print(f"No regressions above {args.threshold:.0%} against {args.compare}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,57 @@
 from .fastmrz import FastMRZ
 
 __all__ = [
+    'BufferPool',
+    'Cascade',
     'FastMRZ',
-]
\ No newline at end of file
+    'FramePool',
+    'MRZCorrector',
+    'MRZResult',
+    'Metrics',
+    'OCRBRecognizer',
+    'Profile',
+    'PytesseractBackend',
+    'ResultCache',
+    'TesserocrBackend',
+]
+
+
+def __getattr__(name):
+    # The OCR backends pull in OpenCV and pytesseract, so they load on demand
+    if name in ('PytesseractBackend', 'TesserocrBackend'):
+        from . import ocr
+
+        return getattr(ocr, name)
+    if name in ('Cascade', 'Profile'):
+        from . import cascade
+
+        return getattr(cascade, name)
+    if name == 'BufferPool':
+        from .buffers import BufferPool
+
+        return BufferPool
+    if name == 'ResultCache':
+        from .cache import ResultCache
+
+        return ResultCache
+    if name == 'MRZCorrector':
+        from .correction import MRZCorrector
+
+        return MRZCorrector
+    if name == 'FramePool':
+        from .pool import FramePool
+
+        return FramePool
+    if name == 'MRZResult':
+        from .result import MRZResult
+
+        return MRZResult
+    if name == 'Metrics':
+        from .metrics import Metrics
+
+        return Metrics
+    if name == 'OCRBRecognizer':
+        from .ocrb import OCRBRecognizer
+
+        return OCRBRecognizer
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
\ No newline at end of file
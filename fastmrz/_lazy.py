@@ -0,0 +1,24 @@
+import importlib
+import threading
+
+
+class LazyModule:
+    # Stands in for a heavy module and imports it on first attribute access,
+    # so that text-only use never pays for (or needs) OpenCV and NumPy
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        return f"<lazy module {self._name!r}>"
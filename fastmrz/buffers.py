@@ -0,0 +1,85 @@
+import collections
+import math
+import threading
+import weakref
+
+from ._lazy import LazyModule
+
+np = LazyModule("numpy")
+
+
+class _ThreadBuffers:
+    def __init__(self):
+        self.arrays = {}
+        # A list so the finalizer, which must not hold the buffers, sees the size
+        self.nbytes = [0]
+
+
+class BufferPool:
+    # Scratch arrays for preprocessing, kept per thread and reused from image
+    # to image. A buffer only ever grows, so once the largest image size has
+    # been seen get() returns views of memory that is already there.
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._counters = collections.Counter()
+        self._resident_bytes = 0
+        self._peak_bytes = 0
+        self._threads = 0
+
+    def _thread_buffers(self):
+        buffers = getattr(self._local, "buffers", None)
+        if buffers is None:
+            buffers = self._local.buffers = _ThreadBuffers()
+            # Buffers of a thread that ended stop counting as resident
+            weakref.finalize(buffers, self._release, buffers.nbytes)
+            with self._lock:
+                self._threads += 1
+        return buffers
+
+    def _release(self, nbytes):
+        with self._lock:
+            self._resident_bytes -= nbytes[0]
+            self._threads -= 1
+
+    def get(self, name, shape, dtype):
+        # The view is valid until the same thread asks for `name` again
+        dtype = np.dtype(dtype)
+        size = math.prod(shape) * dtype.itemsize
+        buffers = self._thread_buffers()
+        backing = buffers.arrays.get(name)
+        if backing is not None and backing.nbytes >= size:
+            with self._lock:
+                self._counters["reuses"] += 1
+        else:
+            grown = size - (0 if backing is None else backing.nbytes)
+            backing = buffers.arrays[name] = np.empty(size, dtype=np.uint8)
+            buffers.nbytes[0] += grown
+            with self._lock:
+                self._counters["allocations"] += 1
+                self._counters["allocated_bytes"] += size
+                self._resident_bytes += grown
+                self._peak_bytes = max(self._peak_bytes, self._resident_bytes)
+        return backing[:size].view(dtype).reshape(shape)
+
+    def clear(self):
+        # Frees the calling thread's buffers
+        buffers = getattr(self._local, "buffers", None)
+        if buffers is not None:
+            with self._lock:
+                self._resident_bytes -= buffers.nbytes[0]
+            buffers.nbytes[0] = 0
+            buffers.arrays.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = {
+                name: self._counters[name] for name in ("allocations", "allocated_bytes", "reuses")
+            }
+            stats["resident_bytes"] = self._resident_bytes
+            stats["peak_resident_bytes"] = self._peak_bytes
+            stats["threads"] = self._threads
+        return stats
+
+    def _after_fork(self):
+        self._lock = threading.Lock()
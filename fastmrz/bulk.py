@@ -0,0 +1,294 @@
+import numpy as np
+
+from .result import (
+    CHECKDIGIT_FIELDS,
+    FAILURE_MESSAGES,
+    FIELD_LAYOUTS,
+    FIELDS,
+    LETTERS,
+    TYPE_FIELDS,
+)
+
+# Rows are processed in chunks to keep the temporary character arrays small
+CHUNK_SIZE = 65536
+
+# Failure checks in the order _parse_mrz runs them; the last failing one wins
+_CHECKS = {
+    mrz_type: [(field, check) for field, place, read, check in layout if check is not None]
+    for mrz_type, layout in FIELD_LAYOUTS.items()
+}
+
+# Character values used by check digits: 0-9, A-Z (either case) = 10-35, others 0
+_VALUES = np.zeros(256, dtype=np.int64)
+_VALUES[ord("0") : ord("9") + 1] = np.arange(10)
+_VALUES[ord("A") : ord("Z") + 1] = np.arange(10, 36)
+_VALUES[ord("a") : ord("z") + 1] = np.arange(10, 36)
+_IS_ALPHA = np.zeros(256, dtype=bool)
+_IS_ALPHA[ord("A") : ord("Z") + 1] = True
+_IS_ALPHA[ord("a") : ord("z") + 1] = True
+_WEIGHTS = np.array([7, 3, 1], dtype=np.int64)
+_DAYS_IN_MONTH = np.array([0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+_FILLER = ord("<")
+
+
+def _weights(length):
+    return _WEIGHTS[np.arange(length) % 3]
+
+
+def _text(codes, start, stop):
+    # Rows of code points viewed in place as fixed-width unicode strings
+    return np.ascontiguousarray(codes[:, start:stop], dtype=np.uint32).view(f"U{stop - start}")[:, 0]
+
+
+def _digit_text(digits):
+    return (digits + ord("0")).astype(np.uint32).view("U1")
+
+
+def _checkdigit(values, weights):
+    return (values * weights).sum(axis=1) % 10
+
+
+def _compact_checkdigit(codes, values):
+    # Check digit of the field with "<" removed, which shifts the weights
+    kept = codes != _FILLER
+    rank = np.cumsum(kept, axis=1) - 1
+    return _checkdigit(values, _WEIGHTS[rank % 3] * kept)
+
+
+def _lstripped_checkdigit(codes, values):
+    # Check digit of the field with leading "<" removed
+    leading = np.argmax(codes != _FILLER, axis=1)
+    rank = np.arange(codes.shape[1]) - leading[:, None]
+    return _checkdigit(values, _WEIGHTS[rank % 3])
+
+
+def _dates(codes):
+    # Same acceptance rules as datetime.strptime(value, "%y%m%d")
+    digits = codes.astype(np.int64) - ord("0")
+    valid = ((digits >= 0) & (digits <= 9)).all(axis=1)
+    year = digits[:, 0] * 10 + digits[:, 1]
+    year += np.where(year >= 69, 1900, 2000)
+    month = digits[:, 2] * 10 + digits[:, 3]
+    day = digits[:, 4] * 10 + digits[:, 5]
+    leap = (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+    days = _DAYS_IN_MONTH[np.clip(month, 0, 12)] + (leap & (month == 2))
+    valid &= (month >= 1) & (month <= 12) & (day >= 1) & (day <= days)
+
+    return year, month, day, valid
+
+
+def _date_text(year, month, day):
+    chars = np.empty((len(year), 10), dtype=np.uint32)
+    for i, divisor in enumerate((1000, 100, 10, 1)):
+        chars[:, i] = year // divisor % 10
+    chars[:, 5], chars[:, 6] = month // 10, month % 10
+    chars[:, 8], chars[:, 9] = day // 10, day % 10
+    chars += ord("0")
+    chars[:, 4] = chars[:, 7] = ord("-")
+
+    return chars.view("U10")[:, 0]
+
+
+def _columns(place, line_length):
+    # Where a (line, start, stop) place sits in the joined lines
+    line, start, stop = place
+    return line * line_length + start, line * line_length + (line_length if stop is None else stop)
+
+
+def _parse_group(codes, mrz_type, line_length, include_checkdigit):
+    values = _VALUES[codes]
+    places, checks = {}, {}
+    for field, place, read, check in FIELD_LAYOUTS[mrz_type]:
+        if field == "final":
+            final = place
+        else:
+            places[field] = _columns(place, line_length)
+        if isinstance(check, tuple):
+            line, index = check
+            checks[field] = line * line_length + index % line_length
+    columns = {"mrz_type": np.full(len(codes), mrz_type)}
+    failed = {}
+
+    start, stop = places["document_code"]
+    columns["document_code"] = np.char.strip(_text(codes, start, stop), "<")
+    for field in ("issuer_code", "nationality_code"):
+        start, stop = places[field]
+        columns[field] = _text(codes, start, stop)
+        failed[field] = ~_IS_ALPHA[codes[:, start:stop]].all(axis=1)
+
+    start, stop = places["document_number"]
+    if mrz_type == "TD1":
+        columns["document_number"] = _text(codes, start, stop)
+        digits = _checkdigit(values[:, start:stop], _weights(stop - start))
+    else:
+        columns["document_number"] = np.char.replace(_text(codes, start, stop), "<", "")
+        digits = _compact_checkdigit(codes[:, start:stop], values[:, start:stop])
+    failed["document_number"] = codes[:, checks["document_number"]] != digits + ord("0")
+    columns["document_number_checkdigit"] = _digit_text(digits)
+
+    years = {}
+    valid_dates = np.ones(len(codes), dtype=bool)
+    for field in ("birth_date", "expiry_date"):
+        start, stop = places[field]
+        digits = _checkdigit(values[:, start:stop], _weights(stop - start))
+        failed[field] = codes[:, checks[field]] != digits + ord("0")
+        columns[field + "_checkdigit"] = _digit_text(digits)
+        year, month, day, valid = _dates(codes[:, start:stop])
+        years[field] = (year, month, day)
+        valid_dates &= valid
+    birth_year, birth_month, birth_day = years["birth_date"]
+    expiry_year, expiry_month, expiry_day = years["expiry_date"]
+    birth_year = np.where(expiry_year > birth_year, birth_year, birth_year - 100)
+    columns["birth_date"] = _date_text(birth_year, birth_month, birth_day)
+    columns["expiry_date"] = _date_text(expiry_year, expiry_month, expiry_day)
+    start, stop = places["sex"]
+    columns["sex"] = _text(codes, start, stop)
+
+    for field in ("optional_data", "optional_data_1", "optional_data_2"):
+        if field in places:
+            start, stop = places[field]
+            columns[field] = np.char.strip(_text(codes, start, stop), "<")
+    if "optional_data" in checks:
+        optional = slice(*places["optional_data"])
+        digits = _lstripped_checkdigit(codes[:, optional], values[:, optional])
+        failed["optional_data"] = codes[:, checks["optional_data"]] != digits + ord("0")
+        columns["optional_data_checkdigit"] = _digit_text(digits)
+
+    positions = np.concatenate([np.arange(*_columns(place, line_length)) for place in final])
+    digits = _checkdigit(values[:, positions], _weights(len(positions)))
+    if "final" in checks:
+        failed["final"] = codes[:, checks["final"]] != digits + ord("0")
+    columns["final_checkdigit"] = _digit_text(digits)
+
+    start, stop = places["names"]
+    names = np.char.partition(_text(codes, start, stop), "<<")
+    has_given_name = names[:, 1] != ""
+    columns["surname"] = np.char.replace(names[:, 0], "<", " ")
+    columns["given_name"] = np.char.replace(np.char.partition(names[:, 2], "<<")[:, 0], "<", " ")
+
+    status_message = np.full(len(codes), "", dtype="U40")
+    for field, check in _CHECKS[mrz_type]:
+        status_message[failed[field]] = FAILURE_MESSAGES[LETTERS if check == LETTERS else field]
+    columns["status"] = np.where(status_message == "", "SUCCESS", "FAILURE")
+    columns["status_message"] = status_message
+    if not include_checkdigit:
+        for field in CHECKDIGIT_FIELDS:
+            columns.pop(field, None)
+
+    # Rows _parse_mrz would raise on are left to the scalar fallback
+    return columns, valid_dates & has_given_name
+
+
+def _scalar_row(parser, mrz_text, include_checkdigit):
+    try:
+        return parser._parse_mrz(mrz_text, include_checkdigit=include_checkdigit)
+    except Exception as error:
+        return {"status": "FAILURE", "status_message": str(error)}
+
+
+def _parse_chunk(parser, texts, include_checkdigit):
+    mrz_texts = [parser._cleanse_roi(text) for text in texts]
+    groups = {}
+    scalar_rows = []
+    for i, mrz_text in enumerate(mrz_texts):
+        lines = mrz_text.strip().split("\n") if mrz_text else ()
+        length = len(lines[0]) if lines else 0
+        regular = (
+            (len(lines), length) in ((3, 30), (2, 36), (2, 44))
+            and mrz_text.isascii()
+            and "\0" not in mrz_text
+            and all(len(line) == length for line in lines)
+        )
+        if not regular:
+            scalar_rows.append(i)
+            continue
+        if len(lines) == 3:
+            mrz_type = "TD1"
+        elif lines[1][-1] == "<":
+            mrz_type = "MRVB" if length == 36 else "MRVA"
+        else:
+            mrz_type = "TD2" if length == 36 else "TD3"
+        groups.setdefault((mrz_type, length), ([], []))
+        groups[(mrz_type, length)][0].append(i)
+        groups[(mrz_type, length)][1].append("".join(lines))
+
+    pieces = []
+    for (mrz_type, length), (rows, joined) in groups.items():
+        codes = np.frombuffer("".join(joined).encode("ascii"), dtype=np.uint8).reshape(len(rows), -1)
+        columns, vectorized = _parse_group(codes, mrz_type, length, include_checkdigit)
+        rows = np.array(rows, dtype=np.int64)
+        columns = {field: column[vectorized] for field, column in columns.items()}
+        columns["mrz_text"] = np.array([mrz_texts[i] for i in rows[vectorized]], dtype=str)
+        pieces.append((rows[vectorized], columns))
+        scalar_rows.extend(rows[~vectorized].tolist())
+
+    if scalar_rows:
+        scalar_results = [_scalar_row(parser, mrz_texts[i], include_checkdigit) for i in scalar_rows]
+        pieces.append(
+            (
+                np.array(scalar_rows, dtype=np.int64),
+                {
+                    field: np.array([result.get(field, "") for result in scalar_results], dtype=str)
+                    for field in FIELDS
+                },
+            )
+        )
+
+    columns = {}
+    for field in FIELDS:
+        if not include_checkdigit and field in CHECKDIGIT_FIELDS:
+            continue
+        width = max(
+            [1] + [piece[field].dtype.itemsize // 4 for _, piece in pieces if field in piece]
+        )
+        column = np.full(len(texts), "", dtype=f"U{width}")
+        for rows, piece in pieces:
+            if field in piece:
+                column[rows] = piece[field]
+        columns[field] = column
+
+    return columns
+
+
+def parse_many(parser, texts, include_checkdigit=True):
+    texts = list(texts)
+    chunks = [
+        _parse_chunk(parser, texts[start : start + CHUNK_SIZE], include_checkdigit)
+        for start in range(0, len(texts), CHUNK_SIZE)
+    ]
+    if not chunks:
+        chunks = [_parse_chunk(parser, [], include_checkdigit)]
+
+    return {field: np.concatenate([chunk[field] for chunk in chunks]) for field in chunks[0]}
+
+
+def validate_many(parser, texts):
+    columns = parse_many(parser, texts, include_checkdigit=False)
+    is_valid = columns["status"] == "SUCCESS"
+    status_message = columns["status_message"].astype(
+        f"U{max(22, columns['status_message'].dtype.itemsize // 4)}"
+    )
+    status_message[is_valid] = "The given mrz is valid"
+
+    return {"is_valid": is_valid, "status_message": status_message}
+
+
+def to_records(columns):
+    # Rebuilds the per-document dicts _parse_mrz would have returned
+    records = []
+    for i in range(len(columns["status"])):
+        mrz_type = str(columns["mrz_type"][i])
+        if not mrz_type:
+            record = {}
+        else:
+            record = {
+                field: str(columns[field][i])
+                for field in TYPE_FIELDS[mrz_type]
+                if field in columns
+            }
+        record["status"] = str(columns["status"][i])
+        if record["status"] == "FAILURE":
+            record["status_message"] = str(columns["status_message"][i])
+        records.append(record)
+
+    return records
@@ -0,0 +1,135 @@
+import collections
+import copy
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class ResultCache:
+    # Two tiers: an in-process LRU dict and an optional SQLite file that
+    # survives restarts and can be shared by several worker processes
+    def __init__(self, max_entries=1024, ttl=None, path=None, max_disk_entries=None):
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1.")
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = os.fspath(path) if path is not None else None
+        self.max_disk_entries = max_disk_entries
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._counters = collections.Counter()
+        if self.path is not None:
+            with self._connect() as connection:
+                connection.execute(
+                    "CREATE TABLE IF NOT EXISTS results "
+                    "(key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL)"
+                )
+
+    def _connect(self):
+        # SQLite connections may not cross threads or a fork, so each thread
+        # of each process opens its own
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def _copy(self, value):
+        # Results nest lists and dicts (corrections, timings); callers must
+        # not be able to change what later hits return
+        return copy.deepcopy(value)
+
+    def _put_memory(self, key, value, expires):
+        self._entries[key] = (value, expires)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._counters["evictions"] += 1
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires = entry
+                if expires is None or expires > now:
+                    self._entries.move_to_end(key)
+                    self._counters["hits"] += 1
+                    return self._copy(value)
+                del self._entries[key]
+                self._counters["expirations"] += 1
+
+        if self.path is not None:
+            row = self._connect().execute(
+                "SELECT value, created FROM results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None:
+                age = time.time() - row[1]
+                if self.ttl is None or age < self.ttl:
+                    value = json.loads(row[0])
+                    expires = None if self.ttl is None else now + self.ttl - age
+                    with self._lock:
+                        self._put_memory(key, value, expires)
+                        self._counters["disk_hits"] += 1
+                    return self._copy(value)
+                self._connect().execute("DELETE FROM results WHERE key = ?", (key,))
+                with self._lock:
+                    self._counters["expirations"] += 1
+
+        with self._lock:
+            self._counters["misses"] += 1
+        return None
+
+    def set(self, key, value):
+        expires = None if self.ttl is None else time.monotonic() + self.ttl
+        with self._lock:
+            self._put_memory(key, self._copy(value), expires)
+            self._counters["sets"] += 1
+            prune = (
+                self.max_disk_entries is not None
+                and self._counters["sets"] % max(1, self.max_disk_entries // 10) == 0
+            )
+
+        if self.path is not None:
+            connection = self._connect()
+            connection.execute(
+                "INSERT OR REPLACE INTO results (key, value, created) VALUES (?, ?, ?)",
+                (key, json.dumps(value), time.time()),
+            )
+            if prune:
+                # Trimmed in batches so the oldest rows are not deleted on every insert
+                pruned = connection.execute(
+                    "DELETE FROM results WHERE key IN (SELECT key FROM results "
+                    "ORDER BY created DESC LIMIT -1 OFFSET ?)",
+                    (self.max_disk_entries,),
+                ).rowcount
+                with self._lock:
+                    self._counters["disk_evictions"] += max(0, pruned)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.path is not None:
+            self._connect().execute("DELETE FROM results")
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        with self._lock:
+            stats = {
+                name: self._counters[name]
+                for name in ("hits", "disk_hits", "misses", "evictions", "expirations", "sets")
+            }
+            stats["disk_evictions"] = self._counters["disk_evictions"]
+            stats["entries"] = len(self._entries)
+        return stats
+
+    def _after_fork(self):
+        self._lock = threading.Lock()
@@ -0,0 +1,153 @@
+import collections
+import math
+import threading
+
+import cv2
+import numpy as np
+
+from .ocrb import split_lines
+
+BINARIZATIONS = ("otsu", "adaptive")
+
+
+class Profile:
+    # One way of turning the segmentation mask into MRZ text
+    def __init__(
+        self,
+        name,
+        mask_threshold=0.25,
+        padding=10,
+        lowres=False,
+        deskew=False,
+        binarization="otsu",
+        scale=1.0,
+        per_line=False,
+    ):
+        if binarization not in BINARIZATIONS:
+            raise ValueError(f"Unsupported binarization: {binarization}")
+        self.name = name
+        self.mask_threshold = mask_threshold
+        self.padding = padding
+        self.lowres = lowres
+        self.deskew = deskew
+        self.binarization = binarization
+        self.scale = scale
+        self.per_line = per_line
+
+    def __repr__(self):
+        return f"Profile({self.name!r})"
+
+
+# Fastest first: the default path on the low-resolution box, then a looser and
+# wider box, a local threshold for uneven lighting, a deskewed crop and finally
+# one Tesseract run per line
+DEFAULT_PROFILES = (
+    Profile("fast", lowres=True),
+    Profile("wide", mask_threshold=0.1, padding=20, lowres=True),
+    Profile("adaptive", padding=15, lowres=True, binarization="adaptive", scale=2.0),
+    Profile("deskew", padding=15, deskew=True),
+    Profile("lines", padding=15, lowres=True, scale=2.0, per_line=True),
+)
+
+
+class Cascade:
+    def __init__(self, profiles=DEFAULT_PROFILES):
+        if not profiles:
+            raise ValueError("A cascade needs at least one profile.")
+        if len({profile.name for profile in profiles}) != len(profiles):
+            raise ValueError("Profile names must be unique.")
+        self.profiles = tuple(profiles)
+        self._lock = threading.Lock()
+        self._attempts = collections.Counter()
+        self._finished = collections.Counter()
+        self._documents = 0
+
+    def record(self, attempted, finished):
+        with self._lock:
+            self._documents += 1
+            self._attempts.update(profile.name for profile in attempted)
+            self._finished[finished.name if finished is not None else None] += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "documents": self._documents,
+                "unfinished": self._finished[None],
+                "profiles": {
+                    profile.name: {
+                        "attempts": self._attempts[profile.name],
+                        "finished": self._finished[profile.name],
+                    }
+                    for profile in self.profiles
+                },
+            }
+
+    def reset(self):
+        with self._lock:
+            self._attempts.clear()
+            self._finished.clear()
+            self._documents = 0
+
+    def _after_fork(self):
+        self._lock = threading.Lock()
+
+
+def largest_region(output_data, mask_threshold):
+    mask = np.uint8(output_data[0, :, :, 0] > mask_threshold) * 255
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    if len(contours) == 0:
+        return None
+    return max(contours, key=cv2.contourArea)
+
+
+def deskewed_crop(image, output_data, mask_threshold, padding):
+    # Rotate the image around the MRZ so its lines run horizontally and crop the
+    # rotated rectangle; the mask gives the angle at 256x256
+    contour = largest_region(output_data, mask_threshold)
+    if contour is None:
+        return None
+    scale = np.array(
+        [image.shape[1] / output_data.shape[2], image.shape[0] / output_data.shape[1]],
+        dtype=np.float32,
+    )
+    (center_x, center_y), (width, height), angle = cv2.minAreaRect(
+        contour.reshape(-1, 2).astype(np.float32) * scale
+    )
+    if width < height:
+        width, height, angle = height, width, angle - 90
+    matrix = cv2.getRotationMatrix2D((center_x, center_y), angle, 1.0)
+    rotated = cv2.warpAffine(
+        image, matrix, (image.shape[1], image.shape[0]), borderMode=cv2.BORDER_REPLICATE
+    )
+    x_start = max(0, int(center_x - width / 2) - padding)
+    y_start = max(0, int(center_y - height / 2) - padding)
+    x_end = min(image.shape[1], int(math.ceil(center_x + width / 2)) + padding)
+    y_end = min(image.shape[0], int(math.ceil(center_y + height / 2)) + padding)
+    if x_end <= x_start or y_end <= y_start:
+        return None
+    return rotated[y_start:y_end, x_start:x_end]
+
+
+def binarize(roi, profile):
+    roi_gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY) if roi.ndim == 3 else roi
+    if profile.scale != 1.0:
+        roi_gray = cv2.resize(
+            roi_gray, None, fx=profile.scale, fy=profile.scale, interpolation=cv2.INTER_CUBIC
+        )
+    if profile.binarization == "adaptive":
+        # A neighbourhood of about one text line copes with shadows and glare
+        block_size = max(11, roi_gray.shape[0] // 4 | 1)
+        return cv2.adaptiveThreshold(
+            roi_gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, block_size, 15
+        )
+    return cv2.threshold(roi_gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
+
+
+def line_images(roi_threshold, padding=4):
+    ink = roi_threshold < 128
+    if ink.mean() > 0.5:
+        ink = ~ink
+    return [
+        roi_threshold[max(0, start - padding) : end + padding]
+        for start, end in split_lines(ink)
+    ]
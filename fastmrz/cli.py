@@ -0,0 +1,387 @@
+import argparse
+import csv
+import glob
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff", ".webp")
+CSV_FIELDS = [
+    "path",
+    "status",
+    "status_message",
+    "mrz_type",
+    "document_code",
+    "issuer_code",
+    "surname",
+    "given_name",
+    "document_number",
+    "document_number_checkdigit",
+    "nationality_code",
+    "birth_date",
+    "birth_date_checkdigit",
+    "sex",
+    "expiry_date",
+    "expiry_date_checkdigit",
+    "optional_data",
+    "optional_data_checkdigit",
+    "optional_data_1",
+    "optional_data_2",
+    "final_checkdigit",
+    "mrz_text",
+]
+
+# Each scan worker process builds its FastMRZ once and reuses it for every task
+_worker_mrz = None
+_worker_options = None
+
+
+def _init_worker(options):
+    global _worker_mrz, _worker_options
+    from .fastmrz import FastMRZ
+
+    _worker_options = options
+    _worker_mrz = FastMRZ(
+        tesseract_path=options["tesseract_path"],
+        tessdata_path=options["tessdata_path"],
+        ocr_backend=options["ocr_backend"],
+        **_inference_options(options),
+    )
+
+
+def _scan_one(path):
+    try:
+        result = _worker_mrz.get_details(
+            path, include_checkdigit=_worker_options["include_checkdigit"]
+        )
+    except Exception as error:
+        result = {"status": "FAILURE", "status_message": str(error)}
+
+    return path, result
+
+
+def _collect_paths(sources, manifest, recursive, extensions):
+    # Manifest entries and explicit files are taken as given; directory and
+    # glob matches are filtered by extension
+    paths = []
+    if manifest:
+        manifest_file = sys.stdin if manifest == "-" else open(manifest, encoding="utf8")
+        with manifest_file:
+            for line in manifest_file:
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    paths.append(line)
+
+    for source in sources:
+        if os.path.isdir(source):
+            if recursive:
+                matches = []
+                for root, dirs, files in os.walk(source):
+                    dirs.sort()
+                    matches.extend(os.path.join(root, name) for name in sorted(files))
+            else:
+                matches = [
+                    entry.path
+                    for entry in sorted(os.scandir(source), key=lambda entry: entry.name)
+                    if entry.is_file()
+                ]
+        elif any(char in source for char in "*?["):
+            matches = sorted(glob.iglob(source, recursive=True))
+        else:
+            paths.append(source)
+            continue
+        paths.extend(path for path in matches if path.lower().endswith(extensions))
+
+    return list(dict.fromkeys(paths))
+
+
+def _read_checkpoint(checkpoint):
+    if not checkpoint or not os.path.exists(checkpoint):
+        return set()
+    with open(checkpoint, encoding="utf8") as checkpoint_file:
+        return {line.rstrip("\n") for line in checkpoint_file if line.strip()}
+
+
+class _ResultWriter:
+    def __init__(self, output, output_format, append):
+        if output in (None, "-"):
+            self._file = sys.stdout
+            self._close = False
+        else:
+            self._file = open(output, "a" if append else "w", encoding="utf8", newline="")
+            self._close = True
+        self._csv = None
+        if output_format == "csv":
+            self._csv = csv.DictWriter(self._file, CSV_FIELDS, extrasaction="ignore")
+            if not (append and self._close and self._file.tell() > 0):
+                self._csv.writeheader()
+
+    def write(self, path, result):
+        record = {"path": path}
+        record.update(result)
+        if self._csv is not None:
+            self._csv.writerow(record)
+        else:
+            self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+
+    def close(self):
+        if self._close:
+            self._file.close()
+
+
+def _report_progress(done, total, successes, started, final=False):
+    elapsed = max(time.monotonic() - started, 1e-9)
+    sys.stderr.write(
+        f"\r{done}/{total} documents, {successes} successful, "
+        f"{done / elapsed:.1f} docs/s, {elapsed:.0f}s elapsed"
+        + ("\n" if final else "")
+    )
+    sys.stderr.flush()
+
+
+def scan(args):
+    paths = _collect_paths(
+        args.sources,
+        args.manifest,
+        args.recursive,
+        tuple(extension.lower() for extension in args.extensions),
+    )
+    completed = _read_checkpoint(args.checkpoint)
+    pending = [path for path in paths if path not in completed]
+
+    options = {
+        "tesseract_path": args.tesseract_path,
+        "tessdata_path": args.tessdata_path,
+        "ocr_backend": args.ocr_backend,
+        "include_checkdigit": not args.no_checkdigit,
+        **_inference_options(vars(args)),
+    }
+    writer = _ResultWriter(args.output, args.format, append=bool(completed))
+    checkpoint_file = (
+        open(args.checkpoint, "a", encoding="utf8") if args.checkpoint else None
+    )
+
+    started = time.monotonic()
+    last_report = started
+    done = successes = 0
+    try:
+        with multiprocessing.Pool(
+            args.workers or os.cpu_count() or 1, _init_worker, (options,)
+        ) as pool:
+            # Unordered results let fast workers stream past slow documents
+            mapper = pool.imap if args.ordered else pool.imap_unordered
+            for path, result in mapper(_scan_one, pending, chunksize=args.chunksize):
+                writer.write(path, result)
+                if checkpoint_file is not None:
+                    checkpoint_file.write(path + "\n")
+                    checkpoint_file.flush()
+                done += 1
+                successes += result.get("status") == "SUCCESS"
+                now = time.monotonic()
+                if not args.quiet and now - last_report >= args.progress_interval:
+                    _report_progress(done, len(pending), successes, started)
+                    last_report = now
+    finally:
+        writer.close()
+        if checkpoint_file is not None:
+            checkpoint_file.close()
+
+    if not args.quiet:
+        _report_progress(done, len(pending), successes, started, final=True)
+        if completed:
+            sys.stderr.write(f"Skipped {len(paths) - len(pending)} checkpointed documents\n")
+
+    return 0
+
+
+def serve(args):
+    from .fastmrz import FastMRZ
+    from .server import MRZServer
+
+    fast_mrz = FastMRZ(
+        tesseract_path=args.tesseract_path,
+        tessdata_path=args.tessdata_path,
+        ocr_backend=args.ocr_backend,
+        ocr_pool_size=args.ocr_workers,
+        metrics=True,
+        cache=args.cache or None,
+        gate=args.gate or None,
+        cascade=args.cascade or None,
+        buffers=args.reuse_buffers or None,
+        **_inference_options(vars(args)),
+    )
+    if not args.no_warmup:
+        # The model and OCR engines load now rather than on the first request
+        timings = fast_mrz.warmup()
+        if not args.quiet:
+            sys.stderr.write(f"Warmed up in {timings['total'] * 1000:.0f} ms\n")
+    server = MRZServer(
+        fast_mrz,
+        (args.host, args.port),
+        max_batch_size=args.max_batch_size,
+        max_wait=args.max_wait_ms / 1000,
+        max_pending=args.max_pending,
+        ocr_workers=args.ocr_workers,
+        timeout=args.timeout,
+        allow_paths=args.allow_paths,
+        quiet=args.quiet,
+    )
+    host, port = server.server_address[:2]
+    sys.stderr.write(f"Serving MRZ extraction on http://{host}:{port}/mrz\n")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        fast_mrz.close()
+
+    return 0
+
+
+def _inference_options(options):
+    return {
+        key: options[key]
+        for key in ("inference_backend", "model", "intra_op_threads", "inter_op_threads")
+    }
+
+
+def _add_ocr_arguments(parser):
+    parser.add_argument("--tesseract-path", default="")
+    parser.add_argument("--tessdata-path", default="")
+    parser.add_argument(
+        "--ocr-backend", choices=("auto", "pytesseract", "tesserocr"), default="auto"
+    )
+    parser.add_argument(
+        "--inference-backend", choices=("opencv", "onnxruntime"), default="opencv"
+    )
+    parser.add_argument(
+        "--model",
+        default="float",
+        help="Segmentation model: float, int8, fp16 or the path of an ONNX file",
+    )
+    parser.add_argument(
+        "--intra-op-threads", type=int, help="Threads one segmentation run may use"
+    )
+    parser.add_argument(
+        "--inter-op-threads",
+        type=int,
+        help="Threads running independent graph nodes in parallel (onnxruntime only)",
+    )
+
+
+def _build_parser():
+    parser = argparse.ArgumentParser(
+        prog="fastmrz",
+        description="Extracts the Machine Readable Zone (MRZ) data from document images",
+    )
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.required = True
+
+    scan_parser = subparsers.add_parser(
+        "scan", help="Extract MRZ data from many images in parallel"
+    )
+    scan_parser.add_argument(
+        "sources", nargs="*", help="Image files, directories or glob patterns"
+    )
+    scan_parser.add_argument(
+        "-m", "--manifest", help="File listing one image path per line ('-' for stdin)"
+    )
+    scan_parser.add_argument(
+        "-r", "--recursive", action="store_true", help="Descend into subdirectories"
+    )
+    scan_parser.add_argument(
+        "--extensions",
+        nargs="+",
+        default=list(IMAGE_EXTENSIONS),
+        help="File extensions picked up from directories and globs",
+    )
+    scan_parser.add_argument("-o", "--output", help="Output file (default: stdout)")
+    scan_parser.add_argument("-f", "--format", choices=("ndjson", "csv"), default="ndjson")
+    scan_parser.add_argument(
+        "-w", "--workers", type=int, help="Worker processes (default: CPU count)"
+    )
+    scan_parser.add_argument(
+        "--chunksize", type=int, default=4, help="Documents handed to a worker at once"
+    )
+    scan_parser.add_argument(
+        "--ordered", action="store_true", help="Write results in input order"
+    )
+    scan_parser.add_argument(
+        "--checkpoint",
+        help="File recording finished paths; an existing checkpoint resumes the scan",
+    )
+    scan_parser.add_argument(
+        "--progress-interval", type=float, default=1.0, help="Seconds between progress lines"
+    )
+    scan_parser.add_argument("-q", "--quiet", action="store_true", help="No progress output")
+    _add_ocr_arguments(scan_parser)
+    scan_parser.add_argument(
+        "--no-checkdigit", action="store_true", help="Leave check digits out of results"
+    )
+    scan_parser.set_defaults(handler=scan)
+
+    serve_parser = subparsers.add_parser(
+        "serve", help="Serve MRZ extraction over HTTP with micro-batching"
+    )
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("-p", "--port", type=int, default=8000)
+    serve_parser.add_argument(
+        "--max-batch-size", type=int, default=8, help="Images per segmentation batch"
+    )
+    serve_parser.add_argument(
+        "--max-wait-ms",
+        type=float,
+        default=10.0,
+        help="Longest wait for a batch to fill, in milliseconds",
+    )
+    serve_parser.add_argument(
+        "--max-pending",
+        type=int,
+        default=64,
+        help="Images in flight before requests are refused with 503",
+    )
+    serve_parser.add_argument(
+        "--ocr-workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="OCR threads (default: CPU count)",
+    )
+    serve_parser.add_argument(
+        "--timeout", type=float, default=30.0, help="Seconds a request may take"
+    )
+    serve_parser.add_argument(
+        "--allow-paths", action="store_true", help="Accept server-side image paths"
+    )
+    serve_parser.add_argument("--cache", action="store_true", help="Cache results in memory")
+    serve_parser.add_argument(
+        "--gate", action="store_true", help="Reject images without an MRZ before OCR"
+    )
+    serve_parser.add_argument(
+        "--cascade", action="store_true", help="Retry failed reads with slower profiles"
+    )
+    serve_parser.add_argument(
+        "--reuse-buffers",
+        action="store_true",
+        help="Preprocess into per-thread buffers instead of new arrays per image",
+    )
+    serve_parser.add_argument(
+        "--no-warmup", action="store_true", help="Load the model on the first request instead"
+    )
+    serve_parser.add_argument("-q", "--quiet", action="store_true", help="No request log")
+    _add_ocr_arguments(serve_parser)
+    serve_parser.set_defaults(handler=serve)
+
+    return parser
+
+
+def main(argv=None):
+    parser = _build_parser()
+    args = parser.parse_args(argv)
+    if args.command == "scan" and not (args.sources or args.manifest):
+        parser.error("scan needs at least one source or --manifest")
+
+    return args.handler(args)
@@ -0,0 +1,184 @@
+import functools
+import itertools
+import time
+
+from .result import FIELD_LAYOUTS, _mrz_type, char_value
+
+# Characters OCR confuses in OCR-B, digit first
+LOOKALIKES = ("0ODQ", "1IL", "2Z", "4A", "5S", "6G", "7T", "8B")
+_ALTERNATIVES = {char: group.replace(char, "") for group in LOOKALIKES for char in group}
+_TO_DIGIT = {char: group[0] for group in LOOKALIKES for char in group[1:]}
+_TO_LETTER = {group[0]: group[1] for group in LOOKALIKES}
+_WEIGHTS = (7, 3, 1)
+
+# Fields ICAO 9303 restricts to one character class
+_LETTER_FIELDS = ("document_code", "issuer_code", "names", "nationality_code")
+_DIGIT_FIELDS = ("birth_date", "expiry_date")
+
+
+@functools.lru_cache(maxsize=None)
+def _layout(mrz_type, line_length):
+    # The parser's field layout as slices (line, start, end). "letters" and
+    # "digits" are positions restricted to one character class; each check is
+    # (covered slices, check digit position, slices a search may change).
+    layout = {"letters": [], "digits": [], "checks": [], "final": None}
+    checked = set()
+    for field, place, read, check in FIELD_LAYOUTS[mrz_type]:
+        slices = [
+            (line, start, line_length if stop is None else stop)
+            for line, start, stop in (place if isinstance(place, list) else [place])
+        ]
+        if field in _LETTER_FIELDS:
+            layout["letters"] += slices
+        elif field in _DIGIT_FIELDS:
+            layout["digits"] += slices
+        if not isinstance(check, tuple):
+            continue
+        line, index = check
+        position = (line, index % line_length)
+        layout["digits"].append((line, position[1], position[1] + 1))
+        if field == "final":
+            # The composite check can only locate errors that no other check
+            # digit covers
+            editable = [
+                (line, i, i + 1) for line, i in _positions(slices) if (line, i) not in checked
+            ]
+            layout["final"] = (slices, position, editable)
+        else:
+            layout["checks"].append((slices, position, [] if field in _DIGIT_FIELDS else slices))
+            checked.update(_positions(slices))
+            checked.add(position)
+    return layout
+
+
+class BudgetExceeded(Exception):
+    pass
+
+
+def _positions(slices):
+    return [(line, i) for line, start, end in slices for i in range(start, end)]
+
+
+class MRZCorrector:
+    # Repairs look-alike substitutions (0/O, 1/I, 5/S, 8/B, ...) in OCR output:
+    # first by forcing the character class of letter-only and digit-only
+    # positions, then by searching substitutions in alphanumeric fields until
+    # the check digits agree. A correction is only returned when exactly one
+    # candidate with the fewest changes makes the whole MRZ valid.
+    def __init__(self, max_changes=2, max_candidates=2000, time_budget=0.005):
+        self.max_changes = max_changes
+        self.max_candidates = max_candidates
+        self.time_budget = time_budget
+
+    def correct(self, parser, mrz_text):
+        lines = mrz_text.split("\n") if mrz_text else []
+        mrz_type = _mrz_type(lines)
+        if mrz_type is None or self._is_valid(parser, mrz_text):
+            return mrz_text, []
+
+        layout = _layout(mrz_type, len(lines[0]))
+        chars = [list(line) for line in lines]
+        changes = []
+        for positions, mapping in (
+            (_positions(layout["letters"]), _TO_LETTER),
+            (_positions(layout["digits"]), _TO_DIGIT),
+        ):
+            for line, i in positions:
+                if chars[line][i] in mapping:
+                    changes.append(self._change(line, i, chars[line][i], mapping[chars[line][i]]))
+                    chars[line][i] = mapping[chars[line][i]]
+
+        self._deadline = time.perf_counter() + self.time_budget
+        self._candidates = 0
+        try:
+            best = self._search(parser, layout, chars)
+        except BudgetExceeded:
+            best = None
+        if best is None:
+            return mrz_text, []
+
+        for line, i, char in best:
+            changes.append(self._change(line, i, chars[line][i], char))
+            chars[line][i] = char
+        return "\n".join("".join(line) for line in chars), changes
+
+    def _change(self, line, position, old, new):
+        return {"line": line + 1, "position": position + 1, "from": old, "to": new}
+
+    def _is_valid(self, parser, mrz_text):
+        return parser._parse_mrz_or_failure(mrz_text)["status"] == "SUCCESS"
+
+    def _spend(self, count=1):
+        self._candidates += count
+        if self._candidates > self.max_candidates or time.perf_counter() > self._deadline:
+            raise BudgetExceeded()
+
+    def _check_candidates(self, chars, check):
+        # Substitution sets within the editable positions that make the check
+        # digit agree, fewest changes first. Each substitution shifts the
+        # weighted sum by a known amount, so candidates are scored without
+        # rebuilding the field.
+        covered, (check_line, check_i), editable = check
+        check_char = chars[check_line][check_i]
+        if not check_char.isdigit():
+            return []
+        weights = {
+            position: _WEIGHTS[offset % 3] for offset, position in enumerate(_positions(covered))
+        }
+        total = sum(char_value(chars[line][i]) * weights[(line, i)] for line, i in weights)
+        if total % 10 == int(check_char):
+            return [()]
+
+        options = [
+            (
+                line,
+                i,
+                alternative,
+                (char_value(alternative) - char_value(chars[line][i])) * weights[(line, i)],
+            )
+            for line, i in _positions(editable)
+            for alternative in _ALTERNATIVES.get(chars[line][i], "")
+        ]
+        for size in range(1, self.max_changes + 1):
+            found = []
+            for combination in itertools.combinations(options, size):
+                self._spend()
+                if len({option[:2] for option in combination}) < size:
+                    continue
+                if (total + sum(option[3] for option in combination)) % 10 == int(check_char):
+                    found.append(tuple(option[:3] for option in combination))
+            if found:
+                return found
+        return []
+
+    def _search(self, parser, layout, chars):
+        candidate_sets = []
+        for check in layout["checks"]:
+            candidates = self._check_candidates(chars, check)
+            if not candidates:
+                return None
+            candidate_sets.append(candidates)
+        if layout["final"] is not None and all(candidates == [()] for candidates in candidate_sets):
+            # Only the composite check fails: the error sits in a field that has
+            # no check digit of its own
+            candidates = self._check_candidates(chars, layout["final"])
+            if not candidates:
+                return None
+            candidate_sets.append(candidates)
+
+        solutions = []
+        for combination in itertools.product(*candidate_sets):
+            self._spend()
+            substitutions = [substitution for group in combination for substitution in group]
+            if solutions and len(substitutions) > len(solutions[0]):
+                continue
+            candidate = [list(line) for line in chars]
+            for line, i, char in substitutions:
+                candidate[line][i] = char
+            if self._is_valid(parser, "\n".join("".join(line) for line in candidate)):
+                if solutions and len(substitutions) < len(solutions[0]):
+                    solutions = []
+                solutions.append(substitutions)
+
+        # Two equally small corrections that both validate cannot be told apart
+        return solutions[0] if len(solutions) == 1 else None
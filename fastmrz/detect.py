@@ -0,0 +1,97 @@
+from ._lazy import LazyModule
+
+# FastMRZ catches MRZNotFound on every image call, so importing this module
+# must not pull in OpenCV and NumPy
+cv2 = LazyModule("cv2")
+np = LazyModule("numpy")
+
+
+class MRZNotFound(ValueError):
+    def __init__(self, reason, confidence=0.0):
+        super().__init__(f"No MRZ detected: {reason}")
+        self.reason = reason
+        self.confidence = confidence
+
+
+class MRZGate:
+    # Decides from the segmentation mask and the thresholded crop whether an
+    # image holds an MRZ at all, so selfies and card backs skip Tesseract. The
+    # checks, cheapest first: how much of the mask is set, whether its largest
+    # region is a wide solid rectangle, and whether the crop holds rows of
+    # glyph-sized components.
+    def __init__(
+        self,
+        mask_threshold=0.25,
+        min_coverage=0.002,
+        min_aspect=2.0,
+        min_glyphs=20,
+        min_confidence=0.3,
+    ):
+        self.mask_threshold = mask_threshold
+        self.min_coverage = min_coverage
+        self.min_aspect = min_aspect
+        self.min_glyphs = min_glyphs
+        self.min_confidence = min_confidence
+
+    def check_mask(self, output_data, image_shape):
+        # Returns the confidence of the largest mask region; raises MRZNotFound
+        probabilities = output_data[0, :, :, 0]
+        mask = np.uint8(probabilities > self.mask_threshold)
+        if mask.mean() < self.min_coverage:
+            raise MRZNotFound("segmentation mask is empty")
+
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        contour = max(contours, key=cv2.contourArea)
+        # The mask is square whatever the image is, so the shape is measured
+        # in image proportions
+        scale = np.array(
+            [image_shape[1] / mask.shape[1], image_shape[0] / mask.shape[0]], dtype=np.float32
+        )
+        points = contour.reshape(-1, 2).astype(np.float32) * scale
+        _, (width, height), _ = cv2.minAreaRect(points)
+        if min(width, height) == 0:
+            raise MRZNotFound("MRZ region is too small")
+        aspect = max(width, height) / min(width, height)
+        rectangularity = min(1.0, cv2.contourArea(points) / (width * height))
+
+        region = np.zeros_like(mask)
+        cv2.drawContours(region, [contour], -1, 1, thickness=cv2.FILLED)
+        confidence = float(probabilities[region > 0].mean()) * rectangularity
+        if aspect < self.min_aspect:
+            raise MRZNotFound(
+                f"region aspect ratio {aspect:.1f} is below {self.min_aspect}", confidence
+            )
+        if confidence < self.min_confidence:
+            raise MRZNotFound(
+                f"confidence {confidence:.2f} is below {self.min_confidence}", confidence
+            )
+
+        return confidence
+
+    def count_glyphs(self, roi_threshold):
+        ink = roi_threshold < 128
+        if ink.mean() > 0.5:
+            ink = ~ink
+        _, _, stats, _ = cv2.connectedComponentsWithStats(np.uint8(ink), connectivity=8)
+        # Glyphs of two or three text lines span a twelfth (a padded crop of a
+        # small image) to two thirds of the crop height and are never much
+        # wider than tall
+        heights = stats[1:, cv2.CC_STAT_HEIGHT]
+        widths = stats[1:, cv2.CC_STAT_WIDTH]
+        crop_height = roi_threshold.shape[0]
+        glyphs = (
+            (heights >= max(3, crop_height / 12))
+            & (heights <= crop_height / 1.5)
+            & (widths <= 2 * heights)
+        )
+        return int(np.count_nonzero(glyphs))
+
+    def check_lines(self, roi_threshold, confidence):
+        # Returns the confidence adjusted for the line structure; raises MRZNotFound
+        glyphs = self.count_glyphs(roi_threshold)
+        if glyphs < self.min_glyphs:
+            raise MRZNotFound(
+                f"{glyphs} glyph-sized components, {self.min_glyphs} needed", confidence
+            )
+
+        return confidence * min(1.0, glyphs / (2 * self.min_glyphs))
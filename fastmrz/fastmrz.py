@@ -1,48 +1,397 @@
-import base64
+import binascii
+import collections
+import contextvars
+import functools
+import hashlib
+import math
+import mmap
 import os
-from datetime import datetime
-from io import BytesIO
+import threading
+import time
+import weakref
+from contextlib import closing, contextmanager, nullcontext
+
+from ._lazy import LazyModule
+from .detect import MRZNotFound
+from .inference import INFERENCE_BACKENDS, get_model_path
+from .result import (
+    MRZResult,
+    adjust_birth_date,
+    checkdigit,
+    final_checkdigit,
+    format_date,
+    parse_lines,
+)
+
+# OpenCV and NumPy are only imported once an image is processed, asyncio once
+# the coroutine API is used
+cv2 = LazyModule("cv2")
+np = LazyModule("numpy")
+asyncio = LazyModule("asyncio")
+
+_BASE64_ALPHABET = b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/="
+_BASE64_DISCARD = bytes(set(range(256)) - set(_BASE64_ALPHABET))
+_BASE64_CHUNK_SIZE = 1 << 20
+_IMREAD_REDUCED_SCALE = 8
+_BYTES_TYPES = (bytes, bytearray, memoryview, mmap.mmap)
+_NO_STAGE = nullcontext()
+_WARMUP_MRZ = (
+    "P<UTOERIKSSON<<ANNA<MARIA<<<<<<<<<<<<<<<<<<<\n"
+    "L898902C36UTO7408122F1204159ZE184226B<<<<<10"
+)
+# Every live instance, so that the child of a fork can rebuild what does not
+# survive one
+_INSTANCES = weakref.WeakSet()
+
+
+def _after_fork_in_child():
+    for fast_mrz in list(_INSTANCES):
+        fast_mrz._after_fork()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def _import_tesserocr():
+    # tesserocr installs signal handlers on import, which only works on the
+    # main thread; once imported there, any thread can create the OCR backend
+    if threading.current_thread() is threading.main_thread():
+        try:
+            import tesserocr  # noqa: F401
+        except ImportError:
+            pass
+
+
+@functools.lru_cache(maxsize=None)
+def _unit_scale_table():
+    # Exactly what np.float32(image / 255) gives for each uint8 value
+    return np.float32(np.arange(256) / 255)
 
-import cv2
-import numpy as np
-import pytesseract
-from PIL import Image
+
+def _render_mrz(mrz_text):
+    lines = mrz_text.split("\n")
+    image = np.full((40 * len(lines) + 20, 900, 3), 255, dtype=np.uint8)
+    for i, line in enumerate(lines):
+        cv2.putText(
+            image, line, (10, 40 * (i + 1)), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 0), 2
+        )
+    return image
 
 
 class FastMRZ:
-    def __init__(self, tesseract_path="", tessdata_path=""):
+    def __init__(
+        self,
+        tesseract_path="",
+        tessdata_path="",
+        ocr_backend="auto",
+        ocr_pool_size=None,
+        workers=None,
+        max_concurrency=None,
+        fast_preprocess=False,
+        reduced_decode=False,
+        cache=None,
+        metrics=None,
+        ocrb=None,
+        correction=None,
+        cascade=None,
+        gate=None,
+        result_type="dict",
+        inference_backend="opencv",
+        model="float",
+        intra_op_threads=None,
+        inter_op_threads=None,
+        buffers=None,
+    ):
+        if workers is not None and workers < 1:
+            raise ValueError("workers must be at least 1.")
+        if result_type not in ("dict", "object"):
+            raise ValueError(f"Unsupported result_type: {result_type}")
+        if isinstance(inference_backend, str) and inference_backend not in INFERENCE_BACKENDS:
+            raise ValueError(f"Unsupported inference_backend: {inference_backend}")
         self.tesseract_path = tesseract_path
         self.tessdata_path = tessdata_path
-        self.net = cv2.dnn.readNetFromONNX(
-            os.path.join(os.path.dirname(__file__), "model/mrz_seg.onnx")
-        )
+        self.workers = workers or 1
+        # Tesseract runs as a subprocess outside the thread pool, so more
+        # documents than workers can usefully be in flight
+        self.max_concurrency = max_concurrency or max(self.workers, os.cpu_count() or 1)
+        self.fast_preprocess = fast_preprocess
+        self.reduced_decode = reduced_decode
+        self.ocr_backend = ocr_backend
+        self.ocr_pool_size = ocr_pool_size or workers
+        if ocr_backend in ("auto", "tesserocr"):
+            _import_tesserocr()
+        if cache is True:
+            from .cache import ResultCache
+
+            cache = ResultCache()
+        self.cache = cache if cache is not False else None
+        if metrics is True:
+            from .metrics import Metrics
+
+            metrics = Metrics()
+        self.metrics = metrics if metrics is not False else None
+        if ocrb is True:
+            from .ocrb import OCRBRecognizer
+
+            ocrb = OCRBRecognizer()
+        self.ocrb = ocrb if ocrb is not False else None
+        if correction is True:
+            from .correction import MRZCorrector
+
+            correction = MRZCorrector()
+        self.correction = correction if correction is not False else None
+        if cascade is True or isinstance(cascade, (list, tuple)):
+            from .cascade import Cascade
+
+            cascade = Cascade() if cascade is True else Cascade(cascade)
+        self.cascade = cascade if cascade is not False else None
+        if gate is True:
+            from .detect import MRZGate
+
+            gate = MRZGate()
+        self.gate = gate if gate is not False else None
+        if buffers is True:
+            from .buffers import BufferPool
+
+            buffers = BufferPool()
+        self.buffers = buffers if buffers is not False else None
+        self.result_type = result_type
+        self.inference_backend = inference_backend
+        self.model_path = get_model_path(model)
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+        # The OCR engine and the segmentation nets are loaded on first image use
+        self._ocr = None
+        self._net_pool = None
+        self._load_lock = threading.Lock()
+        self._batch_forward = True
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._async_limit = None
+        _INSTANCES.add(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+        if self._ocr is not None and hasattr(self._ocr, "close"):
+            self._ocr.close()
+
+    def warmup(self):
+        # Loads the segmentation model and the OCR engines and runs a synthetic
+        # MRZ through them, so the first request pays for neither. Called
+        # before worker processes are forked, the children share all of it
+        # copy-on-write. Returns the seconds each step took.
+        timings = {}
+        started = step = time.perf_counter()
+
+        def lap(name):
+            nonlocal step
+            now = time.perf_counter()
+            timings[name] = now - step
+            step = now
+
+        net_pool = self._get_net_pool()
+        ocr = self.ocr
+        lap("load")
+        image_array = np.zeros((1, 256, 256, 3), dtype=np.float32)
+        if hasattr(net_pool, "warmup"):
+            net_pool.warmup(image_array)
+        else:
+            net_pool.forward(image_array)
+        lap("forward")
+        image = _render_mrz(_WARMUP_MRZ)
+        roi_threshold = self._threshold_roi(image, (0, 0, image.shape[1], image.shape[0]))
+        if hasattr(ocr, "warmup"):
+            ocr.warmup(roi_threshold)
+        else:
+            ocr.recognize(roi_threshold, psm=6)
+        if self.ocrb is not None:
+            self.ocrb.recognize(roi_threshold)
+        lap("ocr")
+        self._parse_mrz_or_failure(_WARMUP_MRZ)
+        lap("parse")
+        timings["total"] = step - started
+
+        return timings
+
+    def _after_fork(self):
+        # Runs in the child of a fork. The nets and OCR engines are kept and
+        # stay shared with the parent; locks, the thread pool and other
+        # per-process handles are rebuilt
+        self._load_lock = threading.Lock()
+        self._executor_lock = threading.Lock()
+        self._executor = None
+        self._async_limit = None
+        for component in (
+            self._net_pool,
+            self._ocr,
+            self.cache,
+            self.metrics,
+            self.cascade,
+            self.ocrb,
+            self.buffers,
+        ):
+            if hasattr(component, "_after_fork"):
+                component._after_fork()
+
+    @property
+    def ocr(self):
+        if self._ocr is None:
+            with self._load_lock:
+                if self._ocr is None:
+                    from .ocr import get_ocr_backend
+
+                    self._ocr = get_ocr_backend(
+                        self.ocr_backend,
+                        self.tesseract_path,
+                        self.tessdata_path,
+                        pool_size=self.ocr_pool_size,
+                    )
+        return self._ocr
+
+    @property
+    def net(self):
+        return self._get_net_pool().net
+
+    def _get_net_pool(self):
+        if self._net_pool is None:
+            with self._load_lock:
+                if self._net_pool is None:
+                    from .inference import get_inference_backend
+
+                    self._net_pool = get_inference_backend(
+                        self.inference_backend,
+                        self.model_path,
+                        pool_size=self.workers,
+                        intra_op_threads=self.intra_op_threads,
+                        inter_op_threads=self.inter_op_threads,
+                    )
+        return self._net_pool
+
+    def _stage(self, name, cpu=True):
+        # Instrumentation costs one attribute check when metrics are disabled
+        if self.metrics is None:
+            return _NO_STAGE
+        return self.metrics.stage(name, cpu=cpu)
+
+    def _read_image(self, image):
+        if isinstance(image, (str, os.PathLike)):
+            return self._imagepath_to_array(image)
+        return image
 
-    def _process_image(self, image_path):
-        image = (
-            cv2.imread(image_path, cv2.IMREAD_COLOR)
-            if isinstance(image_path, str)
-            else image_path
-        )
+    def _process_image(self, image_path, reuse=False):
+        image = self._read_image(image_path)
 
-        image = cv2.resize(image, (256, 256), interpolation=cv2.INTER_NEAREST)
-        image = np.asarray(np.float32(image / 255))
+        with self._stage("preprocess"):
+            # Anything but 8-bit colour images takes the default path
+            if self.buffers is not None and image.dtype == np.uint8 and image.shape[2:3] >= (3,):
+                return self._process_image_buffered(image, reuse)
+            image = cv2.resize(image, (256, 256), interpolation=cv2.INTER_NEAREST)
+            image = np.asarray(np.float32(image / 255))
 
-        if len(image.shape) >= 3:
-            image = image[:, :, :3]
-        image = np.reshape(image, (1, 256, 256, 3))
+            if len(image.shape) >= 3:
+                image = image[:, :, :3]
+            image = np.reshape(image, (1, 256, 256, 3))
 
         return image
 
-    def _get_roi(self, output_data, image_path):
-        if self.tesseract_path != "":
-            pytesseract.pytesseract.tesseract_cmd = self.tesseract_path
-        image = (
-            cv2.imread(image_path, cv2.IMREAD_COLOR)
-            if isinstance(image_path, str)
-            else image_path
+    def _process_image_buffered(self, image, reuse):
+        # The nearest-neighbour resize goes to a uint8 scratch array and one
+        # table lookup turns it into the float32 blob, with no float64 copy.
+        # With reuse the blob is scratch space too, valid until this thread
+        # preprocesses its next image.
+        resized = cv2.resize(
+            image,
+            (256, 256),
+            dst=self.buffers.get("resized", (256, 256, image.shape[2]), np.uint8),
+            interpolation=cv2.INTER_NEAREST,
         )
+        if reuse:
+            image_array = self.buffers.get("blob", (1, 256, 256, 3), np.float32)
+        else:
+            image_array = np.empty((1, 256, 256, 3), dtype=np.float32)
+        cv2.LUT(resized[:, :, :3], _unit_scale_table(), dst=image_array[0])
+
+        return image_array
+
+    def _forward_image(self, image):
+        return self._forward(self._process_image(image, reuse=True))
+
+    def _get_roi(self, output_data, image_path):
+        return self._recognize_roi(self._get_roi_image(output_data, image_path))
+
+    def _recognize_roi(self, roi_threshold):
+        if roi_threshold is None:
+            return ""
+        mrz_text = self._recognize_ocrb(roi_threshold)
+        if mrz_text:
+            return mrz_text
+
+        # Page segmentation mode 6 (single uniform block) suits the MRZ lines
+        with self._stage("ocr"):
+            mrz_text = self.ocr.recognize(roi_threshold, psm=6)
+        self._learn_ocrb(roi_threshold, mrz_text)
+
+        return mrz_text
+
+    def _passes_checkdigits(self, mrz_text):
+        return self._parse_mrz_or_failure(self._cleanse_roi(mrz_text))["status"] == "SUCCESS"
 
-        output_data = (output_data[0, :, :, 0] > 0.25) * 1
+    def _recognize_ocrb(self, roi_threshold):
+        # The OCR-B fast path only counts when its read passes the check
+        # digits; anything else goes to Tesseract
+        if self.ocrb is None:
+            return ""
+        with self._stage("ocrb"):
+            mrz_text = self.ocrb.recognize(roi_threshold)
+        return mrz_text if mrz_text and self._passes_checkdigits(mrz_text) else ""
+
+    def _learn_ocrb(self, roi_threshold, mrz_text):
+        if self.ocrb is not None and self.ocrb.learn_enabled and self._passes_checkdigits(mrz_text):
+            self.ocrb.learn(roi_threshold, self._cleanse_roi(mrz_text))
+
+    def _get_roi_image(self, output_data, image_path):
+        image = self._read_image(image_path)
+        confidence = self._gate_mask(output_data, image.shape)
+        with self._stage("roi"):
+            roi_box = self._get_roi_box(output_data, image)
+            if roi_box is None:
+                return None
+
+            roi_threshold = self._threshold_roi(image, roi_box)
+        self._gate_lines(roi_threshold, confidence)
+
+        return roi_threshold
+
+    def _gate_mask(self, output_data, image_shape):
+        # Both gate checks raise MRZNotFound, which stops the image before OCR
+        if self.gate is None:
+            return None
+        with self._stage("gate"):
+            return self.gate.check_mask(output_data, image_shape)
+
+    def _gate_lines(self, roi_threshold, confidence):
+        if confidence is None or roi_threshold is None:
+            return confidence
+        with self._stage("gate"):
+            return self.gate.check_lines(roi_threshold, confidence)
+
+    def _get_roi_box(self, output_data, image, mask_threshold=0.25, padding=10):
+        if self.fast_preprocess:
+            return self._get_roi_box_lowres(output_data, image.shape, mask_threshold, padding)
+        if self.buffers is not None:
+            return self._get_roi_box_buffered(output_data, image.shape, mask_threshold, padding)
+
+        output_data = (output_data[0, :, :, 0] > mask_threshold) * 1
         output_data = np.uint8(output_data * 255)
         altered_image = cv2.resize(output_data, (image.shape[1], image.shape[0]))
 
@@ -53,7 +402,7 @@ class FastMRZ:
             altered_image.copy(), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE
         )
         if len(contours) == 0:
-            return ""
+            return None
 
         c_area = np.zeros([len(contours)])
         for j in range(len(contours)):
@@ -61,18 +410,108 @@ class FastMRZ:
 
         x, y, w, h = cv2.boundingRect(contours[np.argmax(c_area)])
 
-        # Add padding to the ROI
-        padding = 10
-        x_start = max(0, x - padding)
-        y_start = max(0, y - padding)
-        x_end = min(image.shape[1], x + w + padding)
-        y_end = min(image.shape[0], y + h + padding)
+        return self._pad_roi_box(x, y, x + w, y + h, image.shape, padding)
+
+    def _get_roi_box_buffered(self, output_data, image_shape, mask_threshold, padding):
+        height, width = image_shape[:2]
+        mask = cv2.resize(
+            self._get_mask(output_data, mask_threshold),
+            (width, height),
+            dst=self.buffers.get("full_mask", (height, width), np.uint8),
+        )
+        cv2.erode(mask, self._get_kernel(5), dst=mask)
+        rect = self._get_largest_component(mask)
+        if rect is None:
+            return None
+        x, y, w, h = rect
+
+        return self._pad_roi_box(x, y, x + w, y + h, image_shape, padding)
+
+    def _get_mask(self, output_data, mask_threshold):
+        mask = self.buffers.get("mask", output_data.shape[1:3], np.uint8)
+        return cv2.compare(output_data[0, :, :, 0], mask_threshold, cv2.CMP_GT, dst=mask)
+
+    def _get_kernel(self, size):
+        kernel = self.buffers.get("kernel", (size, size), np.uint8)
+        kernel.fill(1)
+        return kernel
+
+    def _get_largest_component(self, mask):
+        # Component pixel counts stand in for contour areas, so the largest
+        # region is picked by one argmax instead of a contourArea per contour;
+        # 8-connectivity gives the same regions as the external contours
+        count, labels, stats, centroids = cv2.connectedComponentsWithStats(
+            mask,
+            labels=self.buffers.get("labels", mask.shape, np.uint16),
+            connectivity=8,
+            ltype=cv2.CV_16U,
+        )
+        if count < 2:
+            return None
+        # Label 0 is the background
+        largest = 1 + np.argmax(stats[1:, cv2.CC_STAT_AREA])
+
+        return tuple(int(value) for value in stats[largest, :4])
+
+    def _pad_roi_box(self, x_start, y_start, x_end, y_end, image_shape, padding=10):
+        return (
+            max(0, x_start - padding),
+            max(0, y_start - padding),
+            min(image_shape[1], x_end + padding),
+            min(image_shape[0], y_end + padding),
+        )
+
+    def _get_roi_box_lowres(self, output_data, image_shape, mask_threshold=0.25, padding=10):
+        # Contours are searched on the 256x256 mask itself and only the winning
+        # rectangle is scaled up, instead of resizing the mask to the full image
+        if self.buffers is not None:
+            mask = self._get_mask(output_data, mask_threshold)
+        else:
+            mask = np.uint8(output_data[0, :, :, 0] > mask_threshold) * 255
+        scale_x = image_shape[1] / mask.shape[1]
+        scale_y = image_shape[0] / mask.shape[0]
+        # The 5x5 full-resolution erosion, expressed in mask pixels
+        kernel_size = round(5 / max(scale_x, scale_y))
+        if self.buffers is not None:
+            if kernel_size > 1:
+                cv2.erode(mask, self._get_kernel(kernel_size), dst=mask)
+            rect = self._get_largest_component(mask)
+            if rect is None:
+                return None
+            x, y, w, h = rect
+        else:
+            if kernel_size > 1:
+                mask = cv2.erode(mask, np.ones((kernel_size, kernel_size), dtype=np.uint8))
+            contours, hierarchy = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
+            if len(contours) == 0:
+                return None
+            x, y, w, h = cv2.boundingRect(max(contours, key=cv2.contourArea))
+
+        return self._pad_roi_box(
+            math.floor(x * scale_x),
+            math.floor(y * scale_y),
+            math.ceil((x + w) * scale_x),
+            math.ceil((y + h) * scale_y),
+            image_shape,
+            padding,
+        )
 
-        roi_arr = image[y_start:y_end, x_start:x_end].copy()
-        # roi_arr = cv2.convertScaleAbs(roi_arr, alpha=1.25, beta=-50)
+    def _threshold_roi(self, image, roi_box):
+        x_start, y_start, x_end, y_end = roi_box
+        if self.buffers is not None:
+            # Grayscale straight from the image into scratch space; only the
+            # thresholded ROI, which outlives this call, is a new array
+            roi_gray = cv2.cvtColor(
+                image[y_start:y_end, x_start:x_end],
+                cv2.COLOR_BGR2GRAY,
+                dst=self.buffers.get("roi_gray", (y_end - y_start, x_end - x_start), np.uint8),
+            )
+        else:
+            roi_arr = image[y_start:y_end, x_start:x_end].copy()
+            # roi_arr = cv2.convertScaleAbs(roi_arr, alpha=1.25, beta=-50)
 
-        # Apply additional preprocessing to ROI before OCR
-        roi_gray = cv2.cvtColor(roi_arr, cv2.COLOR_BGR2GRAY)
+            # Apply additional preprocessing to ROI before OCR
+            roi_gray = cv2.cvtColor(roi_arr, cv2.COLOR_BGR2GRAY)
 
         # kernel = np.ones((1, 1), np.uint8)
         # roi_dilate = cv2.dilate(roi_gray, kernel, iterations=1)
@@ -82,13 +521,7 @@ class FastMRZ:
             roi_gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU
         )[1]
 
-        # Configure pytesseract parameters for better MRZ recognition
-        custom_config = r"--oem 3 --psm 6" + (
-            f" --tessdata-dir {self.tessdata_path}" if self.tessdata_path else ""
-        )
-        return pytesseract.image_to_string(
-            roi_threshold, lang="mrz", config=custom_config
-        )
+        return roi_threshold
 
     def _cleanse_roi(self, mrz_text):
         input_list = mrz_text.replace(" ", "").split("\n")
@@ -108,83 +541,260 @@ class FastMRZ:
         return "\n".join(new_list)
 
     def _get_final_checkdigit(self, input_string, input_type):
-        if input_type == "TD3":
-            return self._get_checkdigit(
-                input_string[1][:10] + input_string[1][13:20] + input_string[1][21:43]
-            )
-        elif input_type == "TD2":
-            return self._get_checkdigit(
-                input_string[1][:10] + input_string[1][13:20] + input_string[1][21:35]
-            )
-        else:
-            return self._get_checkdigit(
-                input_string[0][5:]
-                + input_string[1][:7]
-                + input_string[1][8:15]
-                + input_string[1][18:29]
-            )
+        return final_checkdigit(input_string, input_type)
 
     def _get_checkdigit(self, input_string):
-        weights_pattern = [7, 3, 1]
-
-        total = 0
-        for i, char in enumerate(input_string):
-            if char.isdigit():
-                value = int(char)
-            elif char.isalpha():
-                value = ord(char.upper()) - ord("A") + 10
-            else:
-                value = 0
-            total += value * weights_pattern[i % len(weights_pattern)]
-
-        check_digit = total % 10
-
-        return str(check_digit)
+        return checkdigit(input_string)
 
     def _format_date(self, input_date):
-        formatted_date = str(datetime.strptime(input_date, "%y%m%d").date())
-
-        return formatted_date
+        return format_date(input_date)
 
     def _get_birth_date(self, birth_date_str, expiry_date_str):
-        birth_year = int(birth_date_str[:4])
-        expiry_year = int(expiry_date_str[:4])
-
-        if expiry_year > birth_year:
-            return birth_date_str
-        adjusted_year = birth_year - 100
-
-        return f"{adjusted_year}-{birth_date_str[5:]}"
+        return adjust_birth_date(birth_date_str, expiry_date_str)
 
     def _is_valid(self, image):
-        if isinstance(image, str):
+        if isinstance(image, (str, os.PathLike)):
             return bool(os.path.isfile(image))
         elif isinstance(image, np.ndarray):
             return image.shape[-1] == 3
 
+    def _forward(self, image_array):
+        net_pool = self._get_net_pool()
+        with self._stage("forward"):
+            return net_pool.forward(image_array)
+
+    def _forward_batch(self, image_arrays):
+        if self._batch_forward and len(image_arrays) > 1:
+            try:
+                output_data = self._forward(np.concatenate(image_arrays))
+                if output_data.shape[0] == len(image_arrays):
+                    return output_data
+            except getattr(self._get_net_pool(), "errors", Exception):
+                # Backends that do not name their errors fall back on any
+                pass
+            # The exported graph has a fixed batch dimension; stop trying
+            self._batch_forward = False
+
+        return np.concatenate([self._forward(image_array) for image_array in image_arrays])
+
     def _get_mrz(self, image):
-        image_array = self._process_image(image)
-        self.net.setInput(image_array)
-        output_data = self.net.forward()
-        mrz_roi = self._get_roi(output_data, image)
+        return self._read_mrz(self._forward_image(image), image)
+
+    def _read_mrz(self, output_data, image):
+        if self.cascade is not None:
+            return self._run_cascade(output_data, image)
+        return self._cleanse_roi(self._get_roi(output_data, image))
+
+    def _run_cascade(self, output_data, image):
+        # Profiles run fastest first on the same segmentation output; the first
+        # read whose check digits pass finishes the document. Without one, the
+        # first non-empty read is returned as the single path would have.
+        image = self._read_image(image)
+        # The gate looks at the mask once and at the crop of the first profile
+        confidence = self._gate_mask(output_data, image.shape)
+        attempted = []
+        first_text = ""
+        for profile in self.cascade.profiles:
+            attempted.append(profile)
+            with self._stage("roi"):
+                roi_threshold = self._get_profile_roi(profile, output_data, image)
+            if confidence is not None:
+                self._gate_lines(roi_threshold, confidence)
+                confidence = None
+            mrz_text = self._cleanse_roi(self._recognize_profile(profile, roi_threshold))
+            if mrz_text and self._passes_checkdigits(mrz_text):
+                self.cascade.record(attempted, profile)
+                return mrz_text
+            first_text = first_text or mrz_text
+
+        self.cascade.record(attempted, None)
+        return first_text
+
+    def _get_profile_roi(self, profile, output_data, image):
+        from .cascade import binarize, deskewed_crop
+
+        if profile.deskew:
+            roi = deskewed_crop(image, output_data, profile.mask_threshold, profile.padding)
+        else:
+            if profile.lowres:
+                roi_box = self._get_roi_box_lowres(
+                    output_data, image.shape, profile.mask_threshold, profile.padding
+                )
+            else:
+                roi_box = self._get_roi_box(
+                    output_data, image, profile.mask_threshold, profile.padding
+                )
+            if roi_box is None:
+                return None
+            x_start, y_start, x_end, y_end = roi_box
+            roi = image[y_start:y_end, x_start:x_end]
+        if roi is None or roi.size == 0:
+            return None
+
+        return binarize(roi, profile)
+
+    def _recognize_profile(self, profile, roi_threshold):
+        if not profile.per_line or roi_threshold is None:
+            return self._recognize_roi(roi_threshold)
+        from .cascade import line_images
+
+        # Page segmentation mode 7 reads each band as a single text line, which
+        # keeps a skewed or unevenly spaced line from merging with its neighbour
+        with self._stage("ocr"):
+            return "\n".join(
+                self.ocr.recognize(line, psm=7).strip() for line in line_images(roi_threshold)
+            )
+
+    def _get_roi_from_input(self, input_data, input_type):
+        if self.reduced_decode and input_type in ("imagepath", "bytes", "base64"):
+            return self._get_roi_from_encoded(input_data, input_type)
+        image = self._load_image(input_data, input_type)
+        output_data = self._forward_image(image)
+
+        return self._get_roi_image(output_data, image)
+
+    def _get_roi_from_encoded(self, input_data, input_type):
+        # Segment a reduced-scale decode; the full-resolution decode the OCR crop
+        # is taken from only happens once an MRZ box has been found. This costs
+        # an extra reduced decode for MRZ images and saves the full decode
+        # for images without one
+        with self._open_encoded(input_data, input_type) as image_data:
+            image = self._bytes_to_reduced_array(image_data)
+            if image is None:
+                image = self._bytes_to_array(image_data)
+                output_data = self._forward_image(image)
+                return self._get_roi_image(output_data, image)
+
+            output_data = self._forward_image(image)
+            scale = _IMREAD_REDUCED_SCALE
+            confidence = self._gate_mask(
+                output_data, (image.shape[0] * scale, image.shape[1] * scale)
+            )
+            with self._stage("roi"):
+                roi_box = self._get_roi_box_lowres(
+                    output_data, (image.shape[0] * scale, image.shape[1] * scale)
+                )
+            if roi_box is None:
+                return None
+            image = self._bytes_to_array(image_data)
+
+        # Map the box estimated from the reduced size onto the exact full size
+        x_start, y_start, x_end, y_end = roi_box
+        with self._stage("roi"):
+            roi_threshold = self._threshold_roi(
+                image, self._pad_roi_box(x_start, y_start, x_end, y_end, image.shape, padding=0)
+            )
+        self._gate_lines(roi_threshold, confidence)
+
+        return roi_threshold
+
+    def _get_mrz_batch(self, images):
+        # Preprocessing, ROI extraction and OCR stay per image; only the
+        # segmentation forward pass is shared. Errors are returned in place.
+        mrz_texts = [None] * len(images)
+        image_arrays = {}
+        for i, image in enumerate(images):
+            try:
+                image_arrays[i] = self._process_image(image)
+            except Exception as error:
+                mrz_texts[i] = error
+        if not image_arrays:
+            return mrz_texts
+
+        try:
+            output_data = self._forward_batch(list(image_arrays.values()))
+        except Exception as error:
+            return [error if mrz_text is None else mrz_text for mrz_text in mrz_texts]
+        for j, i in enumerate(image_arrays):
+            try:
+                mrz_texts[i] = self._read_mrz(output_data[j : j + 1], images[i])
+            except Exception as error:
+                mrz_texts[i] = error
+
+        return mrz_texts
+
+    def _bytes_to_array(self, image_data):
+        # np.frombuffer wraps bytes, memoryview and mmap objects without copying
+        # Decode straight to RGB (the channel order the segmentation model has
+        # always been fed) and leave EXIF orientation alone, as PIL used to
+        flags = getattr(cv2, "IMREAD_COLOR_RGB", cv2.IMREAD_COLOR) | cv2.IMREAD_IGNORE_ORIENTATION
+        with self._stage("decode"):
+            image = cv2.imdecode(np.frombuffer(image_data, dtype=np.uint8), flags)
+        if image is None:
+            raise ValueError("Input could not be decoded as an image.")
+        if not hasattr(cv2, "IMREAD_COLOR_RGB"):
+            cv2.cvtColor(image, cv2.COLOR_BGR2RGB, dst=image)
+
+        return image
 
-        return self._cleanse_roi(mrz_roi)
+    def _bytes_to_reduced_array(self, image_data):
+        flags = cv2.IMREAD_REDUCED_COLOR_8 | cv2.IMREAD_IGNORE_ORIENTATION
+        with self._stage("decode"):
+            image = cv2.imdecode(np.frombuffer(image_data, dtype=np.uint8), flags)
+        # Small images are decoded at full size; they are cheap and need the detail
+        if image is None or min(image.shape[:2]) < 256:
+            return None
 
-    def _image_to_base64(self, imagepath):
-        image_file = open(imagepath, "rb")
-        image_data = image_file.read()
-        image_file.close()
-        base64_string = base64.b64encode(image_data).decode("utf-8")
+        return cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
 
-        return base64_string
+    @contextmanager
+    def _open_encoded(self, input_data, input_type):
+        if input_type == "imagepath":
+            if not self._is_valid(input_data):
+                raise ValueError("Input is not a valid image file.")
+            with open(input_data, "rb") as image_file:
+                if os.fstat(image_file.fileno()).st_size == 0:
+                    raise ValueError("Input could not be decoded as an image.")
+                with mmap.mmap(image_file.fileno(), 0, access=mmap.ACCESS_READ) as image_map:
+                    yield image_map
+        elif input_type == "bytes":
+            if not isinstance(input_data, _BYTES_TYPES):
+                raise ValueError("Input is not a valid bytes-like object.")
+            yield input_data
+        else:
+            try:
+                image_data = self._base64_to_bytes(input_data)
+            except binascii.Error as error:
+                raise ValueError("Input is not a valid base64 string.") from error
+            yield image_data
+
+    def _imagepath_to_array(self, imagepath):
+        with open(imagepath, "rb") as image_file:
+            if os.fstat(image_file.fileno()).st_size == 0:
+                raise ValueError("Input could not be decoded as an image.")
+            with mmap.mmap(image_file.fileno(), 0, access=mmap.ACCESS_READ) as image_map:
+                return self._bytes_to_array(image_map)
+
+    def _base64_to_bytes(self, base64_string):
+        # Decode chunk by chunk into one preallocated buffer, so a large payload
+        # is never held as an intermediate bytes copy next to the decoded data
+        buffer = bytearray(len(base64_string) * 3 // 4)
+        view = memoryview(buffer)
+        size = 0
+        pending = b""
+        for start in range(0, len(base64_string), _BASE64_CHUNK_SIZE):
+            chunk = base64_string[start : start + _BASE64_CHUNK_SIZE]
+            if isinstance(chunk, str):
+                chunk = chunk.encode("ascii", "ignore")
+            chunk = pending + bytes(chunk).translate(None, _BASE64_DISCARD)
+            usable = len(chunk) - len(chunk) % 4
+            pending = chunk[usable:]
+            if usable:
+                decoded = binascii.a2b_base64(chunk[:usable])
+                view[size : size + len(decoded)] = decoded
+                size += len(decoded)
+        if pending:
+            raise ValueError("Input is not a valid base64 string.")
+
+        return view[:size]
 
     def _base64_to_array(self, base64_string):
-        image_data = base64.b64decode(base64_string)
-        image_stream = BytesIO(image_data)
-        image = Image.open(image_stream)
-        image_array = np.array(image)
+        try:
+            image_data = self._base64_to_bytes(base64_string)
+        except binascii.Error as error:
+            raise ValueError("Input is not a valid base64 string.") from error
 
-        return image_array
+        return self._bytes_to_array(image_data)
 
     def _parse_mrz(self, mrz_text, include_checkdigit=True):
         if not mrz_text:
@@ -193,230 +803,584 @@ class FastMRZ:
         if len(mrz_lines) not in [2, 3]:
             return {"status": "FAILURE", "status_message": "Invalid MRZ format"}
 
-        mrz_code_dict = {}
         if len(mrz_lines) == 2:
             if mrz_lines[1][-1] == "<":
-                mrz_code_dict["mrz_type"] = (
-                    "MRVB" if len(mrz_lines[0]) == 36 else "MRVA"
-                )
+                mrz_type = "MRVB" if len(mrz_lines[0]) == 36 else "MRVA"
             else:
-                mrz_code_dict["mrz_type"] = "TD2" if len(mrz_lines[0]) == 36 else "TD3"
+                mrz_type = "TD2" if len(mrz_lines[0]) == 36 else "TD3"
+        else:
+            mrz_type = "TD1"
+
+        return parse_lines(mrz_type, mrz_lines, mrz_text, include_checkdigit)
+
+    def detect_mrz(self, input_data, input_type="imagepath"):
+        # Segmentation and the gate only, without OCR, to guide image capture
+        from .detect import MRZGate
+
+        gate = self.gate if self.gate is not None else MRZGate()
+        image = self._load_image(input_data, input_type)
+        output_data = self._forward_image(image)
+        try:
+            with self._stage("gate"):
+                confidence = gate.check_mask(output_data, image.shape)
+            with self._stage("roi"):
+                roi_box = self._get_roi_box(output_data, image, gate.mask_threshold)
+                if roi_box is None:
+                    raise MRZNotFound("no MRZ region", confidence)
+                roi_threshold = self._threshold_roi(image, roi_box)
+            with self._stage("gate"):
+                confidence = gate.check_lines(roi_threshold, confidence)
+        except MRZNotFound as error:
+            return {
+                "status": "FAILURE",
+                "status_message": str(error),
+                "box": None,
+                "confidence": error.confidence,
+            }
+
+        return {
+            "status": "SUCCESS",
+            "box": [int(value) for value in roi_box],
+            "confidence": confidence,
+        }
 
-            # Line 1
-            mrz_code_dict["document_code"] = mrz_lines[0][:2].strip("<")
+    def validate_mrz(self, mrz_text):
+        mrz_text = self._cleanse_roi(mrz_text)
 
-            mrz_code_dict["issuer_code"] = mrz_lines[0][2:5]
-            if not mrz_code_dict["issuer_code"].isalpha():
-                mrz_code_dict["status"] = "FAILURE"
-                mrz_code_dict["status_message"] = "Invalid MRZ format"
+        result = self._parse_mrz(mrz_text)
+        if result.get("status") == "SUCCESS":
+            return {"is_valid": True, "status_message": "The given mrz is valid"}
+        else:
+            return {"is_valid": False, "status_message": result.get("status_message")}
 
-            names = mrz_lines[0][5:].split("<<")
-            mrz_code_dict["surname"] = names[0].replace("<", " ")
-            mrz_code_dict["given_name"] = names[1].replace("<", " ")
+    def validate_many(self, mrz_texts):
+        from . import bulk
 
-            # Line 2
-            mrz_code_dict["document_number"] = mrz_lines[1][:9].replace("<", "")
-            document_number_checkdigit = self._get_checkdigit(
-                mrz_code_dict["document_number"]
-            )
-            if document_number_checkdigit != mrz_lines[1][9]:
-                mrz_code_dict["status"] = "FAILURE"
-                mrz_code_dict["status_message"] = "Document number checksum is not matching"
-            if include_checkdigit:
-                mrz_code_dict["document_number_checkdigit"] = document_number_checkdigit
-
-            mrz_code_dict["nationality_code"] = mrz_lines[1][10:13]
-            if not mrz_code_dict["nationality_code"].isalpha():
-                mrz_code_dict["status"] = "FAILURE"
-                mrz_code_dict["status_message"] = "Invalid MRZ format"
-
-            mrz_code_dict["birth_date"] = mrz_lines[1][13:19]
-            birth_date_checkdigit = self._get_checkdigit(mrz_code_dict["birth_date"])
-            if birth_date_checkdigit != mrz_lines[1][19]:
-                mrz_code_dict["status"] = "FAILURE"
-                mrz_code_dict["status_message"] = "Date of birth checksum is not matching"
-            if include_checkdigit:
-                mrz_code_dict["birth_date_checkdigit"] = birth_date_checkdigit
-            mrz_code_dict["birth_date"] = self._format_date(mrz_code_dict["birth_date"])
-
-            mrz_code_dict["sex"] = mrz_lines[1][20]
-
-            mrz_code_dict["expiry_date"] = mrz_lines[1][21:27]
-            expiry_date_checkdigit = self._get_checkdigit(mrz_code_dict["expiry_date"])
-            if expiry_date_checkdigit != mrz_lines[1][27]:
-                mrz_code_dict["status"] = "FAILURE"
-                mrz_code_dict["status_message"] = "Date of expiry checksum is not matching"
-            if include_checkdigit:
-                mrz_code_dict["expiry_date_checkdigit"] = expiry_date_checkdigit
-            mrz_code_dict["expiry_date"] = self._format_date(
-                mrz_code_dict["expiry_date"]
-            )
-            mrz_code_dict["birth_date"] = self._get_birth_date(
-                mrz_code_dict["birth_date"], mrz_code_dict["expiry_date"]
-            )
+        return bulk.validate_many(self, mrz_texts)
 
-            if mrz_code_dict["mrz_type"] == "TD2":
-                mrz_code_dict["optional_data"] = mrz_lines[1][28:35].strip("<")
-            elif mrz_code_dict["mrz_type"] == "TD3":
-                mrz_code_dict["optional_data"] = mrz_lines[1][28:42].strip("<")
-                optional_data_checkdigit = self._get_checkdigit(
-                    mrz_code_dict["optional_data"].strip("<")
-                )
-                if optional_data_checkdigit != mrz_lines[1][42]:
-                    mrz_code_dict["status"] = "FAILURE"
-                    mrz_code_dict["status_message"] = "Optional data checksum is not matching"
-                if include_checkdigit:
-                    mrz_code_dict["optional_data_checkdigit"] = optional_data_checkdigit
-            elif mrz_code_dict["mrz_type"] == "MRVA":
-                mrz_code_dict["optional_data"] = mrz_lines[1][28:44].strip("<")
-            else:
-                mrz_code_dict["optional_data"] = mrz_lines[1][28:36].strip("<")
+    def parse_many(self, mrz_texts, include_checkdigit=True):
+        from . import bulk
 
-            final_checkdigit = self._get_final_checkdigit(
-                mrz_lines, mrz_code_dict["mrz_type"]
-            )
-            if mrz_lines[1][-1] != final_checkdigit and mrz_code_dict[
-                "mrz_type"
-            ] not in ("MRVA", "MRVB"):
-                mrz_code_dict["status"] = "FAILURE"
-                mrz_code_dict["status_message"] = "Final checksum is not matching"
-            if include_checkdigit:
-                mrz_code_dict["final_checkdigit"] = final_checkdigit
+        return bulk.parse_many(self, mrz_texts, include_checkdigit=include_checkdigit)
+
+    def _load_image(self, input_data, input_type):
+        if input_type == "imagepath":
+            if not self._is_valid(input_data):
+                raise ValueError("Input is not a valid image file.")
+            return self._imagepath_to_array(input_data)
+        elif input_type == "numpy":
+            if not self._is_valid(input_data):
+                raise ValueError("Input is not a valid NumPy array.")
+            return input_data
+        elif input_type == "bytes":
+            if not isinstance(input_data, _BYTES_TYPES):
+                raise ValueError("Input is not a valid bytes-like object.")
+            return self._bytes_to_array(input_data)
+        elif input_type == "base64":
+            return self._base64_to_array(input_data)
         else:
-            mrz_code_dict["mrz_type"] = "TD1"
+            raise ValueError(f"Unsupported input_type: {input_type}")
 
-            # Line 1
-            mrz_code_dict["document_code"] = mrz_lines[0][:2].strip("<")
+    def _parse_mrz_or_failure(self, mrz_text, include_checkdigit=True):
+        # OCR noise can break date or name fields badly enough for parsing to raise
+        try:
+            return self._parse_mrz(mrz_text, include_checkdigit=include_checkdigit)
+        except Exception as error:
+            return {"status": "FAILURE", "status_message": str(error)}
+
+    def _correct(self, mrz_text):
+        if self.correction is None:
+            return mrz_text, []
+        with self._stage("correct"):
+            return self.correction.correct(self, mrz_text)
+
+    def _get_result(self, mrz_text, ignore_parse, include_checkdigit, or_failure=False):
+        mrz_text, corrections = self._correct(mrz_text)
+        if ignore_parse:
+            return mrz_text
+        with self._stage("parse"):
+            result = self._parse_result(mrz_text, include_checkdigit, or_failure)
+        if corrections:
+            result = self._add_fields(result, corrections=corrections)
+        return result
+
+    def _parse_result(self, mrz_text, include_checkdigit, or_failure=False):
+        if self.result_type == "object":
+            # Fields are sliced and dates formatted only when read
+            return MRZResult(mrz_text, include_checkdigit, parser=self)
+        if or_failure:
+            return self._parse_mrz_or_failure(mrz_text, include_checkdigit)
+        return self._parse_mrz(mrz_text, include_checkdigit=include_checkdigit)
+
+    def _add_fields(self, result, **fields):
+        if isinstance(result, MRZResult):
+            result.extra = dict(result.extra or (), **fields)
+        else:
+            result.update(fields)
+        return result
 
-            mrz_code_dict["issuer_code"] = mrz_lines[0][2:5]
-            if not mrz_code_dict["issuer_code"].isalpha():
-                mrz_code_dict["status"] = "FAILURE"
-                mrz_code_dict["status_message"] = "Invalid MRZ format"
+    def _as_result(self, result):
+        # Failures and cache hits are built as dicts
+        if self.result_type == "object" and isinstance(result, dict):
+            return MRZResult.from_dict(result)
+        return result
 
-            mrz_code_dict["document_number"] = mrz_lines[0][5:14]
-            document_number_checkdigit = self._get_checkdigit(
-                mrz_code_dict["document_number"]
-            )
-            if document_number_checkdigit != mrz_lines[0][14]:
-                mrz_code_dict["status"] = "FAILURE"
-                mrz_code_dict["status_message"] = "Document number checksum is not matching"
-            if include_checkdigit:
-                mrz_code_dict["document_number_checkdigit"] = document_number_checkdigit
-
-            mrz_code_dict["optional_data_1"] = mrz_lines[0][15:].strip("<")
-
-            # Line 2
-            mrz_code_dict["birth_date"] = mrz_lines[1][:6]
-            birth_date_checkdigit = self._get_checkdigit(mrz_code_dict["birth_date"])
-            if birth_date_checkdigit != mrz_lines[1][6]:
-                mrz_code_dict["status"] = "FAILURE"
-                mrz_code_dict["status_message"] = "Date of birth checksum is not matching"
-            if include_checkdigit:
-                mrz_code_dict["birth_date_checkdigit"] = birth_date_checkdigit
-            mrz_code_dict["birth_date"] = self._format_date(mrz_code_dict["birth_date"])
-
-            mrz_code_dict["sex"] = mrz_lines[1][7]
-
-            mrz_code_dict["expiry_date"] = mrz_lines[1][8:14]
-            expiry_date_checkdigit = self._get_checkdigit(mrz_code_dict["expiry_date"])
-            if expiry_date_checkdigit != mrz_lines[1][14]:
-                mrz_code_dict["status"] = "FAILURE"
-                mrz_code_dict["status_message"] = "Date of expiry checksum is not matching"
-            if include_checkdigit:
-                mrz_code_dict["expiry_date_checkdigit"] = expiry_date_checkdigit
-            mrz_code_dict["expiry_date"] = self._format_date(
-                mrz_code_dict["expiry_date"]
-            )
+    def _get_failure(self, error):
+        return self._as_result({"status": "FAILURE", "status_message": str(error)})
 
-            mrz_code_dict["birth_date"] = self._get_birth_date(
-                mrz_code_dict["birth_date"], mrz_code_dict["expiry_date"]
-            )
+    def _cache_get(self, cache_key):
+        return self._as_result(self.cache.get(cache_key))
 
-            mrz_code_dict["nationality_code"] = mrz_lines[1][15:18]
-            if not mrz_code_dict["nationality_code"].isalpha():
-                mrz_code_dict["status"] = "FAILURE"
-                mrz_code_dict["status_message"] = "Invalid MRZ format"
+    def _cache_set(self, cache_key, result):
+        self.cache.set(cache_key, result.to_dict() if isinstance(result, MRZResult) else result)
 
-            mrz_code_dict["optional_data_2"] = mrz_lines[0][18:29].strip("<")
-            final_checkdigit = self._get_final_checkdigit(
-                mrz_lines, mrz_code_dict["mrz_type"]
-            )
-            if mrz_lines[1][-1] != final_checkdigit:
-                mrz_code_dict["status"] = "FAILURE"
-                mrz_code_dict["status_message"] = "Final checksum is not matching"
-            if include_checkdigit:
-                mrz_code_dict["final_checkdigit"] = final_checkdigit
+    def _get_cache_key(
+        self, input_data, input_type, ignore_parse, include_checkdigit, or_failure=False
+    ):
+        # Everything that can change the output goes into the key; the same
+        # document sent as a path, raw bytes or base64 hashes the same
+        digest = hashlib.blake2b(digest_size=16)
+        ocr_backend = (
+            self.ocr_backend if isinstance(self.ocr_backend, str) else type(self.ocr_backend).__name__
+        )
+        inference_backend = (
+            self.inference_backend
+            if isinstance(self.inference_backend, str)
+            else type(self.inference_backend).__name__
+        )
+        options = (
+            ignore_parse,
+            include_checkdigit,
+            ocr_backend,
+            str(self.tesseract_path),
+            str(self.tessdata_path),
+            self.fast_preprocess,
+            self.reduced_decode,
+            self.ocrb is not None,
+            self.correction is not None,
+            self.gate is not None,
+            None if self.cascade is None else [profile.name for profile in self.cascade.profiles],
+            inference_backend,
+            os.path.basename(self.model_path),
+        )
+        if or_failure:
+            # Parse errors become FAILURE results instead of raising
+            options += ("or_failure",)
+        if input_type == "text":
+            digest.update(repr(("text",) + options).encode())
+            digest.update(self._cleanse_roi(input_data).encode("utf-8"))
+        elif input_type == "numpy":
+            if not self._is_valid(input_data):
+                raise ValueError("Input is not a valid NumPy array.")
+            digest.update(repr(("numpy", input_data.shape, input_data.dtype.str) + options).encode())
+            digest.update(np.ascontiguousarray(input_data).data)
+        elif input_type in ("imagepath", "bytes", "base64"):
+            digest.update(repr(("image",) + options).encode())
+            with self._open_encoded(input_data, input_type) as image_data:
+                digest.update(image_data)
+        elif input_type == "pdf":
+            digest.update(repr(("pdf",) + options).encode())
+            pdf_type = self._check_pdf(input_data)
+            with self._open_encoded(input_data, pdf_type) as pdf_data:
+                digest.update(pdf_data)
+        else:
+            raise ValueError(f"Unsupported input_type: {input_type}")
 
-            # Line 3
-            names = mrz_lines[2].split("<<")
-            mrz_code_dict["surname"] = names[0].replace("<", " ")
-            mrz_code_dict["given_name"] = names[1].replace("<", " ")
+        return digest.hexdigest()
 
-        mrz_code_dict["mrz_text"] = mrz_text
+    def get_details(
+        self,
+        input_data,
+        input_type="imagepath",
+        ignore_parse=False,
+        include_checkdigit=True,
+    ):
+        return self._get_traced_details(input_data, input_type, ignore_parse, include_checkdigit)
 
-        # Final status
-        if mrz_code_dict.get("status") != "FAILURE":
-            mrz_code_dict["status"] = "SUCCESS"
+    def _get_traced_details(
+        self, input_data, input_type, ignore_parse, include_checkdigit, or_failure=False
+    ):
+        args = (input_data, input_type, ignore_parse, include_checkdigit, or_failure)
+        if self.metrics is None:
+            return self._get_cached_details(*args)
+
+        with self.metrics.trace() as timings:
+            with self.metrics.stage("total"):
+                result = self._get_cached_details(*args)
+        return self._attach_timings(result, timings)
+
+    def _attach_timings(self, result, timings):
+        if self.metrics.attach_timings and isinstance(result, (dict, MRZResult)):
+            result = self._add_fields(result, timings=timings)
+        return result
+
+    def _get_cached_details(
+        self, input_data, input_type, ignore_parse, include_checkdigit, or_failure
+    ):
+        args = (input_data, input_type, ignore_parse, include_checkdigit, or_failure)
+        if self.cache is not None:
+            cache_key = self._get_cache_key(*args)
+            result = self._cache_get(cache_key)
+            if result is None:
+                result = self._get_details(*args)
+                self._cache_set(cache_key, result)
+            return result
+
+        return self._get_details(*args)
+
+    def _get_details(self, input_data, input_type, ignore_parse, include_checkdigit, or_failure):
+        if input_type == "pdf":
+            mrz_text = self._get_mrz_from_pdf(input_data)
+        elif input_type == "text":
+            mrz_text = self._cleanse_roi(input_data)
+        else:
+            try:
+                mrz_text = self._get_mrz_from_input(input_data, input_type)
+            except MRZNotFound as error:
+                return self._get_rejection(error, ignore_parse)
 
-        return mrz_code_dict
+        return self._get_result(mrz_text, ignore_parse, include_checkdigit, or_failure)
 
-    def validate_mrz(self, mrz_text):
-        mrz_text = self._cleanse_roi(mrz_text)
+    def _get_mrz_from_input(self, input_data, input_type):
+        if self.cascade is not None:
+            return self._get_mrz_cascade(input_data, input_type)
+        roi_threshold = self._get_roi_from_input(input_data, input_type)
 
-        result = self._parse_mrz(mrz_text)
-        if result.get("status") == "SUCCESS":
-            return {"is_valid": True, "status_message": "The given mrz is valid"}
-        else:
-            return {"is_valid": False, "status_message": result.get("status_message")}
+        return self._cleanse_roi(self._recognize_roi(roi_threshold))
 
-    def get_details(
+    def _get_rejection(self, error, ignore_parse):
+        if ignore_parse:
+            return ""
+        return self._as_result(
+            {
+                "status": "FAILURE",
+                "status_message": str(error),
+                "mrz_confidence": error.confidence,
+            }
+        )
+
+    def _get_mrz_cascade(self, input_data, input_type):
+        # Later profiles crop from the full-resolution image, so the reduced
+        # decode does not apply here
+        image = self._load_image(input_data, input_type)
+        return self._run_cascade(self._forward_image(image), image)
+
+    def _check_pdf(self, input_data):
+        if isinstance(input_data, (str, os.PathLike)):
+            if not os.path.isfile(input_data):
+                raise ValueError("Input is not a valid PDF file.")
+            return "imagepath"
+        if not isinstance(input_data, _BYTES_TYPES):
+            raise ValueError("Input is not a valid PDF file.")
+        return "bytes"
+
+    def _get_mrz_from_pdf(self, input_data):
+        self._check_pdf(input_data)
+        from .pdf import iter_pdf_images
+
+        # Pages are rasterized one at a time and dropped after OCR, so memory
+        # stays flat however long the document is. The first read whose check
+        # digits pass wins; otherwise the first non-empty read is returned.
+        first_text = ""
+        with closing(iter_pdf_images(input_data)) as images:
+            while True:
+                with self._stage("decode"):
+                    image = next(images, None)
+                if image is None:
+                    break
+                output_data = self._forward_image(image)
+                try:
+                    mrz_text = self._read_mrz(output_data, image)
+                except MRZNotFound:
+                    continue
+                if mrz_text and self._passes_checkdigits(mrz_text):
+                    return mrz_text
+                first_text = first_text or mrz_text
+
+        return first_text
+
+    def get_details_batch(
+        self,
+        inputs,
+        input_type="imagepath",
+        batch_size=8,
+        ignore_parse=False,
+        include_checkdigit=True,
+    ):
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1.")
+        if input_type not in ("imagepath", "numpy", "bytes", "base64", "text"):
+            raise ValueError(f"Unsupported input_type: {input_type}")
+
+        results = []
+        inputs = list(inputs)
+        for start in range(0, len(inputs), batch_size):
+            batch = inputs[start : start + batch_size]
+            # Failed items keep their slot so results line up with the inputs
+            mrz_texts = [None] * len(batch)
+            images = {}
+            for i, input_data in enumerate(batch):
+                try:
+                    if input_type == "text":
+                        mrz_texts[i] = self._cleanse_roi(input_data)
+                    else:
+                        images[i] = self._load_image(input_data, input_type)
+                except Exception as error:
+                    mrz_texts[i] = error
+            if images:
+                for i, mrz_text in zip(images, self._get_mrz_batch(list(images.values()))):
+                    mrz_texts[i] = mrz_text
+
+            for mrz_text in mrz_texts:
+                if isinstance(mrz_text, MRZNotFound):
+                    results.append(self._get_rejection(mrz_text, ignore_parse))
+                    continue
+                if isinstance(mrz_text, Exception):
+                    results.append(self._get_failure(mrz_text))
+                    continue
+                results.append(
+                    self._get_result(mrz_text, ignore_parse, include_checkdigit, or_failure=True)
+                )
+
+        return results
+
+    def _get_executor(self):
+        with self._executor_lock:
+            if self._executor is None:
+                from concurrent.futures import ThreadPoolExecutor
+
+                if self.ocr_backend in ("auto", "tesserocr"):
+                    _import_tesserocr()
+
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="fastmrz"
+                )
+            return self._executor
+
+    def submit(
         self,
         input_data,
         input_type="imagepath",
         ignore_parse=False,
         include_checkdigit=True,
     ):
-        if input_type == "imagepath":
-            if not self._is_valid(input_data):
-                raise ValueError("Input is not a valid image file.")
-            base64_string = self._image_to_base64(input_data)
-            image_array = self._base64_to_array(base64_string)
-            mrz_text = self._get_mrz(image_array)
-
-            return (
-                mrz_text
-                if ignore_parse
-                else self._parse_mrz(mrz_text, include_checkdigit=include_checkdigit)
-            )
-        elif input_type == "numpy":
-            if not self._is_valid(input_data):
-                raise ValueError("Input is not a valid NumPy array.")
-            mrz_text = self._get_mrz(input_data)
+        return self._get_executor().submit(
+            self.get_details,
+            input_data,
+            input_type=input_type,
+            ignore_parse=ignore_parse,
+            include_checkdigit=include_checkdigit,
+        )
 
-            return (
-                mrz_text
-                if ignore_parse
-                else self._parse_mrz(mrz_text, include_checkdigit=include_checkdigit)
-            )
-        elif input_type == "base64":
-            image_array = self._base64_to_array(input_data)
-            mrz_text = self._get_mrz(image_array)
+    def map_details(
+        self,
+        inputs,
+        input_type="imagepath",
+        ignore_parse=False,
+        include_checkdigit=True,
+    ):
+        futures = [
+            self.submit(input_data, input_type, ignore_parse, include_checkdigit)
+            for input_data in inputs
+        ]
+
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as error:
+                results.append(self._get_failure(error))
+
+        return results
+
+    def _get_async_limit(self):
+        # asyncio primitives belong to one event loop, so the limit is
+        # recreated when the instance is used from a different loop
+        loop = asyncio.get_running_loop()
+        if self._async_limit is None or self._async_limit[0] is not loop:
+            self._async_limit = (loop, asyncio.Semaphore(self.max_concurrency))
+        return self._async_limit[1]
+
+    def _run_in_executor(self, func, *args):
+        # The copied context carries the timings of the current document into
+        # the worker thread
+        return asyncio.get_running_loop().run_in_executor(
+            self._get_executor(), functools.partial(contextvars.copy_context().run, func, *args)
+        )
 
-            return (
-                mrz_text
-                if ignore_parse
-                else self._parse_mrz(mrz_text, include_checkdigit=include_checkdigit)
-            )
+    async def _arecognize(self, roi_threshold):
+        if not hasattr(self.ocr, "arecognize"):
+            return await self._run_in_executor(self._recognize_roi, roi_threshold)
+        if self.ocrb is not None:
+            mrz_text = await self._run_in_executor(self._recognize_ocrb, roi_threshold)
+            if mrz_text:
+                return mrz_text
+
+        with self._stage("ocr", cpu=False):
+            mrz_text = await self.ocr.arecognize(roi_threshold, psm=6)
+        if self.ocrb is not None:
+            await self._run_in_executor(self._learn_ocrb, roi_threshold, mrz_text)
+        return mrz_text
+
+    async def avalidate_mrz(self, mrz_text):
+        # Text validation takes microseconds; handing it to a thread would cost more.
+        # It is pure CPU work and never awaits, so it runs without yielding to the loop
+        return self.validate_mrz(mrz_text)
+
+    async def aget_details(
+        self,
+        input_data,
+        input_type="imagepath",
+        ignore_parse=False,
+        include_checkdigit=True,
+    ):
+        if input_type == "text":
+            return self.get_details(input_data, input_type, ignore_parse, include_checkdigit)
         elif input_type == "pdf":
-            # get_details_from_pdf(input_data, ignore_parse=False, include_checkdigit=True)
-            pass
-        elif input_type == "text":
-            mrz_text = self._cleanse_roi(input_data)
+            # Pages are rendered and recognized one after another until an MRZ
+            # validates, so the whole document runs as one job on the thread pool
+            async with self._get_async_limit():
+                return await self._run_in_executor(
+                    self.get_details, input_data, input_type, ignore_parse, include_checkdigit
+                )
+        if self.metrics is None:
+            return await self._aget_details(input_data, input_type, ignore_parse, include_checkdigit)
+
+        with self.metrics.trace() as timings:
+            with self.metrics.stage("total", cpu=False):
+                result = await self._aget_details(
+                    input_data, input_type, ignore_parse, include_checkdigit
+                )
+        return self._attach_timings(result, timings)
 
-            return (
-                mrz_text
-                if ignore_parse
-                else self._parse_mrz(mrz_text, include_checkdigit=include_checkdigit)
+    async def _aget_details(self, input_data, input_type, ignore_parse, include_checkdigit):
+        cache_key = None
+        if self.cache is not None:
+            cache_key = await self._run_in_executor(
+                self._get_cache_key, input_data, input_type, ignore_parse, include_checkdigit
             )
+            result = self._cache_get(cache_key)
+            if result is not None:
+                return result
+
+        async with self._get_async_limit():
+            try:
+                if self.cascade is not None:
+                    mrz_text = await self._run_in_executor(
+                        self._get_mrz_cascade, input_data, input_type
+                    )
+                else:
+                    mrz_text = await self._arecognize_input(input_data, input_type)
+            except MRZNotFound as error:
+                mrz_text = error
+
+        if isinstance(mrz_text, MRZNotFound):
+            result = self._get_rejection(mrz_text, ignore_parse)
         else:
-            raise ValueError(f"Unsupported input_type: {input_type}")
+            result = self._get_result(mrz_text, ignore_parse, include_checkdigit)
+        if cache_key is not None:
+            self._cache_set(cache_key, result)
+        return result
+
+    async def _arecognize_input(self, input_data, input_type):
+        roi_threshold = await self._run_in_executor(
+            self._get_roi_from_input, input_data, input_type
+        )
+        if roi_threshold is None:
+            return ""
+        return self._cleanse_roi(await self._arecognize(roi_threshold))
+
+    async def _aget_details_or_failure(self, *args):
+        try:
+            return await self.aget_details(*args)
+        except Exception as error:
+            return self._get_failure(error)
+
+    async def aget_details_batch(
+        self,
+        inputs,
+        input_type="imagepath",
+        ignore_parse=False,
+        include_checkdigit=True,
+    ):
+        # Yields results in input order while keeping a bounded window of
+        # documents in flight; the concurrency limit still applies inside it
+        window = collections.deque()
+        try:
+            for input_data in inputs:
+                window.append(
+                    asyncio.ensure_future(
+                        self._aget_details_or_failure(
+                            input_data, input_type, ignore_parse, include_checkdigit
+                        )
+                    )
+                )
+                if len(window) >= 2 * self.max_concurrency:
+                    yield await window.popleft()
+            while window:
+                yield await window.popleft()
+        finally:
+            for task in window:
+                task.cancel()
+
+    def _get_roi_signature(self, frame, roi_box):
+        from .stream import signature, to_small_gray
+
+        x_start, y_start, x_end, y_end = roi_box
+        return signature(to_small_gray(frame[y_start:y_end, x_start:x_end]), (64, 8))
+
+    def stream(
+        self,
+        frames,
+        blur_threshold=50.0,
+        duplicate_threshold=1.5,
+        drift_threshold=12.0,
+        include_checkdigit=True,
+    ):
+        from .stream import MRZVoter, sharpness, signature, signature_distance, to_small_gray
+
+        voter = MRZVoter()
+        roi_box = roi_signature = last_signature = None
+        for frame_index, frame in enumerate(frames):
+            gray = to_small_gray(frame)
+            frame_signature = signature(gray)
+            # Near-identical frames cannot change the vote, blurry ones only add noise
+            if (
+                last_signature is not None
+                and signature_distance(frame_signature, last_signature) < duplicate_threshold
+            ):
+                continue
+            if sharpness(gray) < blur_threshold:
+                continue
+            last_signature = frame_signature
+
+            # Keep the last MRZ box while the content inside it stays put
+            if roi_box is not None and (
+                signature_distance(self._get_roi_signature(frame, roi_box), roi_signature)
+                > drift_threshold
+            ):
+                roi_box = None
+            if roi_box is None:
+                output_data = self._forward_image(frame)
+                try:
+                    self._gate_mask(output_data, frame.shape)
+                except MRZNotFound:
+                    continue
+                roi_box = self._get_roi_box(output_data, frame)
+                if roi_box is None:
+                    continue
+                roi_signature = self._get_roi_signature(frame, roi_box)
+
+            mrz_text = self._cleanse_roi(self._recognize_roi(self._threshold_roi(frame, roi_box)))
+            if not voter.add(mrz_text):
+                roi_box = None
+                continue
+
+            result = self._parse_mrz_or_failure(mrz_text, include_checkdigit)
+            if result["status"] != "SUCCESS":
+                result = self._parse_mrz_or_failure(voter.consensus(), include_checkdigit)
+            result["frame_index"] = frame_index
+            result["frames_read"] = voter.frames
+            yield self._as_result(result)
+            if result["status"] == "SUCCESS":
+                return
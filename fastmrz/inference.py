@@ -0,0 +1,153 @@
+import os
+import queue
+from contextlib import contextmanager
+
+from ._lazy import LazyModule
+
+# FastMRZ checks its options against this module when it is created, long
+# before a model is loaded
+cv2 = LazyModule("cv2")
+
+MODEL_DIR = os.path.join(os.path.dirname(__file__), "model")
+# Variants written by benchmarks/quantize_model.py next to the float model
+MODELS = {
+    "float": "mrz_seg.onnx",
+    "int8": "mrz_seg.int8.onnx",
+    "fp16": "mrz_seg.fp16.onnx",
+}
+
+
+def get_model_path(model="float"):
+    if model not in MODELS:
+        # Anything else is the path of a model of its own
+        return os.fspath(model)
+    model_path = os.path.join(MODEL_DIR, MODELS[model])
+    if model != "float" and not os.path.isfile(model_path):
+        raise ValueError(
+            f"The {model} model is not installed; generate it with benchmarks/quantize_model.py"
+        )
+    return model_path
+
+
+class OpenCVBackend:
+    name = "opencv"
+
+    # A cv2.dnn net keeps its input blob as state between setInput() and
+    # forward(), so each concurrent caller checks out a net of its own
+    def __init__(self, model_path, pool_size=1, intra_op_threads=None, inter_op_threads=None):
+        if intra_op_threads is not None:
+            # OpenCV has one thread pool for the whole process
+            cv2.setNumThreads(intra_op_threads)
+        self.errors = (cv2.error,)
+        self.model_path = model_path
+        self.nets = [cv2.dnn.readNetFromONNX(model_path) for _ in range(pool_size)]
+        self._nets = queue.LifoQueue()
+        for net in self.nets:
+            self._nets.put(net)
+
+    def warmup(self, image_array):
+        # OpenCV sets up each net's layers on its first forward()
+        for net in self.nets:
+            net.setInput(image_array)
+            net.forward()
+
+    def _after_fork(self):
+        # Nets another thread was running at the fork are lost to the child;
+        # the idle ones keep sharing their weights with the parent
+        idle = list(self._nets.queue)
+        missing = len(self.nets) - len(idle)
+        self.nets = idle + [cv2.dnn.readNetFromONNX(self.model_path) for _ in range(missing)]
+        self._nets = queue.LifoQueue()
+        for net in self.nets:
+            self._nets.put(net)
+
+    @property
+    def net(self):
+        return self.nets[0]
+
+    @contextmanager
+    def checkout(self):
+        net = self._nets.get()
+        try:
+            yield net
+        finally:
+            self._nets.put(net)
+
+    def forward(self, image_array):
+        with self.checkout() as net:
+            net.setInput(image_array)
+
+            return net.forward()
+
+
+class OnnxRuntimeBackend:
+    name = "onnxruntime"
+
+    # One session serves every worker: run() is thread-safe and keeps no input
+    # state. intra_op_threads bounds the threads a single run uses, so with
+    # several workers it is usually set to cores / workers.
+    def __init__(self, model_path, pool_size=1, intra_op_threads=None, inter_op_threads=None):
+        from onnxruntime.capi import onnxruntime_pybind11_state
+
+        self.model_path = model_path
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+        self.errors = (
+            onnxruntime_pybind11_state.Fail,
+            onnxruntime_pybind11_state.InvalidArgument,
+            onnxruntime_pybind11_state.RuntimeException,
+        )
+        self._create_session()
+
+    def _create_session(self):
+        import onnxruntime
+
+        intra_op_threads = self.intra_op_threads
+        inter_op_threads = self.inter_op_threads
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads is not None:
+            options.intra_op_num_threads = intra_op_threads
+        if inter_op_threads is not None:
+            options.execution_mode = onnxruntime.ExecutionMode.ORT_PARALLEL
+            options.inter_op_num_threads = inter_op_threads
+        self.session = onnxruntime.InferenceSession(
+            self.model_path, options, providers=["CPUExecutionProvider"]
+        )
+        self._input_name = self.session.get_inputs()[0].name
+
+    def warmup(self, image_array):
+        # The first run allocates the memory arena
+        self.forward(image_array)
+
+    def _after_fork(self):
+        # ONNX Runtime does not support fork: its thread pools are gone in the
+        # child, and building a new session there can deadlock on state the
+        # parent's threads held
+        self.session = None
+
+    @property
+    def net(self):
+        return self.session
+
+    def forward(self, image_array):
+        if self.session is None:
+            raise RuntimeError(
+                "ONNX Runtime sessions do not survive a fork; create the FastMRZ in the "
+                "worker process, or preload with the opencv backend"
+            )
+        return self.session.run(None, {self._input_name: image_array})[0]
+
+
+INFERENCE_BACKENDS = {
+    OpenCVBackend.name: OpenCVBackend,
+    OnnxRuntimeBackend.name: OnnxRuntimeBackend,
+}
+
+
+def get_inference_backend(backend="opencv", model_path=None, **kwargs):
+    if not isinstance(backend, str):
+        return backend
+    if backend not in INFERENCE_BACKENDS:
+        raise ValueError(f"Unsupported inference_backend: {backend}")
+    return INFERENCE_BACKENDS[backend](model_path or get_model_path(), **kwargs)
@@ -0,0 +1,159 @@
+import bisect
+import collections
+import contextvars
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+
+STAGES = ("decode", "preprocess", "forward", "roi", "gate", "ocrb", "ocr", "correct", "parse", "total")
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Timings of the document being processed; a context variable so coroutines
+# and executor jobs started with a copied context add to the right one
+_current_timings = contextvars.ContextVar("fastmrz_timings", default=None)
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        # Prometheus buckets are "less than or equal", hence bisect_left
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative_counts(self):
+        counts = []
+        total = 0
+        for count in self.counts:
+            total += count
+            counts.append(total)
+        return counts
+
+    def quantile(self, q):
+        # Upper bound of the bucket holding the q-th observation
+        if not self.count:
+            return None
+        rank = q * self.count
+        for upper, count in zip(self.buckets + (float("inf"),), self.cumulative_counts()):
+            if count >= rank:
+                return upper
+
+
+class Metrics:
+    def __init__(self, buckets=DEFAULT_BUCKETS, attach_timings=False):
+        self.buckets = tuple(sorted(buckets))
+        self.attach_timings = attach_timings
+        self.hooks = []
+        self._lock = threading.Lock()
+        self._wall = {}
+        self._cpu = collections.defaultdict(float)
+
+    def add_hook(self, hook):
+        # hook(stage) is called when a stage starts and may return a context
+        # manager (e.g. an OpenTelemetry span) that is exited when it ends
+        self.hooks.append(hook)
+        return hook
+
+    def remove_hook(self, hook):
+        self.hooks.remove(hook)
+
+    @contextmanager
+    def stage(self, name, cpu=True):
+        # Pass cpu=False around awaits: other coroutines share the thread, so
+        # its CPU time says nothing about this stage
+        with ExitStack() as spans:
+            for hook in list(self.hooks):
+                span = hook(name)
+                if span is not None:
+                    spans.enter_context(span)
+            wall_start = time.perf_counter()
+            cpu_start = time.thread_time() if cpu else 0.0
+            try:
+                yield
+            finally:
+                self.observe(
+                    name,
+                    time.perf_counter() - wall_start,
+                    time.thread_time() - cpu_start if cpu else 0.0,
+                )
+
+    def observe(self, name, wall, cpu=0.0):
+        with self._lock:
+            histogram = self._wall.get(name)
+            if histogram is None:
+                histogram = self._wall[name] = Histogram(self.buckets)
+            histogram.observe(wall)
+            self._cpu[name] += cpu
+
+        timings = _current_timings.get()
+        if timings is not None:
+            stage_timings = timings.setdefault(name, {"wall": 0.0, "cpu": 0.0})
+            stage_timings["wall"] += wall
+            stage_timings["cpu"] += cpu
+
+    @contextmanager
+    def trace(self, timings=None):
+        # Passing the same dict again adds to the timings of an earlier trace
+        if timings is None:
+            timings = {}
+        token = _current_timings.set(timings)
+        try:
+            yield timings
+        finally:
+            _current_timings.reset(token)
+
+    def _ordered_stages(self):
+        return sorted(
+            self._wall, key=lambda name: (STAGES.index(name) if name in STAGES else len(STAGES), name)
+        )
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                name: {
+                    "count": self._wall[name].count,
+                    "wall_seconds": self._wall[name].sum,
+                    "cpu_seconds": self._cpu[name],
+                    "p50": self._wall[name].quantile(0.5),
+                    "p95": self._wall[name].quantile(0.95),
+                    "p99": self._wall[name].quantile(0.99),
+                }
+                for name in self._ordered_stages()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._wall.clear()
+            self._cpu.clear()
+
+    def _after_fork(self):
+        self._lock = threading.Lock()
+
+    def prometheus_text(self, prefix="fastmrz"):
+        lines = [
+            f"# HELP {prefix}_stage_seconds Wall-clock time spent in each pipeline stage.",
+            f"# TYPE {prefix}_stage_seconds histogram",
+        ]
+        with self._lock:
+            stages = self._ordered_stages()
+            for name in stages:
+                histogram = self._wall[name]
+                bounds = [repr(float(bound)) for bound in histogram.buckets] + ["+Inf"]
+                for bound, count in zip(bounds, histogram.cumulative_counts()):
+                    lines.append(f'{prefix}_stage_seconds_bucket{{stage="{name}",le="{bound}"}} {count}')
+                lines.append(f'{prefix}_stage_seconds_sum{{stage="{name}"}} {histogram.sum!r}')
+                lines.append(f'{prefix}_stage_seconds_count{{stage="{name}"}} {histogram.count}')
+            lines.append(
+                f"# HELP {prefix}_stage_cpu_seconds_total "
+                "CPU time of the calling thread spent in each pipeline stage."
+            )
+            lines.append(f"# TYPE {prefix}_stage_cpu_seconds_total counter")
+            for name in stages:
+                lines.append(f'{prefix}_stage_cpu_seconds_total{{stage="{name}"}} {self._cpu[name]!r}')
+
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,192 @@
+import asyncio
+import os
+import queue
+import threading
+
+import cv2
+import pytesseract
+
+
+def _find_tessdata(tesseract_path):
+    # Standard layouts: <prefix>/bin/tesseract -> <prefix>/share/tessdata on
+    # Unix, <prefix>/tesseract.exe -> <prefix>/tessdata on Windows
+    prefix = os.path.dirname(os.path.abspath(tesseract_path))
+    for candidate in (
+        os.path.join(prefix, "tessdata"),
+        os.path.join(os.path.dirname(prefix), "share", "tessdata"),
+    ):
+        if os.path.isfile(os.path.join(candidate, "mrz.traineddata")):
+            return candidate
+    return ""
+
+
+class PytesseractBackend:
+    name = "pytesseract"
+
+    def __init__(self, tesseract_path="", tessdata_path="", lang="mrz"):
+        self.tesseract_path = tesseract_path
+        self.tessdata_path = tessdata_path
+        self.lang = lang
+
+    def recognize(self, image, psm=6):
+        if self.tesseract_path != "":
+            pytesseract.pytesseract.tesseract_cmd = self.tesseract_path
+        custom_config = f"--oem 3 --psm {psm}" + (
+            f" --tessdata-dir {self.tessdata_path}" if self.tessdata_path else ""
+        )
+        return pytesseract.image_to_string(image, lang=self.lang, config=custom_config)
+
+    def warmup(self, image):
+        # Each call starts a tesseract process; this checks the binary and the
+        # traineddata and leaves them in the page cache
+        self.recognize(image)
+
+    async def arecognize(self, image, psm=6):
+        # Same command as pytesseract, but image and text go through pipes of
+        # an asyncio subprocess, so the event loop keeps running meanwhile
+        loop = asyncio.get_running_loop()
+        _, image_png = await loop.run_in_executor(None, cv2.imencode, ".png", image)
+        command = [
+            self.tesseract_path or pytesseract.pytesseract.tesseract_cmd,
+            "stdin",
+            "stdout",
+            "-l",
+            self.lang,
+            "--oem",
+            "3",
+            "--psm",
+            str(psm),
+        ]
+        if self.tessdata_path:
+            command += ["--tessdata-dir", str(self.tessdata_path)]
+        process = await asyncio.create_subprocess_exec(
+            *command,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        stdout, stderr = await process.communicate(image_png.tobytes())
+        if process.returncode != 0:
+            raise pytesseract.TesseractError(
+                process.returncode, stderr.decode("utf-8", "replace").strip()
+            )
+        return stdout.decode("utf-8")
+
+    def close(self):
+        pass
+
+
+class TesserocrBackend:
+    name = "tesserocr"
+
+    def __init__(self, tesseract_path="", tessdata_path="", lang="mrz", pool_size=None):
+        import tesserocr
+
+        self._tesserocr = tesserocr
+        self.tessdata_path = str(tessdata_path) if tessdata_path else ""
+        if not self.tessdata_path and tesseract_path:
+            self.tessdata_path = _find_tessdata(tesseract_path)
+        self.lang = lang
+        self.pool_size = pool_size or os.cpu_count() or 1
+        # Engines are created on demand up to pool_size and reused afterwards,
+        # so the traineddata is loaded once per engine instead of once per call
+        self._engines = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _create_engine(self):
+        kwargs = {"lang": self.lang, "oem": self._tesserocr.OEM.DEFAULT}
+        if self.tessdata_path:
+            kwargs["path"] = self.tessdata_path
+        return self._tesserocr.PyTessBaseAPI(**kwargs)
+
+    def _checkout(self):
+        try:
+            return self._engines.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            create = self._created < self.pool_size
+            if create:
+                self._created += 1
+        if not create:
+            return self._engines.get()
+        try:
+            return self._create_engine()
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+
+    def warmup(self, image):
+        # Loads the traineddata into every engine of the pool now instead of
+        # on the first requests
+        with self._lock:
+            missing = self.pool_size - self._created
+            self._created += missing
+        for created in range(missing):
+            try:
+                engine = self._create_engine()
+            except Exception:
+                with self._lock:
+                    self._created -= missing - created
+                raise
+            self._engines.put(engine)
+        self.recognize(image)
+
+    def _after_fork(self):
+        # Engines another thread was using at the fork are lost to the child;
+        # the idle ones keep sharing their traineddata with the parent
+        idle = list(self._engines.queue)
+        self._engines = queue.LifoQueue()
+        for engine in idle:
+            self._engines.put(engine)
+        self._created = len(idle)
+        self._lock = threading.Lock()
+
+    def recognize(self, image, psm=6):
+        height, width = image.shape[:2]
+        channels = 1 if image.ndim == 2 else image.shape[2]
+        engine = self._checkout()
+        try:
+            engine.SetPageSegMode(psm)
+            engine.SetImageBytes(image.tobytes(), width, height, channels, width * channels)
+            return engine.GetUTF8Text()
+        finally:
+            engine.Clear()
+            self._engines.put(engine)
+
+    def close(self):
+        with self._lock:
+            while True:
+                try:
+                    self._engines.get_nowait().End()
+                except queue.Empty:
+                    break
+                self._created -= 1
+
+
+OCR_BACKENDS = {
+    PytesseractBackend.name: PytesseractBackend,
+    TesserocrBackend.name: TesserocrBackend,
+}
+
+
+def get_ocr_backend(backend="auto", tesseract_path="", tessdata_path="", **kwargs):
+    if not isinstance(backend, str):
+        return backend
+    if backend == "auto":
+        try:
+            ocr = TesserocrBackend(tesseract_path, tessdata_path, **kwargs)
+            # Load one engine up front so a missing traineddata falls back too
+            ocr._engines.put(ocr._checkout())
+            return ocr
+        except (ImportError, RuntimeError, ValueError):
+            # ValueError: tesserocr was first imported off the main thread
+            kwargs.pop("pool_size", None)
+            return PytesseractBackend(tesseract_path, tessdata_path, **kwargs)
+    if backend not in OCR_BACKENDS:
+        raise ValueError(f"Unsupported ocr_backend: {backend}")
+    if backend == PytesseractBackend.name:
+        kwargs.pop("pool_size", None)
+    return OCR_BACKENDS[backend](tesseract_path, tessdata_path, **kwargs)
@@ -0,0 +1,216 @@
+import threading
+
+import cv2
+import numpy as np
+
+ALPHABET = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ<"
+# Characters per line by number of lines: TD1 has 3x30, TD2/MRV-B 2x36 and
+# TD3/MRV-A 2x44
+LINE_LENGTHS = {3: (30,), 2: (44, 36)}
+CELL_WIDTH = 16
+CELL_HEIGHT = 24
+MIN_SCORE = 0.6
+
+
+def _ink(roi):
+    # The thresholded ROI is dark text on a light background
+    ink = roi < 128
+    if ink.mean() > 0.5:
+        ink = ~ink
+    return ink
+
+
+def split_lines(ink):
+    rows = np.flatnonzero(ink.sum(axis=1) > max(1, ink.shape[1] // 100))
+    if len(rows) == 0:
+        return []
+    breaks = np.flatnonzero(np.diff(rows) > 1)
+    bands = [
+        (rows[start], rows[end] + 1)
+        for start, end in zip(np.r_[0, breaks + 1], np.r_[breaks, len(rows) - 1])
+    ]
+    # Drop specks and cut-off neighbouring text; MRZ lines are the tallest bands
+    tallest = max(end - start for start, end in bands)
+    bands = [(start, end) for start, end in bands if end - start >= tallest // 2]
+    if len(bands) > 3:
+        bands = sorted(sorted(bands, key=lambda band: int(ink[band[0] : band[1]].sum()))[-3:])
+    return bands
+
+
+def _glyph_runs(line_ink):
+    # Glyphs are the runs of inked columns. Consecutive runs are mostly one
+    # pitch apart, so each gap is rounded to a whole number of cells.
+    columns = np.r_[False, line_ink.any(axis=0), False]
+    edges = np.flatnonzero(columns[1:] != columns[:-1])
+    centers = (edges[::2] + edges[1::2]) / 2
+    if len(centers) < 2:
+        return None
+    pitch = np.median(np.diff(centers))
+    if pitch <= 0:
+        return None
+    return centers, np.r_[0, np.cumsum(np.maximum(1, np.round(np.diff(centers) / pitch)))]
+
+
+def estimate_length(line_ink):
+    runs = _glyph_runs(line_ink)
+    return 0 if runs is None else int(runs[1][-1]) + 1
+
+
+def _fit_pitch(line_ink, length):
+    # A straight line through (cell index, run centre) gives origin and pitch
+    runs = _glyph_runs(line_ink)
+    if runs is None or len(runs[0]) < length // 2:
+        return None
+    centers, indices = runs
+    # Keep the window of `length` cells holding the most runs; runs outside
+    # it are card edges or text around the MRZ
+    first = max(
+        range(int(indices[0]), max(int(indices[-1]) - length + 2, int(indices[0]) + 1)),
+        key=lambda first: np.count_nonzero((indices >= first) & (indices < first + length)),
+    )
+    inside = (indices >= first) & (indices < first + length)
+    if np.count_nonzero(inside) < 2:
+        return None
+    pitch, origin = np.polyfit(indices[inside] - first, centers[inside], 1)
+    return origin, pitch
+
+
+def split_cells(line_ink, length):
+    fit = _fit_pitch(line_ink, length)
+    if fit is None:
+        return None
+    origin, pitch = fit
+    cells = np.zeros((length, CELL_HEIGHT, CELL_WIDTH), dtype=np.float32)
+    width = max(1, int(round(pitch)))
+    for i in range(length):
+        left = max(0, int(round(origin + (i - 0.5) * pitch)))
+        cell = line_ink[:, left : left + width]
+        ink_columns = np.flatnonzero(cell.any(axis=0))
+        if len(ink_columns) == 0:
+            continue
+        # Centre the glyph in its cell to absorb what is left of the grid error
+        left = max(0, left + (ink_columns[0] + ink_columns[-1] + 1 - width) // 2)
+        cells[i] = cv2.resize(
+            line_ink[:, left : left + width].astype(np.float32),
+            (CELL_WIDTH, CELL_HEIGHT),
+            interpolation=cv2.INTER_AREA,
+        )
+    return cells
+
+
+def _normalize(cells):
+    vectors = cells.reshape(len(cells), -1)
+    vectors = vectors - vectors.mean(axis=1, keepdims=True)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-6)
+
+
+class OCRBRecognizer:
+    # Reads the fixed-pitch OCR-B lines of an MRZ without Tesseract. Cells are
+    # classified in one batch, either by an ONNX classifier (input N x 1 x 24 x 16
+    # ink in [0, 1], output N x 37 scores in ALPHABET order) or by correlation
+    # with templates learned from reads whose check digits passed.
+    def __init__(self, templates_path=None, classifier_path=None, learn=True, min_samples=1):
+        self.learn_enabled = learn
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+        self._sums = np.zeros((len(ALPHABET), CELL_HEIGHT * CELL_WIDTH), dtype=np.float64)
+        self._counts = np.zeros(len(ALPHABET), dtype=np.int64)
+        self._templates = None
+        self._classifier = None
+        if classifier_path is not None:
+            self._classifier = cv2.dnn.readNetFromONNX(str(classifier_path))
+        if templates_path is not None:
+            self.load(templates_path)
+
+    @property
+    def ready(self):
+        return self._classifier is not None or bool((self._counts >= self.min_samples).any())
+
+    def _get_templates(self):
+        with self._lock:
+            if self._templates is None:
+                known = self._counts >= self.min_samples
+                templates = np.zeros_like(self._sums, dtype=np.float32)
+                templates[known] = _normalize(
+                    (self._sums[known] / self._counts[known, None]).astype(np.float32)
+                )
+                self._templates = templates
+            return self._templates
+
+    def _classify(self, cells):
+        if self._classifier is not None:
+            blob = cells[:, None, :, :]
+            with self._lock:
+                self._classifier.setInput(blob)
+                scores = self._classifier.forward().reshape(len(cells), len(ALPHABET))
+            scores = np.exp(scores - scores.max(axis=1, keepdims=True))
+            scores /= scores.sum(axis=1, keepdims=True)
+        else:
+            scores = _normalize(cells) @ self._get_templates().T
+        best = scores.argmax(axis=1)
+        return best, scores[np.arange(len(cells)), best]
+
+    def _segment(self, roi, lengths):
+        ink = _ink(roi)
+        bands = split_lines(ink)
+        if len(bands) != len(lengths):
+            return None
+        cells = [split_cells(ink[start:end], length) for (start, end), length in zip(bands, lengths)]
+        if any(line_cells is None for line_cells in cells):
+            return None
+        return np.concatenate(cells)
+
+    def recognize(self, image, psm=6):
+        # Returns "" when the ROI does not segment into MRZ lines or any cell is
+        # uncertain, so the caller can fall back to Tesseract
+        if not self.ready:
+            return ""
+        ink = _ink(image)
+        bands = split_lines(ink)
+        if len(bands) not in LINE_LENGTHS:
+            return ""
+        # TD2 and TD3 both have two lines; the glyph count tells them apart
+        estimate = max(estimate_length(ink[start:end]) for start, end in bands)
+        length = min(LINE_LENGTHS[len(bands)], key=lambda length: abs(length - estimate))
+        cells = [split_cells(ink[start:end], length) for start, end in bands]
+        if any(line_cells is None for line_cells in cells):
+            return ""
+        labels, scores = self._classify(np.concatenate(cells))
+        if scores.min() < MIN_SCORE:
+            return ""
+
+        characters = "".join(ALPHABET[label] for label in labels)
+        return "".join(
+            characters[i : i + length] + "\n" for i in range(0, len(characters), length)
+        )
+
+    def learn(self, image, mrz_text):
+        lines = mrz_text.split("\n")
+        if any(character not in ALPHABET for line in lines for character in line):
+            return False
+        cells = self._segment(image, [len(line) for line in lines])
+        if cells is None:
+            return False
+        labels = np.array([ALPHABET.index(character) for line in lines for character in line])
+        with self._lock:
+            np.add.at(self._sums, labels, cells.reshape(len(cells), -1))
+            np.add.at(self._counts, labels, 1)
+            self._templates = None
+        return True
+
+    def save(self, path):
+        with self._lock:
+            np.savez_compressed(path, alphabet=ALPHABET, sums=self._sums, counts=self._counts)
+
+    def load(self, path):
+        with np.load(path) as data:
+            if str(data["alphabet"]) != ALPHABET:
+                raise ValueError("Templates were saved for a different alphabet.")
+            with self._lock:
+                self._sums = data["sums"].astype(np.float64)
+                self._counts = data["counts"].astype(np.int64)
+                self._templates = None
+
+    def _after_fork(self):
+        self._lock = threading.Lock()
@@ -0,0 +1,72 @@
+import os
+
+import numpy as np
+
+try:
+    import pymupdf
+except ImportError:
+    # PyMuPDF releases before 1.24.3 only install the fitz module name
+    try:
+        import fitz as pymupdf
+    except ImportError as error:
+        raise ImportError("PDF input requires PyMuPDF: pip install fastmrz[pdf]") from error
+
+# OCR-B characters are 2.3-2.5 mm tall, roughly 28 px at 300 dpi
+PDF_DPI = 300
+MIN_IMAGE_SIDE = 256
+FULL_PAGE_COVERAGE = 0.9
+
+
+def open_pdf(pdf):
+    try:
+        if isinstance(pdf, (str, os.PathLike)):
+            return pymupdf.open(pdf, filetype="pdf")
+        if not isinstance(pdf, (bytes, bytearray)):
+            pdf = bytes(pdf)
+        return pymupdf.open(stream=pdf, filetype="pdf")
+    except (RuntimeError, ValueError) as error:
+        raise ValueError("Input is not a valid PDF document.") from error
+
+
+def _pixmap_to_array(pixmap):
+    # RGB without alpha, the channel layout decoded images have everywhere else
+    if pixmap.colorspace is None:
+        return None
+    if pixmap.colorspace.n != 3:
+        pixmap = pymupdf.Pixmap(pymupdf.csRGB, pixmap)
+    if pixmap.alpha:
+        pixmap = pymupdf.Pixmap(pixmap, 0)
+    return np.frombuffer(pixmap.samples, dtype=np.uint8).reshape(pixmap.height, pixmap.width, 3)
+
+
+def _embedded_images(document, page):
+    page_area = page.rect.get_area()
+    covers_page = False
+    for xref, _, width, height, *_ in page.get_images(full=True):
+        if min(width, height) < MIN_IMAGE_SIDE:
+            continue
+        try:
+            image = _pixmap_to_array(pymupdf.Pixmap(document, xref))
+        except (RuntimeError, ValueError):
+            continue
+        if image is None:
+            continue
+        covers_page = covers_page or any(
+            rect.get_area() >= FULL_PAGE_COVERAGE * page_area for rect in page.get_image_rects(xref)
+        )
+        yield image, covers_page
+
+
+def iter_pdf_images(pdf, dpi=PDF_DPI):
+    # Yields one image at a time: the page's embedded scans at their native
+    # resolution first, then a rendering of the page. The rendering is skipped
+    # when an unrotated page is a single full-page scan, as it would show the
+    # same pixels resampled.
+    with open_pdf(pdf) as document:
+        for page in document:
+            covers_page = False
+            for image, covers_page in _embedded_images(document, page):
+                yield image
+            if covers_page and page.rotation == 0:
+                continue
+            yield _pixmap_to_array(page.get_pixmap(dpi=dpi, colorspace=pymupdf.csRGB, alpha=False))
@@ -0,0 +1,299 @@
+import collections
+import itertools
+import multiprocessing
+import os
+import pickle
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+from multiprocessing.connection import wait
+
+import numpy as np
+
+
+class WorkerCrashed(RuntimeError):
+    pass
+
+
+def _worker_main(connection, segment_name, slot_size, options, ignore_parse, include_checkdigit):
+    from .fastmrz import FastMRZ
+
+    # On 3.8-3.12 attaching registers the segment with a resource tracker.
+    # Forked children inherit the parent's tracker and spawn and forkserver
+    # children are handed its descriptor, so this only repeats the pool's own
+    # registration; unregistering here would drop it, and only the pool unlinks
+    segment = shared_memory.SharedMemory(name=segment_name)
+    fast_mrz = FastMRZ(**options)
+    try:
+        while True:
+            task = connection.recv()
+            if task is None:
+                return
+            task_id, slot, shape, dtype = task
+            # A view into the parent's slot; nothing is copied or unpickled
+            frame = np.ndarray(shape, dtype, buffer=segment.buf, offset=slot * slot_size)
+            try:
+                result = fast_mrz.get_details(frame, "numpy", ignore_parse, include_checkdigit)
+                message = (task_id, True, result)
+            except Exception as error:
+                message = (task_id, False, error)
+            # The slot is reused as soon as the parent hears back
+            del frame
+            try:
+                connection.send(message)
+            except Exception as error:
+                # Unpicklable results and errors still release the slot
+                connection.send((task_id, False, RuntimeError(str(error))))
+    finally:
+        fast_mrz.close()
+        segment.close()
+
+
+class _Worker:
+    def __init__(self, process, connection):
+        self.process = process
+        self.connection = connection
+        self.send_lock = threading.Lock()
+        # task_id -> slot of every frame sent to this worker and not answered
+        self.tasks = {}
+
+
+class FramePool:
+    # Worker processes that each run their own FastMRZ on frames handed over
+    # through a shared memory ring of fixed-size slots. submit() copies a
+    # frame into the next free slot and sends the worker only the slot index,
+    # shape and dtype; the worker reads the frame in place. A slot is free
+    # again once its result arrives, or once the worker holding it has died,
+    # in which case its frames fail with WorkerCrashed and a new worker is
+    # started. The ring takes slots * slot_size bytes of shared memory.
+    def __init__(
+        self,
+        workers=None,
+        slots=None,
+        slot_size=1920 * 1080 * 3,
+        ignore_parse=False,
+        include_checkdigit=True,
+        context=None,
+        **options,
+    ):
+        self.workers = workers or os.cpu_count() or 1
+        self.slots = slots or 2 * self.workers
+        self.slot_size = slot_size
+        self._worker_args = (options, ignore_parse, include_checkdigit)
+        self._context = context or multiprocessing.get_context()
+        # Replacements are started while the collector thread runs, and a
+        # forked child would inherit whatever locks other threads held
+        if self._context.get_start_method() == "fork":
+            methods = multiprocessing.get_all_start_methods()
+            self._respawn_context = multiprocessing.get_context(
+                "forkserver" if "forkserver" in methods else "spawn"
+            )
+        else:
+            self._respawn_context = self._context
+        try:
+            pickle.dumps(self._worker_args)
+        except Exception as error:
+            # Found now rather than on the collector thread after a crash
+            raise ValueError(f"FramePool options must be picklable: {error}") from error
+        self._segment = shared_memory.SharedMemory(create=True, size=self.slots * slot_size)
+        self._condition = threading.Condition()
+        self._free = collections.deque(range(self.slots))
+        self._futures = {}
+        self._task_ids = itertools.count()
+        self._counters = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "worker_crashes": 0,
+            "reclaimed_slots": 0,
+            "max_queue_depth": 0,
+        }
+        self._started = time.monotonic()
+        self._closed = False
+        self._workers = [self._start_worker() for _ in range(self.workers)]
+        # Wakes the collector when workers are replaced or the pool closes
+        self._wakeup_reader, self._wakeup_writer = self._context.Pipe(duplex=False)
+        self._collector = threading.Thread(
+            target=self._collect, name="fastmrz-frame-pool", daemon=True
+        )
+        self._collector.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _start_worker(self, context=None):
+        context = context or self._context
+        connection, child_connection = context.Pipe()
+        process = context.Process(
+            target=_worker_main,
+            args=(child_connection, self._segment.name, self.slot_size) + self._worker_args,
+            daemon=True,
+        )
+        process.start()
+        child_connection.close()
+        return _Worker(process, connection)
+
+    def submit(self, frame, timeout=None):
+        frame = np.asarray(frame)
+        if frame.nbytes > self.slot_size:
+            raise ValueError(
+                f"Frame of {frame.nbytes} bytes does not fit a {self.slot_size} byte slot."
+            )
+        if frame.dtype.hasobject:
+            # Only the pointers would be copied, and they mean nothing to a worker
+            raise ValueError("Frames of Python objects cannot be shared with workers.")
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._free or self._closed, timeout):
+                raise TimeoutError("No frame slot became free in time.")
+            if self._closed:
+                raise RuntimeError("The frame pool is closed.")
+            slot = self._free.popleft()
+            depth = self.slots - len(self._free)
+            self._counters["max_queue_depth"] = max(self._counters["max_queue_depth"], depth)
+
+        # The slot belongs to no worker yet, so _reclaim cannot hand it to
+        # another submit while the frame is copied in
+        try:
+            np.ndarray(
+                frame.shape, frame.dtype, buffer=self._segment.buf, offset=slot * self.slot_size
+            )[...] = frame
+        except BaseException:
+            with self._condition:
+                self._free.append(slot)
+                self._condition.notify()
+            raise
+
+        with self._condition:
+            if self._closed:
+                self._free.append(slot)
+                raise RuntimeError("The frame pool is closed.")
+            task_id = next(self._task_ids)
+            future = Future()
+            self._futures[task_id] = (future, slot)
+            self._counters["submitted"] += 1
+            # The least busy worker gets the frame
+            worker = min(self._workers, key=lambda worker: len(worker.tasks))
+            worker.tasks[task_id] = slot
+
+        try:
+            with worker.send_lock:
+                worker.connection.send((task_id, slot, frame.shape, frame.dtype.str))
+        except (OSError, ValueError):
+            # The worker died; the collector fails this frame with the others
+            pass
+        return future
+
+    def map(self, frames, timeout=None):
+        # Results in input order; frames that failed come back as failure dicts
+        futures = [self.submit(frame, timeout) for frame in frames]
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as error:
+                results.append({"status": "FAILURE", "status_message": str(error)})
+        return results
+
+    def _finish(self, worker, task_id, ok, payload):
+        with self._condition:
+            slot = worker.tasks.pop(task_id, None)
+            entry = self._futures.pop(task_id, None)
+            if slot is not None:
+                self._free.append(slot)
+                self._condition.notify()
+            self._counters["completed" if ok else "failed"] += 1
+        if entry is not None:
+            if ok:
+                entry[0].set_result(payload)
+            else:
+                entry[0].set_exception(payload)
+
+    def _reclaim(self, worker):
+        # Results the worker sent before it died still count
+        try:
+            while worker.connection.poll():
+                self._finish(worker, *worker.connection.recv())
+        except (EOFError, OSError):
+            pass
+        error = WorkerCrashed(f"Worker process exited with code {worker.process.exitcode}.")
+        # The replacement starts outside the lock, and takes the dead worker's
+        # place in the same step that frees its slots, so no frame is sent to
+        # a dead worker and then forgotten
+        replacement = None if self._closed else self._start_worker(self._respawn_context)
+        with self._condition:
+            lost = list(worker.tasks.items())
+            worker.tasks.clear()
+            for task_id, slot in lost:
+                self._free.append(slot)
+            self._counters["failed"] += len(lost)
+            self._counters["reclaimed_slots"] += len(lost)
+            if replacement is not None:
+                self._counters["worker_crashes"] += 1
+                self._workers[self._workers.index(worker)] = replacement
+            self._condition.notify_all()
+            futures = [self._futures.pop(task_id)[0] for task_id, _ in lost]
+        worker.connection.close()
+        for future in futures:
+            future.set_exception(error)
+
+    def _collect(self):
+        while True:
+            with self._condition:
+                if self._closed and not self._futures:
+                    return
+                workers = list(self._workers)
+            waitables = {self._wakeup_reader: None}
+            for worker in workers:
+                waitables[worker.connection] = worker
+                waitables[worker.process.sentinel] = worker
+            for ready in wait(list(waitables)):
+                worker = waitables[ready]
+                if worker is None:
+                    self._wakeup_reader.recv()
+                elif ready is worker.connection:
+                    try:
+                        message = worker.connection.recv()
+                    except (EOFError, OSError):
+                        continue
+                    self._finish(worker, *message)
+                elif worker in self._workers:
+                    self._reclaim(worker)
+
+    def stats(self):
+        with self._condition:
+            stats = dict(self._counters)
+            stats["workers"] = self.workers
+            stats["slots"] = self.slots
+            stats["queue_depth"] = self.slots - len(self._free)
+            uptime = time.monotonic() - self._started
+        stats["uptime_seconds"] = uptime
+        stats["throughput"] = stats["completed"] / uptime if uptime else 0.0
+        return stats
+
+    def close(self):
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._condition.notify_all()
+        # Workers finish the frames they hold before they read the None
+        for worker in self._workers:
+            try:
+                with worker.send_lock:
+                    worker.connection.send(None)
+            except (OSError, ValueError):
+                pass
+        for worker in self._workers:
+            worker.process.join()
+        self._wakeup_writer.send(None)
+        self._collector.join()
+        for worker in self._workers:
+            worker.connection.close()
+        self._wakeup_reader.close()
+        self._wakeup_writer.close()
+        self._segment.close()
+        self._segment.unlink()
@@ -0,0 +1,524 @@
+import json
+from datetime import date, datetime
+
+FIELDS = [
+    "mrz_type",
+    "document_code",
+    "issuer_code",
+    "surname",
+    "given_name",
+    "document_number",
+    "document_number_checkdigit",
+    "nationality_code",
+    "birth_date",
+    "birth_date_checkdigit",
+    "sex",
+    "expiry_date",
+    "expiry_date_checkdigit",
+    "optional_data",
+    "optional_data_checkdigit",
+    "optional_data_1",
+    "optional_data_2",
+    "final_checkdigit",
+    "mrz_text",
+    "status",
+    "status_message",
+]
+CHECKDIGIT_FIELDS = {
+    "document_number_checkdigit",
+    "birth_date_checkdigit",
+    "expiry_date_checkdigit",
+    "optional_data_checkdigit",
+    "final_checkdigit",
+}
+
+
+def _printed(text):
+    return text
+
+
+def _stripped(text):
+    return text.strip("<")
+
+
+def _compacted(text):
+    return text.replace("<", "")
+
+
+def _names(text):
+    names = text.split("<<")
+    return names[0].replace("<", " "), names[1].replace("<", " ")
+
+
+# Fields whose characters must all be letters
+LETTERS = "letters"
+
+# Where each document type prints its fields, in the order _parse_mrz reads
+# them, as (field, place, read, check). A place is (line, start, stop), or a
+# list of them for the final check digit, which covers several fields and is
+# reported on its own. check is the (line, index) of the field's check digit,
+# LETTERS, or None.
+_TWO_LINE_LAYOUT = [
+    ("document_code", (0, 0, 2), _stripped, None),
+    ("issuer_code", (0, 2, 5), _printed, LETTERS),
+    ("names", (0, 5, None), _names, None),
+    ("document_number", (1, 0, 9), _compacted, (1, 9)),
+    ("nationality_code", (1, 10, 13), _printed, LETTERS),
+    ("birth_date", (1, 13, 19), _printed, (1, 19)),
+    ("sex", (1, 20, 21), _printed, None),
+    ("expiry_date", (1, 21, 27), _printed, (1, 27)),
+]
+# Visas print no final check digit; _parse_mrz still reports the TD1 formula
+_TD1_FINAL = [(0, 5, None), (1, 0, 7), (1, 8, 15), (1, 18, 29)]
+FIELD_LAYOUTS = {
+    "TD1": [
+        ("document_code", (0, 0, 2), _stripped, None),
+        ("issuer_code", (0, 2, 5), _printed, LETTERS),
+        ("document_number", (0, 5, 14), _printed, (0, 14)),
+        ("optional_data_1", (0, 15, None), _stripped, None),
+        ("birth_date", (1, 0, 6), _printed, (1, 6)),
+        ("sex", (1, 7, 8), _printed, None),
+        ("expiry_date", (1, 8, 14), _printed, (1, 14)),
+        ("nationality_code", (1, 15, 18), _printed, LETTERS),
+        # Read from the first line, as _parse_mrz always has
+        ("optional_data_2", (0, 18, 29), _stripped, None),
+        ("final", _TD1_FINAL, _printed, (1, -1)),
+        ("names", (2, 0, None), _names, None),
+    ],
+    "TD2": _TWO_LINE_LAYOUT
+    + [
+        ("optional_data", (1, 28, 35), _stripped, None),
+        ("final", [(1, 0, 10), (1, 13, 20), (1, 21, 35)], _printed, (1, -1)),
+    ],
+    "TD3": _TWO_LINE_LAYOUT
+    + [
+        ("optional_data", (1, 28, 42), _stripped, (1, 42)),
+        ("final", [(1, 0, 10), (1, 13, 20), (1, 21, 43)], _printed, (1, -1)),
+    ],
+    "MRVA": _TWO_LINE_LAYOUT
+    + [
+        ("optional_data", (1, 28, 44), _stripped, None),
+        ("final", _TD1_FINAL, _printed, None),
+    ],
+    "MRVB": _TWO_LINE_LAYOUT
+    + [
+        ("optional_data", (1, 28, 36), _stripped, None),
+        ("final", _TD1_FINAL, _printed, None),
+    ],
+}
+FAILURE_MESSAGES = {
+    LETTERS: "Invalid MRZ format",
+    "document_number": "Document number checksum is not matching",
+    "birth_date": "Date of birth checksum is not matching",
+    "expiry_date": "Date of expiry checksum is not matching",
+    "optional_data": "Optional data checksum is not matching",
+    "final": "Final checksum is not matching",
+}
+
+
+def _has_checkdigit(field, check):
+    return field == "final" or isinstance(check, tuple)
+
+
+def _layout_fields(layout):
+    fields = ["mrz_type"]
+    for field, place, read, check in layout:
+        if field == "names":
+            fields += ["surname", "given_name"]
+        elif field != "final":
+            fields.append(field)
+        if _has_checkdigit(field, check):
+            fields.append(field + "_checkdigit")
+    return fields + ["mrz_text"]
+
+
+# Keys of a _parse_mrz result for each document type, in the order it adds them
+TYPE_FIELDS = {mrz_type: _layout_fields(layout) for mrz_type, layout in FIELD_LAYOUTS.items()}
+
+
+def _text(lines, place):
+    if isinstance(place, list):
+        return "".join(_text(lines, part) for part in place)
+    line, start, stop = place
+    return lines[line][start:stop]
+
+
+def char_value(char):
+    # What a character counts for in a check digit: 0-9, A-Z (either case)
+    # 10-35, anything else 0
+    if char.isdigit():
+        return int(char)
+    if char.isalpha():
+        return ord(char.upper()) - ord("A") + 10
+    return 0
+
+
+def checkdigit(value):
+    total = 0
+    for i, char in enumerate(value):
+        total += char_value(char) * (7, 3, 1)[i % 3]
+    return str(total % 10)
+
+
+def format_date(value):
+    # Same result as str(datetime.strptime(value, "%y%m%d").date()) without
+    # the cost of strptime; anything unusual goes through strptime itself so
+    # errors carry the same message
+    if len(value) == 6 and value.isascii() and value.isdigit():
+        year = int(value[:2])
+        try:
+            return str(date(year + (1900 if year >= 69 else 2000), int(value[2:4]), int(value[4:])))
+        except ValueError:
+            pass
+    return str(datetime.strptime(value, "%y%m%d").date())
+
+
+def adjust_birth_date(birth_date, expiry_date):
+    # Two-digit birth years after the expiry year are from the previous century
+    birth_year = int(birth_date[:4])
+    if int(expiry_date[:4]) > birth_year:
+        return birth_date
+    return f"{birth_year - 100}-{birth_date[5:]}"
+
+
+def final_checkdigit(lines, mrz_type):
+    # Types without a layout of their own get the TD1 formula, as they always have
+    layout = FIELD_LAYOUTS.get(mrz_type, FIELD_LAYOUTS["TD1"])
+    return checkdigit(_text(lines, next(entry[1] for entry in layout if entry[0] == "final")))
+
+
+def parse_lines(mrz_type, lines, mrz_text, include_checkdigit=True):
+    # What FastMRZ._parse_mrz returns for lines of the given type, read in
+    # layout order so that the same check fails or raises first
+    result = {"mrz_type": mrz_type}
+    for field, place, read, check in FIELD_LAYOUTS[mrz_type]:
+        value = read(_text(lines, place))
+        if field == "names":
+            result["surname"], result["given_name"] = value
+        elif field != "final":
+            result[field] = value
+        if check == LETTERS:
+            failed = not value.isalpha()
+        elif _has_checkdigit(field, check):
+            digit = checkdigit(value)
+            failed = check is not None and digit != lines[check[0]][check[1]]
+        else:
+            continue
+        if failed:
+            result["status"] = "FAILURE"
+            result["status_message"] = FAILURE_MESSAGES[LETTERS if check == LETTERS else field]
+        if check != LETTERS and include_checkdigit:
+            result[field + "_checkdigit"] = digit
+        if field in ("birth_date", "expiry_date"):
+            result[field] = format_date(value)
+        if field == "expiry_date":
+            result["birth_date"] = adjust_birth_date(result["birth_date"], result["expiry_date"])
+    result["mrz_text"] = mrz_text
+    if result.get("status") != "FAILURE":
+        result["status"] = "SUCCESS"
+    return result
+
+
+def _getters(layout):
+    # Reads each field from the lines on its own
+    getters = {}
+    for field, place, read, check in layout:
+
+        def get(lines, place=place, read=read):
+            return read(_text(lines, place))
+
+        if field == "names":
+            getters["surname"] = lambda lines, get=get: get(lines)[0]
+            getters["given_name"] = lambda lines, get=get: get(lines)[1]
+        elif field in ("birth_date", "expiry_date"):
+            getters[field] = lambda lines, get=get: format_date(get(lines))
+        elif field != "final":
+            getters[field] = get
+        if _has_checkdigit(field, check):
+            getters[field + "_checkdigit"] = lambda lines, get=get: checkdigit(get(lines))
+    birth_date, expiry_date = getters["birth_date"], getters["expiry_date"]
+    getters["birth_date"] = lambda lines: adjust_birth_date(birth_date(lines), expiry_date(lines))
+    return getters
+
+
+_GETTERS = {mrz_type: _getters(layout) for mrz_type, layout in FIELD_LAYOUTS.items()}
+
+
+def _mrz_type(lines):
+    # Only the regular shapes are parsed lazily; anything else is parsed
+    # eagerly by FastMRZ._parse_mrz
+    if len(lines) == 3 and all(len(line) == 30 for line in lines):
+        return "TD1"
+    if len(lines) == 2 and len(lines[0]) == len(lines[1]) and len(lines[0]) in (36, 44):
+        if lines[1][-1] == "<":
+            return "MRVB" if len(lines[0]) == 36 else "MRVA"
+        return "TD2" if len(lines[0]) == 36 else "TD3"
+    return None
+
+
+class MRZResult:
+    # A parsed MRZ that keeps only its text. Fields are sliced from the lines
+    # when read, dates are only formatted when asked for, and status runs the
+    # check digits once on first use. to_dict() gives the dict get_details
+    # returns by default. Results that cannot be parsed lazily (no MRZ, an
+    # irregular layout, errors) hold that dict instead.
+    __slots__ = ("mrz_text", "mrz_type", "include_checkdigit", "extra", "_state", "_fallback")
+
+    def __init__(self, mrz_text, include_checkdigit=True, parser=None):
+        self.mrz_text = mrz_text
+        self.include_checkdigit = include_checkdigit
+        self.extra = None
+        self._state = None
+        self._fallback = None
+        self.mrz_type = _mrz_type(mrz_text.strip().split("\n")) if mrz_text else None
+        if self.mrz_type is None:
+            if parser is None:
+                from .fastmrz import FastMRZ
+
+                parser = FastMRZ()
+            self._fallback = parser._parse_mrz_or_failure(mrz_text, include_checkdigit)
+            self.mrz_type = self._fallback.get("mrz_type")
+
+    @classmethod
+    def from_dict(cls, result):
+        # Wraps an already parsed result, such as a failure or a cache hit
+        instance = cls.__new__(cls)
+        instance.mrz_text = result.get("mrz_text")
+        instance.mrz_type = result.get("mrz_type")
+        instance.include_checkdigit = "final_checkdigit" in result
+        instance.extra = None
+        instance._state = None
+        instance._fallback = dict(result)
+        return instance
+
+    def _lines(self):
+        return self.mrz_text.strip().split("\n")
+
+    def _get(self, field):
+        if self._fallback is not None:
+            return self._fallback.get(field)
+        getter = _GETTERS[self.mrz_type].get(field)
+        if getter is None or (not self.include_checkdigit and field in CHECKDIGIT_FIELDS):
+            return None
+        try:
+            return getter(self._lines())
+        except (ValueError, IndexError):
+            return None
+
+    def _parse(self, include_checkdigit):
+        # The dict _parse_mrz returns; what it raises is reported as the failure
+        try:
+            result = parse_lines(self.mrz_type, self._lines(), self.mrz_text, include_checkdigit)
+            self._state = (result["status"], result.get("status_message"), False)
+        except Exception as error:
+            result = {"status": "FAILURE", "status_message": str(error)}
+            self._state = ("FAILURE", str(error), True)
+        return result
+
+    def _check(self):
+        # (status, status_message, whether _parse_mrz would have raised)
+        if self._state is None:
+            if self._fallback is not None:
+                self._state = (
+                    self._fallback["status"], self._fallback.get("status_message"), False
+                )
+            else:
+                self._parse(include_checkdigit=False)
+        return self._state
+
+    def _fields(self):
+        return [
+            field
+            for field in TYPE_FIELDS[self.mrz_type]
+            if self.include_checkdigit or field not in CHECKDIGIT_FIELDS
+        ]
+
+    @property
+    def status(self):
+        return self._check()[0]
+
+    @property
+    def status_message(self):
+        return self._check()[1]
+
+    @property
+    def is_valid(self):
+        return self.status == "SUCCESS"
+
+    @property
+    def document_code(self):
+        return self._get("document_code")
+
+    @property
+    def issuer_code(self):
+        return self._get("issuer_code")
+
+    @property
+    def surname(self):
+        return self._get("surname")
+
+    @property
+    def given_name(self):
+        return self._get("given_name")
+
+    @property
+    def document_number(self):
+        return self._get("document_number")
+
+    @property
+    def document_number_checkdigit(self):
+        return self._get("document_number_checkdigit")
+
+    @property
+    def nationality_code(self):
+        return self._get("nationality_code")
+
+    @property
+    def birth_date(self):
+        return self._get("birth_date")
+
+    @property
+    def birth_date_checkdigit(self):
+        return self._get("birth_date_checkdigit")
+
+    @property
+    def sex(self):
+        return self._get("sex")
+
+    @property
+    def expiry_date(self):
+        return self._get("expiry_date")
+
+    @property
+    def expiry_date_checkdigit(self):
+        return self._get("expiry_date_checkdigit")
+
+    @property
+    def optional_data(self):
+        return self._get("optional_data")
+
+    @property
+    def optional_data_checkdigit(self):
+        return self._get("optional_data_checkdigit")
+
+    @property
+    def optional_data_1(self):
+        return self._get("optional_data_1")
+
+    @property
+    def optional_data_2(self):
+        return self._get("optional_data_2")
+
+    @property
+    def final_checkdigit(self):
+        return self._get("final_checkdigit")
+
+    def keys(self):
+        return list(self.to_dict())
+
+    def __getitem__(self, key):
+        if self.extra and key in self.extra:
+            return self.extra[key]
+        if self._fallback is not None:
+            return self._fallback[key]
+        status, message, raised = self._check()
+        if key == "status":
+            return status
+        if key == "status_message" and message is not None:
+            return message
+        if not raised and key in self._fields():
+            if key == "mrz_text":
+                return self.mrz_text
+            return self.mrz_type if key == "mrz_type" else self._get(key)
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        try:
+            self[key]
+        except KeyError:
+            return False
+        return True
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def to_dict(self):
+        if self._fallback is not None:
+            result = dict(self._fallback)
+        else:
+            result = self._parse(self.include_checkdigit)
+        if self.extra:
+            result.update(self.extra)
+        return result
+
+    def to_json(self):
+        return json.dumps(self.to_dict())
+
+    def __eq__(self, other):
+        if isinstance(other, MRZResult):
+            other = other.to_dict()
+        return self.to_dict() == other if isinstance(other, dict) else NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return (
+            f"MRZResult(status={self.status!r}, mrz_type={self.mrz_type!r}, "
+            f"document_number={self.document_number!r})"
+        )
+
+
+def _as_dict(result):
+    return result.to_dict() if isinstance(result, MRZResult) else result
+
+
+def write_ndjson(results, file):
+    # One JSON object per line; accepts MRZResult objects and plain dicts
+    count = 0
+    for result in results:
+        file.write(json.dumps(_as_dict(result)) + "\n")
+        count += 1
+    return count
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+    except ImportError as error:
+        raise ImportError("Arrow output requires pyarrow: pip install fastmrz[arrow]") from error
+    return pyarrow
+
+
+def to_record_batch(results, fields=FIELDS):
+    # One string column per field; fields a document type lacks are null
+    pyarrow = _pyarrow()
+    columns = {field: [] for field in fields}
+    for result in results:
+        for field in fields:
+            columns[field].append(result.get(field))
+    return pyarrow.record_batch(
+        [pyarrow.array(columns[field], type=pyarrow.string()) for field in fields], names=fields
+    )
+
+
+def write_arrow(results, sink, batch_size=65536, fields=FIELDS):
+    # Writes an Arrow IPC stream of record batches of up to batch_size rows,
+    # so memory stays bounded for any number of results
+    pyarrow = _pyarrow()
+    schema = pyarrow.schema([(field, pyarrow.string()) for field in fields])
+    count = 0
+    with pyarrow.ipc.new_stream(sink, schema) as writer:
+        batch = []
+        for result in results:
+            batch.append(result)
+            if len(batch) == batch_size:
+                writer.write_batch(to_record_batch(batch, fields))
+                count += len(batch)
+                batch = []
+        if batch:
+            writer.write_batch(to_record_batch(batch, fields))
+            count += len(batch)
+    return count
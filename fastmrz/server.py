@@ -0,0 +1,482 @@
+import json
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from contextlib import nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from .detect import MRZNotFound
+
+JSON_INPUT_TYPES = ("base64", "text", "imagepath")
+MAX_BODY_SIZE = 32 << 20
+
+
+class QueueFull(Exception):
+    pass
+
+
+class InvalidInput(ValueError):
+    # The request's input could not be read, as opposed to an image that was
+    # read but could not be processed
+    pass
+
+
+class _Request:
+    __slots__ = (
+        "image",
+        "image_array",
+        "ignore_parse",
+        "include_checkdigit",
+        "cache_key",
+        "future",
+        "timings",
+        "started",
+    )
+
+    def __init__(
+        self,
+        image,
+        image_array,
+        ignore_parse,
+        include_checkdigit,
+        cache_key,
+        future,
+        timings,
+        started,
+    ):
+        self.image = image
+        self.image_array = image_array
+        self.ignore_parse = ignore_parse
+        self.include_checkdigit = include_checkdigit
+        self.cache_key = cache_key
+        self.future = future
+        self.timings = timings
+        self.started = started
+
+
+class MicroBatcher:
+    # Images are decoded and preprocessed on the thread of their HTTP request
+    # and queued. One dispatcher thread takes up to max_batch_size of them,
+    # waiting at most max_wait seconds for a batch to fill, runs the
+    # segmentation net once for the batch and hands ROI extraction and OCR of
+    # each image to a pool of OCR workers. At most max_pending images are
+    # accepted at a time; beyond that submit() raises QueueFull.
+    def __init__(self, fast_mrz, max_batch_size=8, max_wait=0.01, max_pending=64, ocr_workers=4):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1.")
+        self.fast_mrz = fast_mrz
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.max_pending = max_pending
+        self._slots = threading.Semaphore(max_pending)
+        self._queue = queue.Queue()
+        self._executor = ThreadPoolExecutor(
+            max_workers=ocr_workers, thread_name_prefix="fastmrz-ocr"
+        )
+        self._lock = threading.Lock()
+        self._counters = {"accepted": 0, "rejected": 0, "batches": 0, "batched": 0, "pending": 0}
+        self._dispatcher = threading.Thread(
+            target=self._dispatch, name="fastmrz-batcher", daemon=True
+        )
+        self._dispatcher.start()
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counters)
+
+    def _count(self, name, value=1):
+        with self._lock:
+            self._counters[name] += value
+
+    def _release(self, future):
+        self._count("pending", -1)
+        self._slots.release()
+
+    def _trace(self, timings):
+        # Stages of one request run on three threads; each of them adds to
+        # the request's timings
+        if self.fast_mrz.metrics is None:
+            return nullcontext()
+        return self.fast_mrz.metrics.trace(timings)
+
+    def _complete(self, future, timings, started, result=None, error=None):
+        fast_mrz = self.fast_mrz
+        if fast_mrz.metrics is not None:
+            # The request crossed threads, so only its wall-clock time adds up
+            with fast_mrz.metrics.trace(timings):
+                fast_mrz.metrics.observe("total", time.perf_counter() - started)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(
+                result if fast_mrz.metrics is None else fast_mrz._attach_timings(result, timings)
+            )
+
+    def submit(self, input_data, input_type, ignore_parse=False, include_checkdigit=True):
+        if not self._slots.acquire(blocking=False):
+            self._count("rejected")
+            raise QueueFull("Too many requests are pending.")
+        self._count("accepted")
+        self._count("pending")
+        future = Future()
+        future.add_done_callback(self._release)
+
+        fast_mrz = self.fast_mrz
+        timings = {}
+        started = time.perf_counter()
+        try:
+            with self._trace(timings):
+                cache_key = None
+                if fast_mrz.cache is not None:
+                    cache_key = fast_mrz._get_cache_key(
+                        input_data, input_type, ignore_parse, include_checkdigit, or_failure=True
+                    )
+                    result = fast_mrz._cache_get(cache_key)
+                    if result is not None:
+                        self._complete(future, timings, started, result)
+                        return future
+                image = fast_mrz._load_image(input_data, input_type)
+                image_array = fast_mrz._process_image(image)
+        except Exception as error:
+            if isinstance(error, ValueError):
+                error = InvalidInput(error)
+            self._complete(future, timings, started, error=error)
+            return future
+
+        self._queue.put(
+            _Request(
+                image,
+                image_array,
+                ignore_parse,
+                include_checkdigit,
+                cache_key,
+                future,
+                timings,
+                started,
+            )
+        )
+        return future
+
+    def _dispatch(self):
+        while True:
+            request = self._queue.get()
+            if request is None:
+                return
+            batch = [request]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                try:
+                    request = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if request is None:
+                    # Finish this batch, then stop on the next get()
+                    self._queue.put(None)
+                    break
+                batch.append(request)
+            self._run_batch(batch)
+
+    def _run_batch(self, batch):
+        # Every image of the batch waited for the whole forward pass
+        batch_timings = {}
+        try:
+            with self._trace(batch_timings):
+                output_data = self.fast_mrz._forward_batch(
+                    [request.image_array for request in batch]
+                )
+        except Exception as error:
+            for request in batch:
+                self._complete(request.future, request.timings, request.started, error=error)
+            return
+        self._count("batches")
+        self._count("batched", len(batch))
+        for j, request in enumerate(batch):
+            for stage, stage_timings in batch_timings.items():
+                request.timings[stage] = dict(stage_timings)
+            # The image array is not needed past the forward pass
+            request.image_array = None
+            self._executor.submit(self._finish, request, output_data[j : j + 1])
+
+    def _finish(self, request, output_data):
+        fast_mrz = self.fast_mrz
+        try:
+            with self._trace(request.timings):
+                try:
+                    mrz_text = fast_mrz._read_mrz(output_data, request.image)
+                except MRZNotFound as error:
+                    result = fast_mrz._get_rejection(error, request.ignore_parse)
+                else:
+                    # Text that does not parse is a FAILURE, not a failed request
+                    result = fast_mrz._get_result(
+                        mrz_text, request.ignore_parse, request.include_checkdigit, or_failure=True
+                    )
+        except Exception as error:
+            self._complete(request.future, request.timings, request.started, error=error)
+            return
+        if request.cache_key is not None:
+            fast_mrz._cache_set(request.cache_key, result)
+        self._complete(request.future, request.timings, request.started, result)
+
+    def close(self):
+        self._queue.put(None)
+        self._dispatcher.join()
+        self._executor.shutdown(wait=True)
+
+
+def _flag(value, default):
+    if value is None:
+        return default
+    if isinstance(value, bool):
+        return value
+    return str(value).lower() in ("1", "true", "yes")
+
+
+class MRZRequestHandler(BaseHTTPRequestHandler):
+    # POST /mrz takes either a raw image body (any content type but JSON) or a
+    # JSON object {"input_type": "base64" | "text" | "imagepath", "input_data":
+    # ..., "ignore_parse": false, "include_checkdigit": true}. Raw bodies take
+    # ignore_parse and include_checkdigit as query parameters.
+    server_version = "fastmrz"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+    def _send(self, code, body, content_type="application/json", headers=()):
+        if content_type == "application/json":
+            body = json.dumps(body)
+        body = body.encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+        self.server.count_response(code)
+
+    def _send_failure(self, code, message, headers=()):
+        self._send(code, {"status": "FAILURE", "status_message": message}, headers=headers)
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        if path == "/health":
+            self._send(200, self.server.health())
+        elif path == "/metrics":
+            self._send(200, self.server.prometheus_text(), "text/plain; version=0.0.4")
+        else:
+            self._send_failure(404, f"Unknown path: {path}")
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        if url.path != "/mrz":
+            self.close_connection = True
+            self._send_failure(404, f"Unknown path: {url.path}")
+            return
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            # The body cannot be delimited, so the connection cannot be reused
+            self.close_connection = True
+            self._send_failure(400, "Invalid Content-Length header.")
+            return
+        if length > MAX_BODY_SIZE:
+            self.close_connection = True
+            self._send_failure(413, "Request body is too large.")
+            return
+        body = self.rfile.read(length)
+
+        try:
+            if self.headers.get_content_type() == "application/json":
+                request = json.loads(body)
+                input_type = request.get("input_type", "base64")
+                if input_type not in JSON_INPUT_TYPES:
+                    raise ValueError(f"Unsupported input_type: {input_type}")
+                if input_type == "imagepath" and not self.server.allow_paths:
+                    raise ValueError("Image paths are not accepted by this server.")
+                input_data = request["input_data"]
+                if not isinstance(input_data, str):
+                    raise ValueError("input_data must be a string.")
+            else:
+                request = {key: values[-1] for key, values in parse_qs(url.query).items()}
+                input_type = "bytes"
+                input_data = body
+            ignore_parse = _flag(request.get("ignore_parse"), False)
+            include_checkdigit = _flag(request.get("include_checkdigit"), True)
+        except (ValueError, KeyError, AttributeError) as error:
+            self._send_failure(400, f"Invalid request: {error}")
+            return
+
+        try:
+            result = self.server.get_details(
+                input_data, input_type, ignore_parse, include_checkdigit
+            )
+        except QueueFull as error:
+            self._send_failure(503, str(error), headers=[("Retry-After", "1")])
+            return
+        except FutureTimeoutError:
+            self._send_failure(504, "The request timed out.")
+            return
+        except InvalidInput as error:
+            self._send_failure(400, str(error))
+            return
+        except Exception as error:
+            self._send_failure(500, str(error))
+            return
+
+        if ignore_parse:
+            result = {"mrz_text": result}
+        elif not isinstance(result, dict):
+            result = result.to_dict()
+        self._send(200, result)
+
+
+class MRZServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        fast_mrz,
+        address=("127.0.0.1", 8000),
+        max_batch_size=8,
+        max_wait=0.01,
+        max_pending=64,
+        ocr_workers=4,
+        timeout=30.0,
+        allow_paths=False,
+        quiet=False,
+    ):
+        super().__init__(address, MRZRequestHandler)
+        self.fast_mrz = fast_mrz
+        self.batcher = MicroBatcher(fast_mrz, max_batch_size, max_wait, max_pending, ocr_workers)
+        self.request_timeout = timeout
+        self.allow_paths = allow_paths
+        self.quiet = quiet
+        self._started = time.monotonic()
+        self._responses_lock = threading.Lock()
+        self._responses = {}
+
+    def count_response(self, code):
+        with self._responses_lock:
+            self._responses[code] = self._responses.get(code, 0) + 1
+
+    def get_details(self, input_data, input_type, ignore_parse, include_checkdigit):
+        if input_type == "text":
+            # Text parsing takes microseconds and never touches the net
+            return self.fast_mrz._get_traced_details(
+                input_data, input_type, ignore_parse, include_checkdigit, or_failure=True
+            )
+        future = self.batcher.submit(input_data, input_type, ignore_parse, include_checkdigit)
+        return future.result(timeout=self.request_timeout)
+
+    def health(self):
+        stats = self.batcher.stats()
+        return {
+            "status": "ok",
+            "uptime_seconds": time.monotonic() - self._started,
+            "pending": stats["pending"],
+            "max_pending": self.batcher.max_pending,
+        }
+
+    def prometheus_text(self, prefix="fastmrz"):
+        stats = self.batcher.stats()
+        lines = []
+
+        def add(name, kind, help_text, samples):
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+            lines.extend(f"{prefix}_{name}{labels} {value}" for labels, value in samples)
+
+        with self._responses_lock:
+            responses = sorted(self._responses.items())
+        add(
+            "http_responses_total",
+            "counter",
+            "HTTP responses by status code.",
+            [(f'{{code="{code}"}}', count) for code, count in responses],
+        )
+        add(
+            "requests_accepted_total",
+            "counter",
+            "Images accepted for batching.",
+            [("", stats["accepted"])],
+        )
+        add(
+            "requests_rejected_total",
+            "counter",
+            "Images refused with 503 because too many were pending.",
+            [("", stats["rejected"])],
+        )
+        add("batches_total", "counter", "Segmentation batches run.", [("", stats["batches"])])
+        add("batched_images_total", "counter", "Images run in batches.", [("", stats["batched"])])
+        add(
+            "pending_images",
+            "gauge",
+            "Images accepted and not answered yet.",
+            [("", stats["pending"])],
+        )
+        if self.fast_mrz.cache is not None:
+            cache_stats = self.fast_mrz.cache.stats()
+            add(
+                "cache_events_total",
+                "counter",
+                "Result cache lookups and updates.",
+                [
+                    (f'{{event="{name}"}}', value)
+                    for name, value in cache_stats.items()
+                    if name != "entries"
+                ],
+            )
+            add("cache_entries", "gauge", "Results held in memory.", [("", cache_stats["entries"])])
+        if self.fast_mrz.cascade is not None:
+            cascade_stats = self.fast_mrz.cascade.stats()
+            add(
+                "cascade_finished_total",
+                "counter",
+                "Documents finished by each cascade profile.",
+                [
+                    (f'{{profile="{name}"}}', profile["finished"])
+                    for name, profile in cascade_stats["profiles"].items()
+                ],
+            )
+            add(
+                "cascade_unfinished_total",
+                "counter",
+                "Documents no cascade profile read with valid check digits.",
+                [("", cascade_stats["unfinished"])],
+            )
+        if self.fast_mrz.buffers is not None:
+            buffer_stats = self.fast_mrz.buffers.stats()
+            add(
+                "buffer_allocations_total",
+                "counter",
+                "Preprocessing scratch buffers allocated or grown.",
+                [("", buffer_stats["allocations"])],
+            )
+            add(
+                "buffer_resident_bytes",
+                "gauge",
+                "Bytes held by preprocessing scratch buffers.",
+                [("", buffer_stats["resident_bytes"])],
+            )
+            add(
+                "buffer_peak_resident_bytes",
+                "gauge",
+                "Most bytes preprocessing scratch buffers have held at once.",
+                [("", buffer_stats["peak_resident_bytes"])],
+            )
+
+        text = "\n".join(lines) + "\n"
+        if self.fast_mrz.metrics is not None:
+            text += self.fast_mrz.metrics.prometheus_text(prefix)
+        return text
+
+    def server_close(self):
+        super().server_close()
+        self.batcher.close()
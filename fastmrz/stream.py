@@ -0,0 +1,67 @@
+import collections
+
+import cv2
+import numpy as np
+
+# Line count of each MRZ layout, keyed by line length
+MRZ_LINE_COUNTS = {30: 3, 36: 2, 44: 2}
+
+
+def to_small_gray(frame, max_width=640):
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+    if gray.shape[1] > max_width:
+        height = max(1, round(gray.shape[0] * max_width / gray.shape[1]))
+        gray = cv2.resize(gray, (max_width, height), interpolation=cv2.INTER_AREA)
+    return gray
+
+
+def sharpness(gray):
+    # Variance of the Laplacian: low values mean few edges, i.e. a blurry frame
+    return float(cv2.Laplacian(gray, cv2.CV_64F).var())
+
+
+def signature(gray, size=(32, 32)):
+    return cv2.resize(gray, size, interpolation=cv2.INTER_AREA).astype(np.int16)
+
+
+def signature_distance(signature_a, signature_b):
+    return float(np.abs(signature_a - signature_b).mean())
+
+
+class MRZVoter:
+    def __init__(self):
+        self._votes = {}
+        self._frames = collections.Counter()
+
+    @property
+    def frames(self):
+        return sum(self._frames.values())
+
+    def add(self, mrz_text):
+        lines = mrz_text.split("\n") if mrz_text else []
+        length = len(lines[0]) if lines else 0
+        if MRZ_LINE_COUNTS.get(length) != len(lines) or any(
+            len(line) != length for line in lines
+        ):
+            return False
+
+        layout = (len(lines), length)
+        if layout not in self._votes:
+            self._votes[layout] = [
+                [collections.Counter() for _ in range(length)] for _ in lines
+            ]
+        for line_votes, line in zip(self._votes[layout], lines):
+            for position_votes, char in zip(line_votes, line):
+                position_votes[char] += 1
+        self._frames[layout] += 1
+
+        return True
+
+    def consensus(self):
+        if not self._frames:
+            return ""
+        layout = self._frames.most_common(1)[0][0]
+        return "\n".join(
+            "".join(position_votes.most_common(1)[0][0] for position_votes in line_votes)
+            for line_votes in self._votes[layout]
+        )
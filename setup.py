@@ -21,6 +21,15 @@ setup(
     install_requires=[
         "opencv-python>=4.9.0.80", "pytesseract>=0.3.10",
     ],
+    extras_require={
+        "tesserocr": ["tesserocr>=2.6.0"],
+        "pdf": ["pymupdf>=1.23"],
+        "arrow": ["pyarrow>=10"],
+        "onnxruntime": ["onnxruntime>=1.16"],
+    },
+    entry_points={
+        "console_scripts": ["fastmrz=fastmrz.cli:main"],
+    },
     packages=find_packages(),
     include_package_data=True,
     classifiers=[
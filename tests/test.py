@@ -1,9 +1,35 @@
+import asyncio
+import base64
+import io
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
 import unittest
+import urllib.error
+import urllib.request
 from pathlib import Path
 
 import numpy as np
 
-from fastmrz import FastMRZ
+from fastmrz import FastMRZ, PytesseractBackend
+from fastmrz.buffers import BufferPool
+from fastmrz.bulk import to_records
+from fastmrz.cache import ResultCache
+from fastmrz.cascade import Cascade, Profile
+from fastmrz.cli import _collect_paths
+from fastmrz.detect import MRZGate, MRZNotFound
+from fastmrz.metrics import Metrics
+from fastmrz.ocr import get_ocr_backend
+from fastmrz.ocrb import OCRBRecognizer
+from fastmrz.pool import FramePool
+from fastmrz.result import MRZResult, write_ndjson
+from fastmrz.server import MRZServer, MicroBatcher
+from fastmrz.stream import MRZVoter
 
 BASE_DIR = Path(__file__).parent.parent
 DATA_DIR = BASE_DIR / "data"
@@ -24,6 +50,60 @@ class TestFastMRZMethods(unittest.TestCase):
         roi = fast_mrz._get_roi(output_data, image_path)
         self.assertIsInstance(roi, str)
 
+    def test_get_ocr_backend(self):
+        ocr = get_ocr_backend("pytesseract", tessdata_path=BASE_DIR / "tessdata")
+        self.assertIsInstance(ocr, PytesseractBackend)
+        self.assertIs(get_ocr_backend(ocr), ocr)
+        with self.assertRaises(ValueError):
+            get_ocr_backend("unknown")
+
+    def test_get_roi_box_lowres(self):
+        output_data = np.zeros((1, 256, 256, 1), dtype=np.float32)
+        output_data[0, 200:215, 20:236] = 1
+        image = np.zeros((3000, 4000, 3), dtype=np.uint8)
+        roi_box = fast_mrz._get_roi_box(output_data, image)
+        lowres_box = fast_mrz._get_roi_box_lowres(output_data, image.shape)
+        for value, lowres_value in zip(roi_box, lowres_box):
+            self.assertLessEqual(abs(value - lowres_value), 16)
+
+    def test_buffers(self):
+        buffers = BufferPool()
+        buffered_mrz = FastMRZ(buffers=buffers)
+        image_path = DATA_DIR / "td3.jpg"
+        image = fast_mrz._imagepath_to_array(image_path)
+        self.assertTrue(
+            np.array_equal(
+                buffered_mrz._process_image(image_path, reuse=True),
+                fast_mrz._process_image(image_path),
+            )
+        )
+
+        output_data = np.zeros((1, 256, 256, 1), dtype=np.float32)
+        output_data[0, 200:215, 20:236] = 1
+        output_data[0, 40:50, 60:90] = 1
+        roi_box = fast_mrz._get_roi_box(output_data, image)
+        self.assertEqual(buffered_mrz._get_roi_box(output_data, image), roi_box)
+        self.assertEqual(
+            buffered_mrz._get_roi_box_lowres(output_data, image.shape),
+            fast_mrz._get_roi_box_lowres(output_data, image.shape),
+        )
+        self.assertTrue(
+            np.array_equal(
+                buffered_mrz._threshold_roi(image, roi_box), fast_mrz._threshold_roi(image, roi_box)
+            )
+        )
+        self.assertIsNone(buffered_mrz._get_roi_box(np.zeros_like(output_data), image))
+
+        # Once an image size has been seen, its buffers are only reused
+        allocations = buffers.stats()["allocations"]
+        for _ in range(3):
+            buffered_mrz._process_image(image, reuse=True)
+            buffered_mrz._threshold_roi(image, buffered_mrz._get_roi_box(output_data, image))
+        stats = buffers.stats()
+        self.assertEqual(stats["allocations"], allocations)
+        self.assertGreater(stats["reuses"], 0)
+        self.assertEqual(stats["resident_bytes"], stats["peak_resident_bytes"])
+
     def test_cleanse_roi(self):
         raw_text = "P<UTOERIKSSON<<ANNA<MARIA<<< <<<<<<<<<  <<<<<<<\n\nL898902C36UTO7408122F1204159ZE184226B<<<<<10\n"
         cleansed_text = fast_mrz._cleanse_roi(raw_text)
@@ -50,6 +130,17 @@ class TestFastMRZMethods(unittest.TestCase):
         raw_mrz = fast_mrz.get_details(image_path, ignore_parse=True)
         self.assertIsInstance(raw_mrz, str)
 
+    def test_read_raw_mrz_bytes(self):
+        image_data = (DATA_DIR / "td2.jpg").read_bytes()
+        raw_mrz = fast_mrz.get_details(image_data, input_type="bytes", ignore_parse=True)
+        self.assertIsInstance(raw_mrz, str)
+
+    def test_base64_to_array(self):
+        image_path = DATA_DIR / "td3.jpg"
+        base64_string = base64.b64encode(image_path.read_bytes()).decode("utf-8")
+        image_array = fast_mrz._base64_to_array(base64_string)
+        self.assertTrue(np.array_equal(image_array, fast_mrz._imagepath_to_array(image_path)))
+
     def test_read_mrz(self):
         image_path = DATA_DIR / "td3.jpg"
         mrz_data = fast_mrz.get_details(image_path)
@@ -74,6 +165,602 @@ class TestFastMRZMethods(unittest.TestCase):
         self.assertIsInstance(mrz_data, dict)
         self.assertIn("status", mrz_data.keys())
 
+    def test_read_mrz_pdf(self):
+        try:
+            import pymupdf
+        except ImportError:
+            self.skipTest("PyMuPDF is not installed")
+        document = pymupdf.open()
+        document.new_page().insert_text((72, 72), "Cover letter")
+        page = document.new_page()
+        page.insert_image(page.rect, filename=str(DATA_DIR / "td3.jpg"))
+        mrz_data = fast_mrz.get_details(document.tobytes(), input_type="pdf")
+        self.assertEqual(mrz_data, fast_mrz.get_details(DATA_DIR / "td3.jpg"))
+        with self.assertRaises(ValueError):
+            fast_mrz.get_details(b"not a pdf", input_type="pdf")
+
+    def test_read_mrz_batch(self):
+        image_paths = [DATA_DIR / "td3.jpg", DATA_DIR / "missing.jpg", DATA_DIR / "mrva.jpg"]
+        results = fast_mrz.get_details_batch(image_paths, batch_size=2)
+        self.assertEqual(len(results), 3)
+        self.assertEqual(results[1]["status"], "FAILURE")
+        self.assertEqual(results[0], fast_mrz.get_details(image_paths[0]))
+
+    def test_map_details(self):
+        image_paths = [DATA_DIR / "td1.jpg", DATA_DIR / "missing.jpg", DATA_DIR / "td3.jpg"]
+        with FastMRZ(tessdata_path=BASE_DIR / "tessdata", workers=2) as pooled_mrz:
+            results = pooled_mrz.map_details(image_paths)
+            self.assertEqual(len(results), 3)
+            self.assertEqual(results[1]["status"], "FAILURE")
+            self.assertEqual(results[2], pooled_mrz.submit(image_paths[2]).result())
+
+    def test_threaded_tesserocr(self):
+        # Like the real module, the stand-in installs a signal handler on import
+        fake_tesserocr = (
+            "import signal\n"
+            "signal.signal(signal.SIGINT, signal.getsignal(signal.SIGINT))\n"
+            "class OEM:\n"
+            "    DEFAULT = 3\n"
+            "class PyTessBaseAPI:\n"
+            "    def __init__(self, **kwargs): pass\n"
+            "    def SetPageSegMode(self, psm): pass\n"
+            "    def SetImageBytes(self, *args): pass\n"
+            "    def Clear(self): pass\n"
+            "    def End(self): pass\n"
+            "    def GetUTF8Text(self):\n"
+            "        return ('P<GBRPUDARSAN<<HENERT<<<<<<<<<<<<<<<<<<<<<<<\\n'\n"
+            "                '7077979792GBR9505209M1704224<<<<<<<<<<<<<<00')\n"
+        )
+
+        class MaskNet:
+            def forward(self, image_array):
+                output_data = np.zeros(image_array.shape[:3] + (1,), dtype=np.float32)
+                output_data[:, 200:230, 20:236] = 1
+                return output_data
+
+        with tempfile.TemporaryDirectory() as directory:
+            Path(directory, "tesserocr.py").write_text(fake_tesserocr)
+            sys.path.insert(0, directory)
+            sys.modules.pop("tesserocr", None)
+            try:
+                with FastMRZ(workers=2, inference_backend=MaskNet()) as threaded_mrz:
+                    results = threaded_mrz.map_details([DATA_DIR / "td3.jpg"] * 4)
+                    self.assertEqual([result["status"] for result in results], ["SUCCESS"] * 4)
+                    self.assertEqual(threaded_mrz.ocr.name, "tesserocr")
+
+                # Imported first off the main thread, "auto" falls back to pytesseract
+                sys.modules.pop("tesserocr", None)
+                thread_results = []
+                thread = threading.Thread(target=lambda: thread_results.append(get_ocr_backend()))
+                thread.start()
+                thread.join()
+                self.assertIsInstance(thread_results[0], PytesseractBackend)
+            finally:
+                sys.path.remove(directory)
+                sys.modules.pop("tesserocr", None)
+
+    def test_scan_collect_paths(self):
+        paths = _collect_paths([str(DATA_DIR / "*.jpg"), str(DATA_DIR)], None, False, (".jpg",))
+        self.assertEqual(len(paths), len(set(paths)))
+        self.assertIn(str(DATA_DIR / "td1.jpg"), paths)
+
+    def test_aget_details(self):
+        async def read_mrz():
+            image_path = DATA_DIR / "td3.jpg"
+            mrz_data = await fast_mrz.aget_details(image_path)
+            results = [result async for result in fast_mrz.aget_details_batch([image_path])]
+            return mrz_data, results
+
+        mrz_data, results = asyncio.run(read_mrz())
+        self.assertIn("status", mrz_data.keys())
+        self.assertEqual(results, [mrz_data])
+        self.assertEqual(FastMRZ(workers=2).max_concurrency, max(2, os.cpu_count() or 1))
+
+    def test_stream(self):
+        frame = fast_mrz._imagepath_to_array(DATA_DIR / "td3.jpg")
+        results = list(fast_mrz.stream([frame, frame.copy(), frame]))
+        self.assertLessEqual(len(results), 1)
+        for result in results:
+            self.assertEqual(result["frame_index"], 0)
+            self.assertIn("status", result.keys())
+
+    def test_stream_recognize_roi(self):
+        class MaskNet:
+            def forward(self, image_array):
+                output_data = np.zeros(image_array.shape[:3] + (1,), dtype=np.float32)
+                output_data[:, 200:230, 20:236] = 1
+                return output_data
+
+        class ScriptedOCR:
+            def recognize(self, image, psm=6):
+                return (
+                    "P<GBRPUDARSAN<<HENERT<<<<<<<<<<<<<<<<<<<<<<<\n"
+                    "7077979792GBR9505209M1704224<<<<<<<<<<<<<<00"
+                )
+
+        # Stream frames go through the same OCR stage as single images
+        metrics = Metrics()
+        stream_mrz = FastMRZ(
+            inference_backend=MaskNet(), ocr_backend=ScriptedOCR(), metrics=metrics
+        )
+        frame = fast_mrz._imagepath_to_array(DATA_DIR / "td3.jpg")
+        results = list(stream_mrz.stream([frame]))
+        self.assertEqual(results[0]["status"], "SUCCESS")
+        self.assertEqual(metrics.snapshot()["ocr"]["count"], 1)
+
+    def test_mrz_voter(self):
+        voter = MRZVoter()
+        self.assertFalse(voter.add("P<GBR\n7077"))
+        line_1 = "P<GBRPUDARSAN<<HENERT<<<<<<<<<<<<<<<<<<<<<<<"
+        line_2 = "7077979792GBR9505209M1704224<<<<<<<<<<<<<<00"
+        voter.add(line_1 + "\n" + line_2)
+        voter.add(line_1 + "\n" + line_2.replace("9505209", "95O5209"))
+        voter.add(line_1 + "\n" + line_2.replace("1704224", "17O4224"))
+        self.assertEqual(voter.frames, 3)
+        self.assertEqual(voter.consensus(), line_1 + "\n" + line_2)
+
+    def test_parse_many(self):
+        mrz_texts = [
+            "P<GBRPUDARSAN<<HENERT<<<<<<<<<<<<<<<<<<<<<<<\n7077979792GBR9505209M1704224<<<<<<<<<<<<<<00",
+            "P<GBRPUDARSAN<<HENERT<<<<<<<<<<<<<<<<<<<<<<<\n7077979792GBR9505209M1704224<<<<<<<<<<<<<<01",
+            "I<UTOD231458907<<<<<<<<<<<<<<<\n7408122F1204159UTO<<<<<<<<<<<6\nERIKSSON<<ANNA<MARIA<<<<<<<<<<",
+            "I<UTOERIKSSON<<ANNA<MARIA<<<<<<<<<<<\nD231458907UTO7408122F1204159<<<<<<<6",
+            "V<UTOERIKSSON<<ANNA<MARIA<<<<<<<<<<<\nL8988901C4XXX4009078F9612109<<<<<<<<",
+            "INVALIDTEXT",
+        ]
+        records = to_records(fast_mrz.parse_many(mrz_texts))
+        expected = [fast_mrz.get_details(text, input_type="text") for text in mrz_texts]
+        self.assertEqual(records, expected)
+
+        validity = fast_mrz.validate_many(mrz_texts)
+        self.assertEqual(
+            validity["is_valid"].tolist(),
+            [fast_mrz.validate_mrz(text)["is_valid"] for text in mrz_texts],
+        )
+
+    def test_lazy_load(self):
+        text_mrz = FastMRZ()
+        text_mrz.validate_mrz(
+            "P<GBRPUDARSAN<<HENERT<<<<<<<<<<<<<<<<<<<<<<<\n"
+            "7077979792GBR9505209M1704224<<<<<<<<<<<<<<00"
+        )
+        self.assertIsNone(text_mrz._net_pool)
+        self.assertIsNone(text_mrz._ocr)
+
+        heavy_modules = subprocess.run(
+            [
+                sys.executable,
+                "-c",
+                "import sys, fastmrz; fastmrz.FastMRZ().get_details('P<', input_type='text'); "
+                "print(sorted({'cv2', 'numpy', 'pytesseract'} & set(sys.modules)))",
+            ],
+            cwd=BASE_DIR,
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+        self.assertEqual(heavy_modules, "[]")
+
+    def test_result_cache(self):
+        mrz_text = (
+            "P<GBRPUDARSAN<<HENERT<<<<<<<<<<<<<<<<<<<<<<<\n"
+            "7077979792GBR9505209M1704224<<<<<<<<<<<<<<00"
+        )
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache_path = Path(cache_dir) / "results.sqlite"
+            cached_mrz = FastMRZ(cache=ResultCache(max_entries=1, path=cache_path))
+            result = cached_mrz.get_details(mrz_text, input_type="text")
+            result["surname"] = "CHANGED"
+            self.assertEqual(
+                cached_mrz.get_details(f" {mrz_text}\n", input_type="text"),
+                fast_mrz.get_details(mrz_text, input_type="text"),
+            )
+            cached_mrz.get_details(mrz_text, input_type="text", ignore_parse=True)
+            self.assertEqual(cached_mrz.cache.stats()["evictions"], 1)
+
+            cache = ResultCache()
+            cache.set("key", {"status": "SUCCESS", "corrections": [{"line": 0}]})
+            cache.get("key")["corrections"][0]["line"] = 1
+            cache.get("key")["corrections"].append({"line": 2})
+            self.assertEqual(cache.get("key")["corrections"], [{"line": 0}])
+
+            restarted_mrz = FastMRZ(cache=ResultCache(path=cache_path))
+            restarted_mrz.get_details(mrz_text, input_type="text")
+            stats = restarted_mrz.cache.stats()
+            self.assertEqual((stats["disk_hits"], stats["misses"]), (1, 0))
+
+    def test_metrics(self):
+        metrics = Metrics(attach_timings=True)
+        stages = []
+        metrics.add_hook(stages.append)
+        measured_mrz = FastMRZ(metrics=metrics)
+        result = measured_mrz.get_details(
+            "P<GBRPUDARSAN<<HENERT<<<<<<<<<<<<<<<<<<<<<<<\n"
+            "7077979792GBR9505209M1704224<<<<<<<<<<<<<<00",
+            input_type="text",
+        )
+        self.assertEqual(result["status"], "SUCCESS")
+        self.assertEqual(sorted(result["timings"]), ["parse", "total"])
+        self.assertEqual(stages, ["total", "parse"])
+        self.assertEqual(metrics.snapshot()["total"]["count"], 1)
+        self.assertIn(
+            'fastmrz_stage_seconds_bucket{stage="parse",le="+Inf"} 1', metrics.prometheus_text()
+        )
+
+    def test_ocrb_recognizer(self):
+        image = fast_mrz._imagepath_to_array(DATA_DIR / "td3.jpg")
+        roi_threshold = fast_mrz._threshold_roi(image, (30, 330, 630, 400))
+        mrz_text = (
+            "P<UTOERIKSSON<<ANNA<MARIA<<<<<<<<<<<<<<<<<<<\n"
+            "L898902C36UTO7408122F1204159ZE184226B<<<<<10"
+        )
+        recognizer = OCRBRecognizer()
+        self.assertEqual(recognizer.recognize(roi_threshold), "")
+        self.assertTrue(recognizer.learn(roi_threshold, mrz_text))
+        self.assertEqual(recognizer.recognize(roi_threshold), mrz_text + "\n")
+
+        with tempfile.TemporaryDirectory() as templates_dir:
+            templates_path = Path(templates_dir) / "ocrb.npz"
+            recognizer.save(templates_path)
+            loaded = OCRBRecognizer(templates_path=templates_path)
+            self.assertEqual(loaded.recognize(roi_threshold), mrz_text + "\n")
+
+    def test_cascade(self):
+        mrz_text = (
+            "P<GBRPUDARSAN<<HENERT<<<<<<<<<<<<<<<<<<<<<<<\n"
+            "7077979792GBR9505209M1704224<<<<<<<<<<<<<<00"
+        )
+
+        class ScriptedOCR:
+            def __init__(self, texts):
+                self.texts = list(texts)
+
+            def recognize(self, image, psm=6):
+                return self.texts.pop(0)
+
+        image = np.full((256, 256, 3), 255, dtype=np.uint8)
+        image[200:230, 20:236] = 0
+        output_data = np.zeros((1, 256, 256, 1), dtype=np.float32)
+        output_data[0, 200:230, 20:236, 0] = 1
+
+        cascade = Cascade([Profile("fast", lowres=True), Profile("wide", padding=20)])
+        cascaded_mrz = FastMRZ(ocr_backend=ScriptedOCR(["P<GBR<<", mrz_text]), cascade=cascade)
+        self.assertEqual(cascaded_mrz._run_cascade(output_data, image), mrz_text)
+        stats = cascade.stats()
+        self.assertEqual(stats["documents"], 1)
+        self.assertEqual(stats["profiles"]["fast"], {"attempts": 1, "finished": 0})
+        self.assertEqual(stats["profiles"]["wide"], {"attempts": 1, "finished": 1})
+
+        cascaded_mrz.ocr.texts = ["", ""]
+        self.assertEqual(cascaded_mrz._run_cascade(output_data, image), "")
+        self.assertEqual(cascade.stats()["unfinished"], 1)
+        with self.assertRaises(ValueError):
+            Profile("sharp", binarization="sauvola")
+
+    def test_mrz_gate(self):
+        output_data = np.zeros((1, 256, 256, 1), dtype=np.float32)
+        output_data[0, 200:230, 20:236] = 0.9
+        image = np.full((256, 256, 3), 255, dtype=np.uint8)
+        for line in range(2):
+            for column in range(22):
+                x = 24 + column * 9
+                image[204 + line * 13 : 214 + line * 13, x : x + 5] = 0
+
+        gated_mrz = FastMRZ(gate=True)
+        roi_threshold = gated_mrz._get_roi_image(output_data, image)
+        self.assertEqual(gated_mrz.gate.count_glyphs(roi_threshold), 44)
+        with self.assertRaises(MRZNotFound):
+            gated_mrz._get_roi_image(output_data, np.full((256, 256, 3), 255, dtype=np.uint8))
+
+        gate = MRZGate()
+        square = np.zeros((1, 256, 256, 1), dtype=np.float32)
+        square[0, 100:150, 100:150] = 0.9
+        for mask in (np.zeros_like(output_data), square):
+            with self.assertRaises(MRZNotFound):
+                gate.check_mask(mask, image.shape)
+        self.assertAlmostEqual(gate.check_mask(output_data, image.shape), 0.9, places=2)
+
+    def test_get_details_batch_gate(self):
+        class BlankNet:
+            def forward(self, image_array):
+                return np.zeros(image_array.shape[:3] + (1,), dtype=np.float32)
+
+        gated_mrz = FastMRZ(gate=True, inference_backend=BlankNet())
+        image_path = DATA_DIR / "nomrz.jpg"
+        expected = gated_mrz.get_details(image_path)
+        self.assertIn("mrz_confidence", expected)
+        self.assertEqual(gated_mrz.get_details_batch([image_path] * 2), [expected] * 2)
+        self.assertEqual(gated_mrz.get_details(image_path, ignore_parse=True), "")
+        self.assertEqual(gated_mrz.get_details_batch([image_path] * 2, ignore_parse=True), ["", ""])
+
+    def test_detect_mrz(self):
+        detection = fast_mrz.detect_mrz(DATA_DIR / "td3.jpg")
+        self.assertEqual(detection["status"], "SUCCESS")
+        self.assertEqual(len(detection["box"]), 4)
+        self.assertGreater(detection["confidence"], 0)
+
+    def test_server(self):
+        server = MRZServer(FastMRZ(metrics=True), ("127.0.0.1", 0), max_pending=0, quiet=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+        try:
+            request = urllib.request.Request(
+                url + "/mrz",
+                data=json.dumps(
+                    {
+                        "input_type": "text",
+                        "input_data": "P<GBRPUDARSAN<<HENERT<<<<<<<<<<<<<<<<<<<<<<<\n"
+                        "7077979792GBR9505209M1704224<<<<<<<<<<<<<<00",
+                    }
+                ).encode(),
+                headers={"Content-Type": "application/json"},
+            )
+            with urllib.request.urlopen(request) as response:
+                self.assertEqual(json.loads(response.read())["status"], "SUCCESS")
+
+            # No image slots are free, so image requests are refused at once
+            request = urllib.request.Request(
+                url + "/mrz", data=b"image", headers={"Content-Type": "image/jpeg"}
+            )
+            with self.assertRaises(urllib.error.HTTPError) as context:
+                urllib.request.urlopen(request)
+            self.assertEqual(context.exception.code, 503)
+
+            with urllib.request.urlopen(url + "/health") as response:
+                self.assertEqual(json.loads(response.read())["status"], "ok")
+            with urllib.request.urlopen(url + "/metrics") as response:
+                metrics_text = response.read().decode()
+            self.assertIn("fastmrz_requests_rejected_total 1", metrics_text)
+            self.assertIn('fastmrz_http_responses_total{code="503"} 1', metrics_text)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_micro_batcher_timings(self):
+        mrz_text = (
+            "P<GBRPUDARSAN<<HENERT<<<<<<<<<<<<<<<<<<<<<<<\n"
+            "7077979792GBR9505209M1704224<<<<<<<<<<<<<<00"
+        )
+
+        class MaskNet:
+            def forward(self, image_array):
+                output_data = np.zeros(image_array.shape[:3] + (1,), dtype=np.float32)
+                output_data[:, 200:230, 20:236] = 1
+                return output_data
+
+        class ScriptedOCR:
+            def recognize(self, image, psm=6):
+                return mrz_text
+
+        metrics = Metrics(attach_timings=True)
+        batched_mrz = FastMRZ(
+            inference_backend=MaskNet(), ocr_backend=ScriptedOCR(), metrics=metrics
+        )
+        batcher = MicroBatcher(batched_mrz, max_wait=0.05)
+        try:
+            image = np.full((256, 256, 3), 255, dtype=np.uint8)
+            futures = [batcher.submit(image, "numpy") for _ in range(2)]
+            results = [future.result(timeout=10) for future in futures]
+        finally:
+            batcher.close()
+        for result in results:
+            self.assertEqual(result["status"], "SUCCESS")
+            self.assertTrue({"preprocess", "forward", "ocr", "total"} <= set(result["timings"]))
+        self.assertEqual(metrics.snapshot()["total"]["count"], 2)
+
+    def test_server_content_length(self):
+        import http.client
+
+        server = MRZServer(FastMRZ(), ("127.0.0.1", 0), quiet=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            for content_length in ("abc", "-1"):
+                connection = http.client.HTTPConnection(
+                    "127.0.0.1", server.server_address[1], timeout=10
+                )
+                connection.putrequest("POST", "/mrz")
+                connection.putheader("Content-Type", "image/jpeg")
+                connection.putheader("Content-Length", content_length)
+                connection.endheaders()
+                response = connection.getresponse()
+                self.assertEqual(response.status, 400)
+                self.assertEqual(json.loads(response.read())["status"], "FAILURE")
+                connection.close()
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_server_parse_failure(self):
+        # Month 13 makes the birth date fail to parse
+        mrz_text = (
+            "P<GBRPUDARSAN<<HENERT<<<<<<<<<<<<<<<<<<<<<<<\n"
+            "7077979792GBR9513209M1704224<<<<<<<<<<<<<<00"
+        )
+
+        class MaskNet:
+            def forward(self, image_array):
+                output_data = np.zeros(image_array.shape[:3] + (1,), dtype=np.float32)
+                output_data[:, 200:230, 20:236] = 1
+                return output_data
+
+        class ScriptedOCR:
+            def recognize(self, image, psm=6):
+                return mrz_text
+
+        served_mrz = FastMRZ(inference_backend=MaskNet(), ocr_backend=ScriptedOCR(), cache=True)
+        server = MRZServer(served_mrz, ("127.0.0.1", 0), quiet=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_address[1]}/mrz"
+
+        def post(data, content_type):
+            request = urllib.request.Request(url, data=data, headers={"Content-Type": content_type})
+            try:
+                with urllib.request.urlopen(request) as response:
+                    return response.status, json.loads(response.read())
+            except urllib.error.HTTPError as error:
+                return error.code, json.loads(error.read())
+
+        try:
+            # An input that was read but does not parse is a FAILURE result
+            text_body = json.dumps({"input_type": "text", "input_data": mrz_text}).encode()
+            status, result = post(text_body, "application/json")
+            self.assertEqual((status, result["status"]), (200, "FAILURE"))
+            status, result = post((DATA_DIR / "td3.jpg").read_bytes(), "image/jpeg")
+            self.assertEqual((status, result["status"]), (200, "FAILURE"))
+            # Only input that cannot be read is the client's fault
+            self.assertEqual(post(b"image", "image/jpeg")[0], 400)
+            self.assertEqual(post(b'{"input_data": 1}', "application/json")[0], 400)
+            # The library call still raises; the server's FAILURE is cached apart
+            with self.assertRaises(ValueError):
+                served_mrz.get_details(mrz_text, input_type="text")
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_warmup(self):
+        warm_mrz = FastMRZ(tessdata_path=BASE_DIR / "tessdata")
+        timings = warm_mrz.warmup()
+        self.assertEqual(set(timings), {"load", "forward", "ocr", "parse", "total"})
+        if not hasattr(os, "fork"):
+            return
+        # A forked child uses the nets and engines the parent loaded
+        pid = os.fork()
+        if pid == 0:
+            try:
+                mrz_data = warm_mrz.get_details(DATA_DIR / "td3.jpg")
+                os._exit(0 if mrz_data["status"] == "SUCCESS" else 1)
+            finally:
+                os._exit(2)
+        status = os.waitpid(pid, 0)[1]
+        self.assertTrue(os.WIFEXITED(status))
+        self.assertEqual(os.WEXITSTATUS(status), 0)
+
+    def test_frame_pool(self):
+        with FramePool(workers=1, slots=2, slot_size=64 * 64 * 3) as pool:
+            # Grayscale frames are rejected by the worker's FastMRZ
+            with self.assertRaises(ValueError):
+                pool.submit(np.zeros((64, 64), dtype=np.uint8)).result(timeout=60)
+            with self.assertRaises(ValueError):
+                pool.submit(np.zeros((128, 128, 3), dtype=np.uint8))
+            with self.assertRaises(ValueError):
+                pool.submit(np.zeros(4, dtype=object))
+
+            os.kill(pool._workers[0].process.pid, signal.SIGKILL)
+            for _ in range(600):
+                if pool.stats()["worker_crashes"]:
+                    break
+                time.sleep(0.1)
+            results = pool.map([np.zeros((64, 64), dtype=np.uint8)] * 3)
+            self.assertEqual([result["status"] for result in results], ["FAILURE"] * 3)
+            stats = pool.stats()
+            self.assertEqual(stats["worker_crashes"], 1)
+            self.assertEqual(stats["queue_depth"], 0)
+            self.assertEqual(stats["submitted"], 4)
+            # The replacement is not forked from the threaded parent
+            self.assertNotEqual(pool._workers[0].process._start_method, "fork")
+        with self.assertRaises(ValueError):
+            FramePool(workers=1, metrics=Metrics())
+
+    def test_inference_backend(self):
+        with self.assertRaises(ValueError):
+            FastMRZ(inference_backend="tensorflow")
+        try:
+            import onnxruntime  # noqa: F401
+        except ImportError:
+            self.skipTest("ONNX Runtime is not installed")
+        onnx_mrz = FastMRZ(inference_backend="onnxruntime", intra_op_threads=1)
+        image_array = fast_mrz._process_image(DATA_DIR / "td3.jpg")
+        np.testing.assert_allclose(
+            onnx_mrz._forward(image_array), fast_mrz._forward(image_array), atol=1e-4
+        )
+
+    def test_custom_inference_backend(self):
+        class SingleImageNet:
+            def forward(self, image_array):
+                if image_array.shape[0] != 1:
+                    raise RuntimeError("fixed batch size")
+                return np.zeros(image_array.shape[:3] + (1,), dtype=np.float32)
+
+        custom_mrz = FastMRZ(inference_backend=SingleImageNet())
+        image_arrays = [np.zeros((1, 256, 256, 3), dtype=np.float32)] * 3
+        self.assertEqual(custom_mrz._forward_batch(image_arrays).shape, (3, 256, 256, 1))
+        self.assertFalse(custom_mrz._batch_forward)
+
+    def test_mrz_result(self):
+        mrz_texts = [
+            "P<GBRPUDARSAN<<HENERT<<<<<<<<<<<<<<<<<<<<<<<\n7077979792GBR9505209M1704224<<<<<<<<<<<<<<00",
+            "P<GBRPUDARSAN<<HENERT<<<<<<<<<<<<<<<<<<<<<<<\n7077979792GBR9505209M1704224<<<<<<<<<<<<<<01",
+            "P<GBRPUDARSAN<<HENERT<<<<<<<<<<<<<<<<<<<<<<<\n7077979792GBR9513209M1704224<<<<<<<<<<<<<<00",
+            "I<UTOD231458907<<<<<<<<<<<<<<<\n7408122F1204159UTO<<<<<<<<<<<6\nERIKSSON<<ANNA<MARIA<<<<<<<<<<",
+            "I<UTOERIKSSON<<ANNA<MARIA<<<<<<<<<<<\nD231458907UTO7408122F1204159<<<<<<<6",
+            "V<UTOERIKSSON<<ANNA<MARIA<<<<<<<<<<<\nL8988901C4XXX4009078F9612109<<<<<<<<",
+            "V<UTOERIKSSON<ANNA<MARIA<<<<<<<<<<<<<<<<<<<\nL8988901C4XXX4009078F96121096ZE184226B<<<<<<",
+            "P<GBRPUDARSAN<HENERT<<<<<<<<<<<<<<<<<<<<<<<<\n7077979792GBR9505209M1704224<<<<<<<<<<<<<<00",
+            "INVALIDTEXT",
+            "",
+        ]
+        for mrz_text in mrz_texts:
+            for include_checkdigit in (True, False):
+                expected = fast_mrz._parse_mrz_or_failure(mrz_text, include_checkdigit)
+                result = MRZResult(mrz_text, include_checkdigit, parser=fast_mrz)
+                self.assertEqual(result.to_dict(), expected)
+                self.assertEqual(result, expected)
+
+        result = MRZResult(mrz_texts[0])
+        self.assertTrue(result.is_valid)
+        self.assertEqual(result.document_number, "707797979")
+        self.assertEqual(result["birth_date"], "1995-05-20")
+        self.assertIsNone(result.get("optional_data_1"))
+
+        object_mrz = FastMRZ(result_type="object")
+        result = object_mrz.get_details(mrz_texts[1], input_type="text")
+        self.assertIsInstance(result, MRZResult)
+        self.assertEqual(result.status, "FAILURE")
+        with self.assertRaises(ValueError):
+            FastMRZ(result_type="tuple")
+
+        file = io.StringIO()
+        self.assertEqual(write_ndjson([result, {"status": "FAILURE"}], file), 2)
+        self.assertEqual(json.loads(file.getvalue().splitlines()[0]), result.to_dict())
+
+    def test_correction(self):
+        corrected_mrz = FastMRZ(correction=True)
+        mrz_text = (
+            "P<GBRPUDARSAN<<HENERT<<<<<<<<<<<<<<<<<<<<<<<\n"
+            "7077979792GBR9505209M1704224<<<<<<<<<<<<<<00"
+        )
+        misread = mrz_text.replace("9505209", "95O52O9").replace("GBRPUD", "G8RPUD")
+        self.assertEqual(fast_mrz._parse_mrz_or_failure(misread)["status"], "FAILURE")
+
+        result = corrected_mrz.get_details(misread, input_type="text")
+        self.assertEqual(result["status"], "SUCCESS")
+        self.assertEqual(result["mrz_text"], mrz_text)
+        self.assertEqual(
+            result["corrections"],
+            [
+                {"line": 1, "position": 4, "from": "8", "to": "B"},
+                {"line": 2, "position": 16, "from": "O", "to": "0"},
+                {"line": 2, "position": 19, "from": "O", "to": "0"},
+            ],
+        )
+        self.assertNotIn("corrections", corrected_mrz.get_details(mrz_text, input_type="text"))
+
+        # The optional data check digit is a digit-only position too
+        result = corrected_mrz.get_details(mrz_text[:-2] + "O0", input_type="text")
+        self.assertEqual(result["mrz_text"], mrz_text)
+        self.assertEqual(result["corrections"], [{"line": 2, "position": 43, "from": "O", "to": "0"}])
+
+        # Lowercase letters count towards check digits as they do in the parser
+        lowercase = (
+            "P<UTOERIKSSON<<ANNA<MARIA<<<<<<<<<<<<<<<<<<<\n"
+            "L898902c36UTO7408122F1204159ZE184226B<<<<<10"
+        )
+        corrected, changes = corrected_mrz.correction.correct(
+            fast_mrz, lowercase.replace("7408122", "74O8122")
+        )
+        self.assertEqual(corrected, lowercase)
+        self.assertEqual(changes, [{"line": 2, "position": 16, "from": "O", "to": "0"}])
+
     def test_validate_mrz(self):
         result = fast_mrz.validate_mrz(
             "P<GBRPUDARSAN<<HENERT<<<<<<<<<<<<<<<<<<<<<<<\n"